@@ -1,10 +1,19 @@
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
 from app.database import get_db
+from app.utils.cache import TTLCache
 
 security = HTTPBearer()
 
@@ -29,6 +38,86 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     except Exception:
         return False
 
+_password_pool: Optional[ProcessPoolExecutor] = None
+_password_pool_lock = threading.Lock()
+# Jobs submitted and not finished yet, running ones included
+_password_jobs = 0
+
+def _lower_priority(niceness: int):
+    # Password workers yield the CPU to the processes serving requests
+    # (os.nice doesn't exist on Windows: they run at normal priority there)
+    if hasattr(os, "nice"):
+        os.nice(niceness)
+
+def _release_password_job(_future):
+    global _password_jobs
+    with _password_pool_lock:
+        _password_jobs -= 1
+
+async def _run_password_job(function: Callable, *args):
+    """Run a bcrypt call on the password pool and await its result
+    
+    bcrypt is slow on purpose, so it gets settings.password_workers processes
+    of its own, at a lower priority, instead of the request threadpool: a
+    burst of logins then queues there, not in front of every other endpoint
+    or ahead of them for the CPU. Past
+    settings.password_max_pending jobs, requests are turned away at once
+    with a 503 and Retry-After rather than left waiting.
+    """
+    global _password_pool, _password_jobs
+    with _password_pool_lock:
+        if _password_jobs >= settings.password_max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry shortly",
+                headers={"Retry-After": str(settings.password_retry_after_seconds)}
+            )
+        if _password_pool is None:
+            # spawn rather than fork: the parent has threads (and locks) of its own
+            # (so scripts starting the app need an `if __name__ == "__main__"` guard)
+            _password_pool = ProcessPoolExecutor(max_workers=settings.password_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_lower_priority,
+                                                 initargs=(settings.password_worker_nice,))
+        pool = _password_pool
+        try:
+            future = pool.submit(function, *args)
+        except BrokenProcessPool:
+            future = None
+        else:
+            _password_jobs += 1
+    if future is not None:
+        future.add_done_callback(_release_password_job)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            pass
+    # A worker died: start a new pool for the next request
+    with _password_pool_lock:
+        if _password_pool is pool:
+            _password_pool = None
+    pool.shutdown(wait=False)
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Password service restarting, please retry shortly",
+        headers={"Retry-After": str(settings.password_retry_after_seconds)}
+    )
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the password pool"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+def shutdown_password_pool():
+    global _password_pool
+    with _password_pool_lock:
+        pool, _password_pool = _password_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.jwt_expiration_minutes)
@@ -46,16 +135,115 @@ def decode_token(token: str) -> dict:
             detail="Could not validate credentials"
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_token(token)
+class PrincipalCache:
+    """Verified token -> user row, so that polling clients skip jwt.decode
+    and the user lookup on every request
+    
+    Entries live at most `ttl` seconds and never past the token's expiry. A
+    change to a user, seen on the store's change feed, drops every entry of
+    that user.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl)
+        self._tokens: Dict[str, set] = {}
+        # user id -> version of the last change seen, so that a lookup
+        # started before a change doesn't cache the old row after it
+        self._changed: Dict[str, int] = {}
+        self._reset_version = 0
+        self._db = None
+        self._changes = None
+        self._lock = threading.Lock()
+    
+    def _sync(self, db):
+        """Drop the entries of users changed since the last call"""
+        if db is not self._db:
+            # First use, or the store was replaced
+            with self._lock:
+                if db is not self._db:
+                    if self._changes is not None:
+                        self._changes.close()
+                    self._changes = db.subscribe("users", maxsize=1000)
+                    self._db = db
+                    self._clear(db.changes.version)
+            return
+        if not len(self._changes):
+            return
+        with self._lock:
+            for event in self._changes.drain():
+                if event.op == "reset":
+                    self._clear(event.version)
+                    continue
+                self._changed[event.row_id] = event.version
+                for token in self._tokens.pop(event.row_id, ()):
+                    self._entries.pop(token)
+    
+    def _clear(self, version: int):
+        self._entries.clear()
+        self._tokens.clear()
+        self._changed.clear()
+        self._reset_version = version
+    
+    def get(self, db, token: str):
+        """Cached user for a token, or None; also returns the change version
+        to pass to put() after looking the user up"""
+        self._sync(db)
+        return self._entries.get(token), db.changes.version
+    
+    def put(self, token: str, user, expires_at: Optional[float], version: int):
+        ttl = None if expires_at is None else expires_at - time.time()
+        user_id = user["id"]
+        with self._lock:
+            if version < self._reset_version or self._changed.get(user_id, 0) > version:
+                return
+            self._entries.set(token, user, ttl)
+            tokens = self._tokens.setdefault(user_id, set())
+            # Forget tokens that expired or were evicted
+            if len(tokens) > 16:
+                tokens.intersection_update([cached for cached in tokens if cached in self._entries])
+            tokens.add(token)
+
+_principals = PrincipalCache(settings.auth_cache_size, settings.auth_cache_ttl_seconds)
+
+def _user_id(payload: dict) -> str:
     user_id = payload.get("sub")
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    
+    return user_id
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     db = get_db()
+    token = credentials.credentials
+    user, version = _principals.get(db, token)
+    if user is not None:
+        return user
+    
+    payload = decode_token(token)
+    user_id = _user_id(payload)
+    
+    # Indexed lookup on id
     response = db.table("users").select("*").eq("id", user_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return response.data[0]
\ No newline at end of file
+    _principals.put(token, response.data[0], payload.get("exp"), version)
+    return response.data[0]
+
+async def get_current_user_async(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """get_current_user for async endpoints: FastAPI runs sync dependencies
+    in its threadpool, which is what async endpoints avoid"""
+    db = get_db()
+    token = credentials.credentials
+    user, version = _principals.get(db, token)
+    if user is not None:
+        return user
+    
+    payload = decode_token(token)
+    user_id = _user_id(payload)
+    
+    response = await db.table("users").select("*").eq("id", user_id).execute_async()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    _principals.put(token, response.data[0], payload.get("exp"), version)
+    return response.data[0]
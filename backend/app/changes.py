@@ -0,0 +1,187 @@
+"""
+Change feed of the database
+
+Every committed write is published as ChangeEvents, one per row, numbered
+with a version that increases across the whole store. In-process
+subscribers (caches, push channels, incremental aggregates) read them from
+their own bounded queue instead of polling tables. A transaction publishes
+its events together when it commits, and not at all when it rolls back.
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+class ChangeEvent(NamedTuple):
+    """One row written
+
+    op is insert, update or delete; `changed` lists the fields the write set
+    (every field for an insert, none for a delete) and `row` is the row after
+    the write (None for a delete). Rows are shared with the store: treat
+    them as read-only. An op of "reset" means events were dropped because
+    the subscriber fell behind: anything derived from earlier events must be
+    rebuilt from the tables.
+    """
+    version: int
+    table: Optional[str]
+    op: str
+    row_id: Optional[str]
+    changed: Tuple[str, ...]
+    row: Optional[dict]
+
+
+class Subscription:
+    """Bounded queue of the change events of some tables
+
+    When more than `maxsize` events are waiting, the queue is emptied and a
+    single "reset" event takes their place, so a slow subscriber never holds
+    back writers or grows without bound.
+    """
+
+    def __init__(self, feed: "ChangeFeed", tables: Iterable[str] = (), maxsize: int = 10000):
+        self.feed = feed
+        self.tables = frozenset(tables)
+        self.maxsize = maxsize
+        # Number of times events were dropped
+        self.overflows = 0
+        self._events: deque = deque()
+        self._condition = threading.Condition()
+        self._waiter = None
+        self.closed = False
+
+    def wants(self, table_name: str) -> bool:
+        return not self.tables or table_name in self.tables
+
+    def _put(self, events: List[ChangeEvent]):
+        with self._condition:
+            if len(self._events) + len(events) > self.maxsize:
+                self.overflows += 1
+                self._events.clear()
+                self._events.append(ChangeEvent(events[-1].version, None, "reset", None, (), None))
+            else:
+                self._events.extend(events)
+            self._condition.notify_all()
+            waiter = self._waiter
+        if waiter is not None:
+            loop, event = waiter
+            loop.call_soon_threadsafe(event.set)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[ChangeEvent]:
+        """Next event, waiting up to timeout seconds (None if there was none)"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._events or self.closed, timeout):
+                return None
+            return self._events.popleft() if self._events else None
+
+    def drain(self) -> List[ChangeEvent]:
+        """Every waiting event, without blocking"""
+        with self._condition:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    async def get_async(self, timeout: Optional[float] = None) -> Optional[ChangeEvent]:
+        """get() for coroutines: waits on the event loop, not in a thread"""
+        event = asyncio.Event()
+        with self._condition:
+            self._waiter = (asyncio.get_running_loop(), event)
+        try:
+            while True:
+                with self._condition:
+                    if self._events:
+                        return self._events.popleft()
+                    if self.closed:
+                        return None
+                    event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return None
+        finally:
+            with self._condition:
+                self._waiter = None
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def close(self):
+        """Stop receiving events and wake up any waiting reader"""
+        self.feed.unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+            waiter = self._waiter
+        if waiter is not None:
+            loop, event = waiter
+            loop.call_soon_threadsafe(event.set)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ChangeFeed:
+    """Numbers the store's writes and fans them out to the subscriptions
+
+    publish() takes the same records as the write-ahead log: ("insert",
+    table, rows), ("update", table, rows), ("delete", table, ids) and
+    ("batch", None, records), with the fields each write set.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._subscriptions: Tuple[Subscription, ...] = ()
+        self._lock = threading.Lock()
+
+    def subscribe(self, tables: Iterable[str] = (), maxsize: int = 10000) -> Subscription:
+        """Receive the events of `tables` (every table if empty) written from now on"""
+        subscription = Subscription(self, tables, maxsize)
+        with self._lock:
+            self._subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = tuple(item for item in self._subscriptions if item is not subscription)
+
+    def publish(self, record: tuple, changed=None):
+        """Publish a logged write; `changed` is the fields it set (a list of
+        them, one per record, for a batch)"""
+        if not self._subscriptions:
+            # Versions count writes even when nobody listens
+            with self._lock:
+                self.version += _count(record)
+            return
+        with self._lock:
+            events = []
+            self._events(record, changed, events)
+            subscriptions = self._subscriptions
+            # Delivered under the lock so every subscriber sees version order
+            for subscription in subscriptions:
+                wanted = [event for event in events if subscription.wants(event.table)]
+                if wanted:
+                    subscription._put(wanted)
+
+    def _events(self, record: tuple, changed, events: List[ChangeEvent]):
+        op, table_name, data = record
+        if op == "batch":
+            for position, nested in enumerate(data):
+                self._events(nested, changed[position] if changed else None, events)
+            return
+        for item in data:
+            self.version += 1
+            if op == "delete":
+                events.append(ChangeEvent(self.version, table_name, op, item, (), None))
+                continue
+            fields = tuple(item) if op == "insert" or changed is None else tuple(changed)
+            events.append(ChangeEvent(self.version, table_name, op, item.get("id"), fields, item))
+
+
+def _count(record: tuple) -> int:
+    op, _, data = record
+    if op == "batch":
+        return sum(_count(nested) for nested in data)
+    return len(data)
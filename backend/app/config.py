@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, ConfigDict
+from typing import Optional
 
 class Settings(BaseSettings):
     model_config = ConfigDict(
@@ -11,5 +12,64 @@ class Settings(BaseSettings):
     jwt_secret_key: str = Field(default="demo-secret-key-change-in-production")
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 1440
+    
+    # Durability of the in-memory database: set wal_dir to keep a write-ahead
+    # log and snapshots there. wal_fsync is one of always, group, interval, none.
+    wal_dir: Optional[str] = None
+    wal_fsync: str = "group"
+    wal_group_commit_ms: float = 2.0
+    wal_snapshot_every: int = 100000
+
+    # Retention of worker_activity and voice_commands, off unless a limit is
+    # set: the oldest rows beyond retention_max_rows or older than
+    # retention_max_age_hours (0 = no limit) are moved, retention_segment_rows
+    # at a time, to compressed files in archive_dir (required then; give an
+    # absolute path in the data directory). Archived rows can still be read
+    # with include_archived().
+    retention_max_rows: int = 0
+    retention_max_age_hours: float = 0
+    retention_segment_rows: int = 10000
+    retention_check_seconds: float = 60
+    archive_dir: Optional[str] = None
+
+    # Storage engine: "memory" (InMemoryDB) or "sqlite" (SQLiteDB, a file at
+    # sqlite_path that can grow beyond memory and survives restarts)
+    db_backend: str = "memory"
+    sqlite_path: str = "neurobot.db"
+
+    # Threads running the store operations of async endpoints (execute_async)
+    db_async_workers: int = 16
+
+    # Verified tokens kept by get_current_user (0 disables the cache), and
+    # how long one is trusted before it is checked again
+    auth_cache_size: int = 10000
+    auth_cache_ttl_seconds: float = 60
+
+    # Processes running bcrypt for logins and user creation (and their nice
+    # value), how many hashes may be waiting or running before new ones get
+    # a 503, and the Retry-After sent with it
+    password_workers: int = 2
+    password_worker_nice: int = 10
+    password_max_pending: int = 64
+    password_retry_after_seconds: int = 1
+
+    # Largest list accepted by POST /api/voice/commands/batch
+    voice_batch_max_commands: int = 1000
+
+    # Accept-and-enqueue mode for POST /api/voice/command: log the command,
+    # answer 202 and apply it on a queue of voice_queue_workers threads.
+    # Past voice_queue_max_pending commands waiting or running, new ones get
+    # a 503 with Retry-After; on shutdown the queue gets voice_queue_drain_seconds
+    # to finish
+    voice_async_processing: bool = False
+    voice_queue_workers: int = 4
+    voice_queue_max_pending: int = 10000
+    voice_queue_retry_after_seconds: int = 1
+    voice_queue_drain_seconds: float = 10
+
+    # Replies remembered for voice commands sent with an idempotency key or
+    # a (worker_id, seq) pair, and for how long a resend is recognized
+    voice_dedup_size: int = 100000
+    voice_dedup_window_seconds: float = 600
 
 settings = Settings()
\ No newline at end of file
@@ -2,219 +2,556 @@
 In-memory database for demo purposes
 Replaces Supabase with simple dictionaries
 """
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, date
-from typing import Dict, List
+from typing import Callable, Dict, List, Mapping, Optional, Union
+import asyncio
+import functools
+import gc
+import heapq
+import itertools
+import threading
 import uuid
 
+from app.changes import ChangeFeed, Subscription
+from app.config import settings
+from app.indexes import AggregateIndex, ExactSum, HashIndex, SortedIndex
+from app.persistence import WriteAheadLog
+from app.predicates import compile_filters, predicate_source
+from app.projection import SelectSpec, parse_select
+from app.retention import RetentionPolicy, SegmentArchive
+from app.seed import build_demo_data
+from app.rows import RowPacker, plain, view
+from app.utils.locks import ReadWriteLock
+
+# Secondary hash indexes per table. Every table is also indexed on "id".
+# Composite indexes are listed as tuples of columns and are used when all of
+# their columns are filtered with eq().
+TABLE_INDEXES = {
+    "users": [("email",)],
+    "managers": [("user_id",)],
+    "workers": [("worker_id",), ("station_id",)],
+    "stations": [("station_id",)],
+    "batches": [("batch_number",), ("overall_status",), ("current_station",)],
+    "production_progress": [("batch_id", "station_id"), ("batch_id",), ("station_id",)],
+    "worker_activity": [("worker_id",), ("batch_number",)],
+    "voice_commands": [("worker_id",)],
+    "alerts": [("station_id",), ("is_resolved",)],
+    "inventory": [],
+}
+
+# Sorted indexes per table, used by order() (with or without limit()) and by
+# the range filters gt()/gte()/lt()/lte()/between()
+TABLE_SORTED_INDEXES = {
+    "batches": ["created_at"],
+    "production_progress": ["created_at", "start_time", "end_time"],
+    "worker_activity": ["created_at"],
+    "voice_commands": ["created_at"],
+    "alerts": ["created_at"],
+}
+
+# Aggregate indexes per table: (group columns, summed columns). They answer
+# group_by() queries with count/sum/avg whose filters are all eq() on the
+# group columns, without a scan.
+TABLE_AGGREGATE_INDEXES = {
+    "workers": [(("station_id", "is_active"), ("productivity_score", "total_tasks_completed"))],
+    "production_progress": [(("station_id",), ("wastage_kg",))],
+}
+
+# Tables whose rows are stored as CompactRows, with the columns whose values
+# repeat a lot and are interned
+TABLE_COMPACT_ROWS = {
+    "production_progress": ("batch_id", "station_id", "status"),
+    "worker_activity": ("worker_id", "station_id", "activity_type", "batch_number"),
+    "voice_commands": ("worker_id", "station_id", "parsed_action", "parsed_entity", "batch_number"),
+}
+
+# Append-only tables that get a retention policy from the settings
+RETENTION_TABLES = ("worker_activity", "voice_commands")
+
+# Foreign keys used to embed related tables in select(), e.g.
+# select("*, batches(batch_number)") on production_progress.
+# (table, column) -> (referenced table, referenced column)
+TABLE_RELATIONS = {
+    ("managers", "user_id"): ("users", "id"),
+    ("workers", "station_id"): ("stations", "station_id"),
+    ("workers", "manager_id"): ("managers", "id"),
+    ("production_progress", "batch_id"): ("batches", "id"),
+    ("production_progress", "station_id"): ("stations", "station_id"),
+    ("worker_activity", "worker_id"): ("workers", "worker_id"),
+    ("worker_activity", "station_id"): ("stations", "station_id"),
+    ("voice_commands", "worker_id"): ("workers", "worker_id"),
+    ("voice_commands", "station_id"): ("stations", "station_id"),
+    ("alerts", "station_id"): ("stations", "station_id"),
+    ("alerts", "batch_id"): ("batches", "id"),
+}
+
+def find_relation(table_name: str, related_table: str):
+    """Return (local column, related column, to_many) joining two tables
+    
+    A foreign key from table_name embeds a single related row; a foreign key
+    pointing at table_name embeds the list of referencing rows.
+    """
+    for (source, column), (target, target_column) in TABLE_RELATIONS.items():
+        if source == table_name and target == related_table:
+            return column, target_column, False
+    for (source, column), (target, target_column) in TABLE_RELATIONS.items():
+        if source == related_table and target == table_name:
+            return target_column, column, True
+    raise ValueError(f"No relationship between '{table_name}' and '{related_table}'")
+
+class Table:
+    """Rows of a single table plus the indexes kept in sync with them
+    
+    Rows are copy-on-write: an update stores a new row instead of mutating
+    the old one, so rows already handed to readers never change under them.
+    Queries hold `lock` for reading, writes hold it for writing.
+    
+    With compact_columns set, rows are stored as CompactRows (see app.rows)
+    instead of dicts; either way they are read through the Mapping API.
+    """
+    
+    def __init__(self, name: str, indexes: List[tuple] = (), sorted_indexes: List[str] = (),
+                 compact_columns: Optional[tuple] = None, aggregate_indexes: List[tuple] = ()):
+        self.name = name
+        self.lock = ReadWriteLock()
+        self.rows: Dict[int, Dict] = {}
+        self._packer = RowPacker(compact_columns) if compact_columns is not None else None
+        # Hash indexes usable per query shape (see TableQueryBuilder._choose_index)
+        self.plan_cache: Dict[tuple, list] = {}
+        self._next_rid = 0
+        self.hash_indexes: Dict[tuple, HashIndex] = {}
+        self.sorted_indexes: Dict[str, SortedIndex] = {}
+        self.aggregate_indexes: Dict[tuple, AggregateIndex] = {}
+        for columns in [("id",), *indexes]:
+            self.add_index(columns)
+        for column in sorted_indexes:
+            self.add_sorted_index(column)
+        for group_columns, value_columns in aggregate_indexes:
+            self.add_aggregate_index(group_columns, value_columns)
+    
+    def add_index(self, columns: tuple):
+        """Declare a hash index and build it from the existing rows"""
+        columns = tuple(columns)
+        if columns in self.hash_indexes:
+            return
+        index = HashIndex(columns)
+        for rid, row in self.rows.items():
+            index.add(rid, row)
+        self.hash_indexes[columns] = index
+        self.plan_cache.clear()
+    
+    def add_sorted_index(self, column: str):
+        """Declare a sorted index and build it from the existing rows"""
+        if column in self.sorted_indexes:
+            return
+        index = SortedIndex(column)
+        for rid, row in self.rows.items():
+            index.add(rid, row)
+        self.sorted_indexes[column] = index
+    
+    def add_aggregate_index(self, group_columns: tuple, value_columns: tuple):
+        """Declare an aggregate index and build it from the existing rows"""
+        group_columns = tuple(group_columns)
+        if group_columns in self.aggregate_indexes:
+            return
+        index = AggregateIndex(group_columns, value_columns)
+        index.add_many(self.rows.items())
+        self.aggregate_indexes[group_columns] = index
+    
+    def _indexes(self):
+        yield from self.hash_indexes.values()
+        yield from self.sorted_indexes.values()
+        yield from self.aggregate_indexes.values()
+    
+    def _pack(self, row: Dict) -> Dict:
+        if self._packer is None or type(row) is not dict:
+            return row
+        return self._packer.pack(row)
+    
+    def insert(self, row: Dict) -> int:
+        """Store a new row and return its row id"""
+        row = self._pack(row)
+        rid = self._next_rid
+        self._next_rid += 1
+        self.rows[rid] = row
+        for index in self._indexes():
+            index.add(rid, row)
+        return rid
+    
+    def insert_many(self, rows: List[Dict]) -> List[int]:
+        """Store new rows with one maintenance pass per index"""
+        if self._packer is not None:
+            rows = [self._pack(row) for row in rows]
+        rids = list(range(self._next_rid, self._next_rid + len(rows)))
+        self._next_rid += len(rows)
+        self.rows.update(zip(rids, rows))
+        for index in self._indexes():
+            index.add_many(zip(rids, rows))
+        return rids
+    
+    def update(self, rid: int, changes: Dict) -> Dict:
+        old_row = self.rows[rid]
+        row = self._pack({**old_row, **changes})
+        touched = [index for index in self.hash_indexes.values()
+                   if any(column in changes for column in index.columns)]
+        touched += [index for column, index in self.sorted_indexes.items() if column in changes]
+        touched += [index for index in self.aggregate_indexes.values()
+                    if any(column in changes for column in index.columns)]
+        for index in touched:
+            index.remove(rid, old_row)
+        self.rows[rid] = row
+        for index in touched:
+            index.add(rid, row)
+        return row
+    
+    def replace(self, rid: int, row: Dict):
+        """Put a whole row back in place (used to roll back an update)"""
+        row = self._pack(row)
+        old_row = self.rows[rid]
+        for index in self._indexes():
+            index.remove(rid, old_row)
+        self.rows[rid] = row
+        for index in self._indexes():
+            index.add(rid, row)
+    
+    def delete(self, rid: int):
+        row = self.rows.pop(rid)
+        for index in self._indexes():
+            index.remove(rid, row)
+    
+    def delete_many(self, rids: List[int]):
+        """Delete several rows with one pass over each sorted index"""
+        removed = [(rid, self.rows.pop(rid)) for rid in rids]
+        for index in [*self.hash_indexes.values(), *self.aggregate_indexes.values()]:
+            for rid, row in removed:
+                index.remove(rid, row)
+        for index in self.sorted_indexes.values():
+            index.remove_many(rids)
+
+class Transaction:
+    """Tables locked by a db.transaction() block and the undo log of its writes"""
+    
+    def __init__(self, tables: Dict[str, Table]):
+        self.tables = tables
+        self._undo: List[tuple] = []
+        # Write-ahead log records, logged together when the block commits,
+        # and the fields each of them set (for the change feed)
+        self.log_records: List[tuple] = []
+        self.changed_fields: List[Optional[tuple]] = []
+    
+    def check_table(self, table_name: str):
+        if table_name not in self.tables:
+            raise RuntimeError(
+                f"Table '{table_name}' is not part of the transaction "
+                f"(locked: {', '.join(self.tables)})"
+            )
+    
+    def record_insert(self, table: Table, rid: int):
+        self._undo.append((table, rid, None))
+    
+    def record_update(self, table: Table, rid: int, old_row: Dict):
+        self._undo.append((table, rid, old_row))
+    
+    def rollback(self):
+        """Undo every write of the transaction, newest first"""
+        while self._undo:
+            table, rid, old_row = self._undo.pop()
+            if old_row is None:
+                table.delete(rid)
+            else:
+                table.replace(rid, old_row)
+
 # In-memory data store
 class InMemoryDB:
-    def __init__(self):
-        self.users: List[Dict] = []
-        self.managers: List[Dict] = []
-        self.workers: List[Dict] = []
-        self.stations: List[Dict] = []
-        self.batches: List[Dict] = []
-        self.production_progress: List[Dict] = []
-        self.worker_activity: List[Dict] = []
-        self.voice_commands: List[Dict] = []
-        self.alerts: List[Dict] = []
-        self.inventory: List[Dict] = []
+    def __init__(self, seed_demo_data: bool = True, wal: Optional[WriteAheadLog] = None,
+                 retention: Optional[Dict[str, RetentionPolicy]] = None,
+                 archive: Optional[SegmentArchive] = None):
+        self._tables: Dict[str, Table] = {
+            name: Table(name, indexes, TABLE_SORTED_INDEXES.get(name, ()), TABLE_COMPACT_ROWS.get(name),
+                        TABLE_AGGREGATE_INDEXES.get(name, ()))
+            for name, indexes in TABLE_INDEXES.items()
+        }
+        
+        self._local = threading.local()
+        self.wal = wal
+        # Committed writes, for subscribe()
+        self.changes = ChangeFeed()
+        
+        # Evicted rows go to the archive; a background thread enforces the
+        # policies when inserts push a table over its limit, and periodically
+        # for the age limits
+        self.retention: Dict[str, RetentionPolicy] = retention or {}
+        self.archive = archive
+        if self.retention and archive is None:
+            raise ValueError("A retention policy needs an archive for the evicted rows")
+        self._retention_due = threading.Event()
+        self._closed = threading.Event()
+        if self.retention:
+            threading.Thread(target=self._retention_loop, name="db-retention", daemon=True).start()
+        
+        # Recover the previous state when there is one
+        if wal is not None:
+            recovered = self._recover()
+            wal.on_snapshot_due = self.checkpoint
+            wal.open()
+            if recovered:
+                return
         
         # Initialize with demo data
-        self._initialize_demo_data()
+        if seed_demo_data:
+            self._initialize_demo_data()
+            if wal is not None:
+                self.checkpoint()
     
-    def _initialize_demo_data(self):
-        """Initialize with demo data"""
-        # Create users with bcrypt hashed passwords
-        import bcrypt
-        
-        def _hash_password(password: str) -> str:
-            """Hash password using bcrypt"""
-            password_bytes = password.encode('utf-8')
-            salt = bcrypt.gensalt()
-            hashed = bcrypt.hashpw(password_bytes, salt)
-            return hashed.decode('utf-8')
-        
-        self.users = [
-            {
-                "id": str(uuid.uuid4()),
-                "email": "admin@lakshmi.com",
-                "password_hash": _hash_password("admin123"),
-                "full_name": "Admin User",
-                "role": "admin",
-                "phone": "+91-9876543210",
-                "created_at": datetime.utcnow().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "email": "rajesh@lakshmi.com",
-                "password_hash": _hash_password("owner123"),
-                "full_name": "Rajesh Kumar",
-                "role": "owner",
-                "phone": "+91-9876543211",
-                "created_at": datetime.utcnow().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "email": "suresh@lakshmi.com",
-                "password_hash": _hash_password("manager123"),
-                "full_name": "Suresh",
-                "role": "manager",
-                "phone": "+91-9876543212",
-                "created_at": datetime.utcnow().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "email": "priya@lakshmi.com",
-                "password_hash": _hash_password("manager123"),
-                "full_name": "Priya",
-                "role": "manager",
-                "phone": "+91-9876543213",
-                "created_at": datetime.utcnow().isoformat()
-            }
-        ]
-        
-        # Create managers
-        self.managers = [
-            {
-                "id": str(uuid.uuid4()),
-                "user_id": self.users[2]["id"],  # Suresh
-                "manager_name": "Suresh",
-                "assigned_stations": ["STATION_1", "STATION_2"],
-                "created_at": datetime.utcnow().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "user_id": self.users[3]["id"],  # Priya
-                "manager_name": "Priya",
-                "assigned_stations": ["STATION_3", "STATION_4"],
-                "created_at": datetime.utcnow().isoformat()
-            }
-        ]
-        
-        # Create stations
-        station_names = {
-            "STATION_1": "Raw Material Receiving",
-            "STATION_2": "Washing & Peeling",
-            "STATION_3": "Blanching",
-            "STATION_4": "Slicing",
-            "STATION_5": "Drying (Tunnel Dryer)",
-            "STATION_6": "Grinding & Sieving",
-            "STATION_7": "Packaging & Mixing",
-            "STATION_8": "Quality Check & Dispatch"
-        }
+    def _recover(self) -> bool:
+        """Load the last snapshot and replay the log; False if there was nothing"""
+        # Loading creates millions of long-lived objects; cyclic GC passes over
+        # them would only slow recovery down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            lsn, tables = self.wal.load_snapshot()
+            for table_name, rows in tables.items():
+                self.get_table(table_name).insert_many(rows)
+            recovered = bool(tables)
+            for record in self.wal.replay(after_lsn=lsn):
+                self._apply_logged(record)
+                recovered = True
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return recovered
+    
+    def _apply_logged(self, record: tuple):
+        op, table_name, data = record
+        if op == "batch":
+            for nested in data:
+                self._apply_logged(nested)
+            return
+        table = self.get_table(table_name)
+        if op == "insert":
+            table.insert_many(data)
+        elif op == "update":
+            id_index = table.hash_indexes[("id",)]
+            for row in data:
+                rids = id_index.lookup((row.get("id"),))
+                if rids:
+                    table.replace(rids[0], row)
+        elif op == "delete":
+            id_index = table.hash_indexes[("id",)]
+            rids = [rid for row_id in data for rid in id_index.lookup((row_id,))]
+            table.delete_many(rids)
+    
+    def _log(self, record: tuple, changed: Optional[tuple] = None) -> Optional[int]:
+        """Write a record to the write-ahead log and publish it on the change
+        feed (both deferred to the commit inside a transaction)
         
-        for station_id, station_name in station_names.items():
-            self.stations.append({
-                "id": str(uuid.uuid4()),
-                "station_id": station_id,
-                "station_name": station_name,
-                "current_status": "idle",
-                "capacity": 100,
-                "created_at": datetime.utcnow().isoformat()
-            })
-        
-        # Create batches
-        today = str(date.today())
-        self.batches.append({
-            "id": str(uuid.uuid4()),
-            "batch_number": "BATCH_001",
-            "product_name": "ABC Powder",
-            "start_date": today,
-            "end_date": today,
-            "target_quantity_kg": 200,
-            "current_quantity_kg": 0,
-            "raw_material_kg": 270,
-            "current_station": "STATION_1",
-            "overall_status": "in_progress",
-            "created_at": datetime.utcnow().isoformat()
-        })
-        
-        # Create production progress entries for BATCH_001
-        batch_id = self.batches[0]["id"]
-        for station in self.stations:
-            self.production_progress.append({
-                "id": str(uuid.uuid4()),
-                "batch_id": batch_id,
-                "station_id": station["station_id"],
-                "status": "pending",
-                "input_quantity_kg": 0,
-                "output_quantity_kg": 0,
-                "wastage_kg": 0,
-                "workers_assigned": 0,
-                "start_time": None,
-                "end_time": None,
-                "created_at": datetime.utcnow().isoformat()
-            })
-        
-        # Create workers
-        worker_names = [
-            "Ravi", "Arun", "Deepak", "Vijay", "Karthik", "Prakash", "Ramesh", "Sunil",
-            "Anitha", "Priya", "Meena", "Lakshmi", "Kavitha", "Divya", "Radha", "Geetha",
-            "Kumar", "Raj", "Mohan", "Ganesh", "Siva", "Bala", "Mani", "Senthil",
-            "Veni", "Devi", "Prema", "Saranya", "Janaki", "Kamala", "Vasantha", "Mala",
-            "Arjun", "Dinesh", "Naveen", "Prabhu", "Raghu", "Saravanan", "Thiru", "Vinod",
-            "Bhavani", "Chitra", "Indira", "Jaya", "Kala", "Latha", "Mythili", "Nila",
-            "Selvi", "Uma"
-        ]
-        
-        stations_config = {
-            "STATION_1": 5,
-            "STATION_2": 8,
-            "STATION_3": 6,
-            "STATION_4": 7,
-            "STATION_5": 10,
-            "STATION_6": 7,
-            "STATION_7": 8,
-            "STATION_8": 4
-        }
+        Called with the table's write lock held, so that changes to a table
+        are published in the order they were applied.
+        """
+        transaction = self.current_transaction()
+        if transaction is not None:
+            transaction.log_records.append(record)
+            transaction.changed_fields.append(changed)
+            return None
+        self.changes.publish(record, changed)
+        if self.wal is None:
+            return None
+        return self.wal.append(record)
+    
+    def subscribe(self, *table_names: str, maxsize: int = 10000) -> Subscription:
+        """Receive change events for the listed tables (every table if none)
+        
+        Use as a context manager, or call close() on the subscription, to
+        stop receiving them.
+        """
+        return self.changes.subscribe(table_names, maxsize)
+    
+    def _wait_durable(self, lsn: Optional[int]):
+        if lsn:
+            self.wal.wait_durable(lsn)
+    
+    def checkpoint(self):
+        """Snapshot every table and truncate the write-ahead log"""
+        if self.wal is None:
+            return
+        names = list(self._tables)
+        # With every table read-locked no write is half logged
+        with self.snapshot(*names):
+            tables = {name: list(self._tables[name].rows.values()) for name in names}
+            lsn = self.wal.rotate()
+        self.wal.write_snapshot(tables, lsn)
+    
+    def close(self):
+        self._closed.set()
+        self._retention_due.set()
+        if self.wal is not None:
+            self.wal.close()
+    
+    def enforce_retention(self, table_name: str) -> int:
+        """Archive and evict a table's rows beyond its retention policy
         
-        worker_index = 0
-        for station_id, count in stations_config.items():
-            for i in range(count):
-                worker_id = f"WORKER_{station_id[-1]}{i+1:02d}"
-                self.workers.append({
-                    "id": str(uuid.uuid4()),
-                    "worker_id": worker_id,
-                    "worker_name": worker_names[worker_index % len(worker_names)],
-                    "station_id": station_id,
-                    "manager_id": None,
-                    "phone": f"+91-98765{worker_index:05d}",
-                    "productivity_score": round(60 + (worker_index % 30), 2),
-                    "total_tasks_completed": worker_index * 5,
-                    "is_active": True,
-                    "created_at": datetime.utcnow().isoformat()
-                })
-                worker_index += 1
+        Each segment is durably archived before its rows are dropped and the
+        eviction is logged, so a crash can at worst archive a segment twice
+        but never lose it. Returns the number of rows evicted.
+        """
+        policy = self.retention.get(table_name)
+        if policy is None:
+            return 0
+        table = self.get_table(table_name)
+        evicted = 0
+        while True:
+            with table.lock.write():
+                segment = policy.expired_segment(table.rows)
+                if not segment:
+                    break
+                rows = [plain(row) for _, row in segment]
+                self.archive.write_segment(table_name, rows)
+                table.delete_many([rid for rid, _ in segment])
+                lsn = self._log(("delete", table_name, [row.get("id") for row in rows]))
+            self._wait_durable(lsn)
+            evicted += len(segment)
+        return evicted
+    
+    def _retention_loop(self):
+        while not self._closed.is_set():
+            self._retention_due.wait(timeout=settings.retention_check_seconds)
+            self._retention_due.clear()
+            if self._closed.is_set():
+                return
+            for table_name in self.retention:
+                try:
+                    self.enforce_retention(table_name)
+                except Exception as e:
+                    print(f"⚠️ Retention of {table_name} failed: {str(e)}")
+    
+    def get_table(self, table_name: str) -> Table:
+        """Return the storage for a table, creating it on first use"""
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables.setdefault(table_name, Table(table_name))
+        return table
+    
+    def current_transaction(self) -> Optional[Transaction]:
+        """The transaction open on the calling thread, if any"""
+        return getattr(self._local, "transaction", None)
+    
+    @contextmanager
+    def transaction(self, *table_names: str):
+        """Apply a group of writes to the listed tables atomically
+        
+        The write locks of every listed table are taken once, in name order,
+        for the whole block. Queries inside the block see its own writes;
+        other threads see none of them until it ends. If the block raises,
+        every write it made is rolled back before the exception propagates.
+        Writing to a table that is not listed raises RuntimeError.
+        """
+        current = self.current_transaction()
+        if current is not None:
+            # Nested blocks join the outer transaction
+            for name in table_names:
+                current.check_table(name)
+            yield current
+            return
+        
+        transaction = Transaction({name: self.get_table(name) for name in sorted(set(table_names))})
+        acquired = []
+        lsn = None
+        try:
+            for table in transaction.tables.values():
+                table.lock.acquire_write()
+                acquired.append(table)
+            self._local.transaction = transaction
+            try:
+                yield transaction
+            except BaseException:
+                transaction.rollback()
+                raise
+            self._local.transaction = None
+            if transaction.log_records:
+                # One log record for the whole block: replayed all or nothing
+                lsn = self._log(("batch", None, transaction.log_records), transaction.changed_fields)
+        finally:
+            self._local.transaction = None
+            for table in reversed(acquired):
+                table.lock.release_write()
+        self._wait_durable(lsn)
+    
+    @contextmanager
+    def snapshot(self, *table_names: str):
+        """Hold read locks on several tables so the queries inside see one state
+        
+        Locks are taken in name order, the same order writers use, so list
+        every table the block reads: reading another table inside the block
+        takes its lock out of order.
+        """
+        locks = [self.get_table(name).lock for name in sorted(set(table_names))]
+        acquired = []
+        try:
+            for lock in locks:
+                lock.acquire_read()
+                acquired.append(lock)
+            yield self
+        finally:
+            for lock in reversed(acquired):
+                lock.release_read()
+    
+    def _initialize_demo_data(self):
+        """Initialize with demo data"""
+        for table_name, rows in build_demo_data().items():
+            self._tables[table_name].insert_many(rows)
     
     def table(self, table_name: str):
         """Return a table query builder"""
         return TableQueryBuilder(self, table_name)
 
+# Filters that a sorted index on their column can answer with a slice
+RANGE_FILTERS = ("gt", "gte", "lt", "lte")
+
+def _filter_value(value):
+    """Timestamps are stored as ISO strings; compare datetimes the same way"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
 class TableQueryBuilder:
     """Mimics Supabase query builder interface"""
     
     def __init__(self, db: InMemoryDB, table_name: str):
         self.db = db
         self.table_name = table_name
-        self._select_fields = "*"
+        self._select: SelectSpec = parse_select("*")
         self._filters = []
         self._order_by = None
         self._order_desc = False
         self._limit_value = None
         self._data_to_insert = None
         self._data_to_update = None
+        self._data_to_upsert = None
+        self._on_conflict = ("id",)
+        self._include_archived = False
+        self._compiled = None
+        self._group_by: tuple = ()
+        self._aggregates: List[tuple] = []
     
     def select(self, fields: str = "*"):
-        """Select fields"""
-        self._select_fields = fields
+        """Select fields, e.g. "id, name" or "*, batches(batch_number)" """
+        self._select = parse_select(fields)
         return self
     
-    def insert(self, data: Dict):
-        """Insert data"""
+    def insert(self, data: Union[Dict, List[Dict]]):
+        """Insert a row, or a list of rows in one bulk write"""
         self._data_to_insert = data
         return self
     
+    def upsert(self, data: Union[Dict, List[Dict]], on_conflict: str = "id"):
+        """Insert rows, updating instead the rows whose on_conflict columns match"""
+        self._data_to_upsert = data
+        self._on_conflict = tuple(column.strip() for column in on_conflict.split(","))
+        return self
+    
     def update(self, data: Dict):
         """Update data"""
         self._data_to_update = data
@@ -230,11 +567,30 @@ class TableQueryBuilder:
         self._filters.append(("in", field, values))
         return self
     
+    def gt(self, field: str, value):
+        """Filter by greater than"""
+        self._filters.append(("gt", field, _filter_value(value)))
+        return self
+    
     def gte(self, field: str, value):
         """Filter by greater than or equal"""
-        self._filters.append(("gte", field, value))
+        self._filters.append(("gte", field, _filter_value(value)))
         return self
     
+    def lt(self, field: str, value):
+        """Filter by less than"""
+        self._filters.append(("lt", field, _filter_value(value)))
+        return self
+    
+    def lte(self, field: str, value):
+        """Filter by less than or equal"""
+        self._filters.append(("lte", field, _filter_value(value)))
+        return self
+    
+    def between(self, field: str, low, high):
+        """Filter by low <= field <= high"""
+        return self.gte(field, low).lte(field, high)
+    
     def order(self, field: str, desc: bool = False):
         """Order by field"""
         self._order_by = field
@@ -246,71 +602,738 @@ class TableQueryBuilder:
         self._limit_value = value
         return self
     
+    def group_by(self, *columns: str):
+        """Group rows by columns; use with count()/sum()/avg()/min()/max()"""
+        self._group_by = columns
+        return self
+    
+    def count(self, column: Optional[str] = None, alias: Optional[str] = None):
+        """Count rows per group, or the non-null values of a column"""
+        return self._aggregate("count", column, alias)
+    
+    def sum(self, column: str, alias: Optional[str] = None):
+        """Sum the non-null values of a column per group"""
+        return self._aggregate("sum", column, alias)
+    
+    def avg(self, column: str, alias: Optional[str] = None):
+        """Average the non-null values of a column per group"""
+        return self._aggregate("avg", column, alias)
+    
+    def min(self, column: str, alias: Optional[str] = None):
+        """Smallest non-null value of a column per group"""
+        return self._aggregate("min", column, alias)
+    
+    def max(self, column: str, alias: Optional[str] = None):
+        """Largest non-null value of a column per group"""
+        return self._aggregate("max", column, alias)
+    
+    def _aggregate(self, function: str, column: Optional[str], alias: Optional[str]):
+        if alias is None:
+            alias = function if column is None else f"{function}_{column}"
+        self._aggregates.append((function, column, alias))
+        return self
+    
+    def include_archived(self):
+        """Also read rows evicted by the table's retention policy (slow, reads files)"""
+        self._include_archived = True
+        return self
+    
+    async def execute_async(self):
+        """Execute the query without blocking the event loop (see run_async)"""
+        return await run_async(self.execute)
+    
     def execute(self):
         """Execute the query"""
-        table_data = getattr(self.db, self.table_name, [])
+        table = self.db.get_table(self.table_name)
         
         # Handle insert
-        if self._data_to_insert:
-            new_item = {
-                "id": str(uuid.uuid4()),
-                "created_at": datetime.utcnow().isoformat(),
-                **self._data_to_insert
-            }
-            table_data.append(new_item)
-            return QueryResult([new_item])
+        if self._data_to_insert is not None:
+            new_items = self._new_rows(self._data_to_insert)
+            transaction = self._transaction()
+            with table.lock.write():
+                rids = table.insert_many(new_items)
+                if transaction:
+                    for rid in rids:
+                        transaction.record_insert(table, rid)
+                lsn = self.db._log(("insert", self.table_name, new_items))
+                policy = self.db.retention.get(self.table_name)
+                if policy is not None and policy.is_due(len(table.rows)):
+                    self.db._retention_due.set()
+            self.db._wait_durable(lsn)
+            return QueryResult([view(row) for row in new_items])
+        
+        # Handle upsert
+        if self._data_to_upsert is not None:
+            results, lsn = self._upsert(table)
+            self.db._wait_durable(lsn)
+            return QueryResult([view(row) for row in results])
         
         # Handle update
         if self._data_to_update:
-            updated_items = []
-            for item in table_data:
-                if self._match_filters(item):
-                    item.update(self._data_to_update)
-                    updated_items.append(item)
-            return QueryResult(updated_items)
+            transaction = self._transaction()
+            with table.lock.write():
+                updated_items = []
+                for rid in self._matching_rids(table):
+                    if transaction:
+                        transaction.record_update(table, rid, table.rows[rid])
+                    updated_items.append(table.update(rid, self._data_to_update))
+                lsn = None
+                if updated_items:
+                    lsn = self.db._log(("update", self.table_name, updated_items), tuple(self._data_to_update))
+            self.db._wait_durable(lsn)
+            return QueryResult([view(row) for row in updated_items])
+        
+        if self._aggregates:
+            with table.lock.read():
+                return QueryResult(self._aggregate_rows(table))
+        
+        with self.db.snapshot(self.table_name, *self._select.tables()):
+            return self._select_rows(table)
+    
+    @staticmethod
+    def _new_rows(data: Union[Dict, List[Dict]]) -> List[Dict]:
+        """Rows to insert with generated ids; one call shares one created_at"""
+        rows = [data] if isinstance(data, dict) else data
+        created_at = datetime.utcnow().isoformat()
+        return [{"id": str(uuid.uuid4()), "created_at": created_at, **row} for row in rows]
+    
+    def _upsert(self, table: Table):
+        """Update rows matching on the conflict columns and bulk insert the rest
         
-        # Handle select
-        results = [item for item in table_data if self._match_filters(item)]
+        Returns the final state of every affected row, in input order (rows
+        repeated within one call are merged), and the log LSN to wait for.
+        A row missing a conflict column (or holding None there) matches
+        nothing and is inserted on its own.
+        """
+        data = self._data_to_upsert
+        rows = [data] if isinstance(data, dict) else data
+        columns = self._on_conflict
+        transaction = self._transaction()
+        with table.lock.write():
+            index = table.hash_indexes.get(columns)
+            if index is not None:
+                def find(key):
+                    rids = index.lookup(key)
+                    return rids[0] if rids else None
+            else:
+                # No index on the conflict columns: hash the table once
+                existing = {}
+                for rid, item in table.rows.items():
+                    existing.setdefault(tuple(item.get(column) for column in columns), rid)
+                find = existing.get
+            
+            affected: Dict[tuple, tuple] = {}
+            inserts: List[Dict] = []
+            for row in rows:
+                key = tuple(row.get(column) for column in columns)
+                if None in key:
+                    target = affected[object()] = ("new", len(inserts))
+                    inserts.append(row.copy())
+                    continue
+                target = affected.get(key)
+                if target is None:
+                    rid = find(key)
+                    if rid is None:
+                        target = ("new", len(inserts))
+                        inserts.append({})
+                    else:
+                        target = ("rid", rid)
+                    affected[key] = target
+                if target[0] == "new":
+                    inserts[target[1]].update(row)
+                else:
+                    if transaction:
+                        transaction.record_update(table, target[1], table.rows[target[1]])
+                    table.update(target[1], row)
+            
+            inserts = self._new_rows(inserts)
+            new_rids = table.insert_many(inserts)
+            if transaction:
+                for rid in new_rids:
+                    transaction.record_insert(table, rid)
+            updated = [table.rows[value] for kind, value in affected.values() if kind == "rid"]
+            lsn = None
+            if updated:
+                changed = tuple(dict.fromkeys(column for row in rows for column in row))
+                lsn = self.db._log(("update", self.table_name, updated), changed)
+            if inserts:
+                lsn = self.db._log(("insert", self.table_name, inserts))
+            return [inserts[value] if kind == "new" else table.rows[value]
+                    for kind, value in affected.values()], lsn
+    
+    def _transaction(self) -> Optional[Transaction]:
+        """The open transaction, after checking it covers this table"""
+        transaction = self.db.current_transaction()
+        if transaction is not None:
+            transaction.check_table(self.table_name)
+        return transaction
+    
+    def _select_rows(self, table: Table) -> "QueryResult":
+        """Run the select; the caller holds the read locks"""
+        if self._include_archived and self.db.archive is not None:
+            return QueryResult(self._project(self.table_name, self._rows_with_archive(table), self._select))
         
-        # Apply ordering
+        # Handle select with ordering
         if self._order_by:
-            results = sorted(results, key=lambda x: x.get(self._order_by, ""), reverse=self._order_desc)
+            return QueryResult(self._project(self.table_name, self._ordered_rows(table), self._select))
+        
+        results = [table.rows[rid] for rid in self._matching_rids(table)]
         
         # Apply limit
         if self._limit_value:
             results = results[:self._limit_value]
         
-        return QueryResult(results)
+        return QueryResult(self._project(self.table_name, results, self._select))
     
-    def _match_filters(self, item: Dict) -> bool:
-        """Check if item matches all filters"""
+    def _rows_with_archive(self, table: Table) -> List[Dict]:
+        """Filter, order and limit archived rows followed by the live ones
+        
+        Holding the read lock keeps rows from moving to the archive while the
+        query runs.
+        """
+        results = self._archived_matches()
+        results.extend(table.rows[rid] for rid in self._matching_rids(table))
+        
+        if self._order_by:
+            field = self._order_by
+            results.sort(key=lambda row: (row.get(field) is not None, row.get(field)),
+                         reverse=self._order_desc)
+        if self._limit_value:
+            results = results[:self._limit_value]
+        return results
+    
+    def _archived_matches(self) -> List[Dict]:
+        """Archived rows matching the filters, oldest first
+        
+        Archived segments entirely outside the range filters on created_at
+        are not read.
+        """
+        lower = [value for filter_type, field, value in self._filters
+                 if filter_type in ("gt", "gte") and field == "created_at" and value is not None]
+        upper = [value for filter_type, field, value in self._filters
+                 if filter_type in ("lt", "lte") and field == "created_at" and value is not None]
+        match = self._predicate()
+        segments = self.db.archive.scan(self.table_name, max(lower) if lower else None,
+                                        min(upper) if upper else None)
+        return [row for row in segments if match(row)]
+    
+    def _aggregate_rows(self, table: Table) -> List[Dict]:
+        """Run a group_by()/aggregate query; the caller holds the read lock
+        
+        Returns one row per group with the group columns and the aggregates,
+        ordered by the group values unless order() names an output column.
+        """
+        index = self._aggregate_index(table)
+        if index is not None:
+            groups = self._groups_from_index(index)
+        else:
+            rows = table.rows
+            matches = (rows[rid] for rid in self._matching_rids(table))
+            if self._include_archived and self.db.archive is not None:
+                matches = itertools.chain(self._archived_matches(), matches)
+            groups = self._groups_from_rows(matches)
+        if not groups and not self._group_by:
+            # Without group_by() there is always one result row, as in SQL
+            groups = {(): [0, {column: [0, ExactSum(), None, None] for _, column, _ in self._aggregates if column}]}
+        
+        results = []
+        for key, (row_count, columns) in groups.items():
+            result = dict(zip(self._group_by, key))
+            for function, column, alias in self._aggregates:
+                if column is None:
+                    result[alias] = row_count
+                    continue
+                count, total, smallest, largest = columns[column]
+                total = total.value()
+                if function == "count":
+                    result[alias] = count
+                elif function == "sum":
+                    result[alias] = total if count else None
+                elif function == "avg":
+                    result[alias] = total / count if count else None
+                elif function == "min":
+                    result[alias] = smallest
+                else:
+                    result[alias] = largest
+            results.append(result)
+        
+        field = self._order_by
+        try:
+            if field:
+                results.sort(key=lambda row: (row.get(field) is not None, row.get(field)),
+                             reverse=self._order_desc)
+            else:
+                results.sort(key=lambda row: [(row[column] is not None, row[column]) for column in self._group_by])
+        except TypeError:
+            pass
+        if self._limit_value:
+            results = results[:self._limit_value]
+        return results
+    
+    def _groups_from_rows(self, rows) -> Dict[tuple, list]:
+        """Aggregate rows in one pass: group key -> (rows, {column: [count, ExactSum, min, max]})"""
+        needs = {}
+        for function, column, _ in self._aggregates:
+            if column is not None:
+                needs.setdefault(column, set()).add(function)
+        sums = [column for column, functions in needs.items() if functions & {"sum", "avg"}]
+        mins = [column for column, functions in needs.items() if "min" in functions]
+        maxes = [column for column, functions in needs.items() if "max" in functions]
+        group_by = self._group_by
+        
+        groups: Dict[tuple, list] = {}
+        for row in rows:
+            key = tuple(row.get(column) for column in group_by)
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = [0, {column: [0, ExactSum(), None, None] for column in needs}]
+            state[0] += 1
+            columns = state[1]
+            for column in needs:
+                if row.get(column) is not None:
+                    columns[column][0] += 1
+            for column in sums:
+                value = row.get(column)
+                if value is not None:
+                    columns[column][1].add(value)
+            for column in mins:
+                value = row.get(column)
+                if value is not None and (columns[column][2] is None or value < columns[column][2]):
+                    columns[column][2] = value
+            for column in maxes:
+                value = row.get(column)
+                if value is not None and (columns[column][3] is None or value > columns[column][3]):
+                    columns[column][3] = value
+        return groups
+    
+    def _aggregate_index(self, table: Table) -> Optional[AggregateIndex]:
+        """An aggregate index that can answer this query without a scan
+        
+        One applies when every filter is eq() on one of its group columns, it
+        groups by (at least) the requested columns and sums every aggregated
+        column, and no min()/max() is asked for.
+        """
+        if self._include_archived:
+            return None
+        if any(function in ("min", "max") for function, _, _ in self._aggregates):
+            return None
+        columns = {column for _, column, _ in self._aggregates if column is not None}
+        for index in table.aggregate_indexes.values():
+            if not index.valid or not columns <= set(index.value_columns):
+                continue
+            if not all(column in index.group_columns for column in self._group_by):
+                continue
+            if all(filter_type == "eq" and field in index.group_columns
+                   for filter_type, field, _ in self._filters):
+                return index
+        return None
+    
+    def _groups_from_index(self, index: AggregateIndex) -> Dict[tuple, list]:
+        """Roll the index's groups up to the requested ones, keeping those
+        matching the eq() filters"""
+        positions = {column: position for position, column in enumerate(index.group_columns)}
+        filters = [(positions[field], value) for _, field, value in self._filters]
+        group_positions = [positions[column] for column in self._group_by]
+        value_positions = {column: index.value_columns.index(column)
+                           for _, column, _ in self._aggregates if column is not None}
+        
+        groups: Dict[tuple, list] = {}
+        for key, state in index.groups.items():
+            if any(key[position] != value for position, value in filters):
+                continue
+            group_key = tuple(key[position] for position in group_positions)
+            target = groups.get(group_key)
+            if target is None:
+                target = groups[group_key] = [0, {column: [0, ExactSum(), None, None] for column in value_positions}]
+            target[0] += state[0]
+            for column, position in value_positions.items():
+                target[1][column][0] += state[2 + 2 * position]
+                target[1][column][1].merge(state[1 + 2 * position])
+        return groups
+    
+    def _project(self, table_name: str, rows: List[Dict], spec: SelectSpec) -> List[Mapping]:
+        """Apply the select string: keep the listed columns and add embeds
+        
+        Returns read-only mappings; with select("*") they are the stored rows
+        themselves, not copies.
+        """
+        if spec.is_star:
+            return [view(row) for row in rows]
+        embedded = [(embed.alias, self._join(table_name, rows, embed)) for embed in spec.embeds]
+        columns = spec.columns
+        results = []
+        for position, row in enumerate(rows):
+            if columns is None:
+                item = row.copy()
+            else:
+                item = {column: row.get(column) for column in columns}
+            for alias, values in embedded:
+                item[alias] = values[position]
+            results.append(view(item))
+        return results
+    
+    def _join(self, table_name: str, rows: List[Dict], embed) -> List:
+        """Hash join the related table onto rows, returning one value per row
+        
+        The build side is taken from the related table's hash index on the
+        join column when there is one, otherwise from a single scan of it.
+        """
+        local_column, related_column, to_many = find_relation(table_name, embed.table)
+        related = self.db.get_table(embed.table)
+        
+        keys = set()
+        for row in rows:
+            key = row.get(local_column)
+            if key is not None:
+                try:
+                    keys.add(key)
+                except TypeError:
+                    pass
+        
+        matches: Dict = {}
+        index = related.hash_indexes.get((related_column,))
+        if index is not None:
+            for key in keys:
+                rids = index.lookup((key,))
+                if rids:
+                    matches[key] = [related.rows[rid] for rid in rids]
+        elif keys:
+            for item in related.rows.values():
+                key = item.get(related_column)
+                try:
+                    if key in keys:
+                        matches.setdefault(key, []).append(item)
+                except TypeError:
+                    continue
+        
+        for key, items in matches.items():
+            matches[key] = self._project(embed.table, items, embed.spec)
+        
+        values = []
+        for row in rows:
+            try:
+                found = matches.get(row.get(local_column), [])
+            except TypeError:
+                found = []
+            if to_many:
+                values.append(found)
+            else:
+                values.append(found[0] if found else None)
+        return values
+    
+    def _ordered_rows(self, table: Table) -> List[Dict]:
+        """Ordered (and limited) select
+        
+        Either walks the column's sorted index (only the slice within the
+        range filters on that column) and stops after `limit` matches, or
+        orders the filtered candidates with a heap-based partial sort,
+        whichever is expected to touch fewer rows.
+        """
+        rows = table.rows
+        limit = self._limit_value or None
+        access = self._choose_access(table)
+        
+        walk = self._order_walk(table, access)
+        if walk is not None:
+            match = self._predicate()
+            start, end, nulls = walk
+            results = []
+            for rid in table.sorted_indexes[self._order_by].iter_rids(self._order_desc, start, end, nulls):
+                item = rows[rid]
+                if match(item):
+                    results.append(item)
+                    if limit and len(results) >= limit:
+                        break
+            return results
+        
+        matches = self._filter_rids(table, self._candidates(access))
+        field = self._order_by
+        desc = self._order_desc
+        
+        def sort_key(rid):
+            value = rows[rid].get(field)
+            # Missing/None values sort first, without being compared to values.
+            # The row id breaks ties in insertion order, like a stable sort.
+            return (value is not None, value, -rid if desc else rid)
+        
+        if not limit:
+            ordered = sorted(matches, key=sort_key, reverse=desc)
+        elif desc:
+            # Rows are mostly stored in time order, so descending queries walk
+            # them backwards to keep heap replacements rare
+            ordered = heapq.nlargest(limit, reversed(matches), key=sort_key)
+        else:
+            ordered = heapq.nsmallest(limit, matches, key=sort_key)
+        return [rows[rid] for rid in ordered]
+    
+    def _order_walk(self, table: Table, access: Optional[tuple]) -> Optional[tuple]:
+        """(start, end, nulls) of the order column's sorted index to walk, or
+        None when sorting the candidates of `access` is expected to be cheaper
+        """
+        rows = table.rows
+        limit = self._limit_value or None
+        index = table.sorted_indexes.get(self._order_by)
+        if index is None or not index.valid or not rows:
+            return None
+        span = self._range_slice(index)
+        if span is None:
+            start, end, nulls = 0, len(index._entries), True
+            walk_rows = len(rows)
+        else:
+            (start, end), nulls = span, False
+            walk_rows = max(0, end - start)
+        if access is None:
+            return start, end, nulls
+        candidates = access[1]
+        if not candidates:
+            return None
+        # Rows the walk is expected to visit, assuming matches are spread
+        # evenly through the index
+        walk_cost = walk_rows if not limit else limit * walk_rows / candidates
+        return (start, end, nulls) if walk_cost <= candidates else None
+    
+    def _matching_rids(self, table: Table) -> List[int]:
+        """Row ids matching all filters, in insertion order"""
+        return self._filter_rids(table, self._index_candidates(table))
+    
+    def _filter_rids(self, table: Table, candidates: Optional[List[int]]) -> List[int]:
+        """Check candidate row ids (or the whole table if None) against the filters"""
         if not self._filters:
-            return True
+            return list(table.rows) if candidates is None else candidates
+        match = self._predicate()
+        if candidates is None:
+            return [rid for rid, item in table.rows.items() if match(item)]
+        rows = table.rows
+        return [rid for rid in candidates if match(rows[rid])]
+    
+    def _index_candidates(self, table: Table) -> Optional[List[int]]:
+        """Candidate row ids from the cheapest index covering the filters
+        
+        The ids are still to be checked against every filter; None means no
+        index applies and the table has to be scanned.
+        """
+        return self._candidates(self._choose_access(table))
+    
+    @staticmethod
+    def _candidates(access: Optional[tuple]) -> Optional[List[int]]:
+        """Row ids, in insertion order, of an access path from _choose_access"""
+        if access is None:
+            return None
+        if access[0] == "range":
+            _, _, index, (start, end) = access
+            return sorted(index.iter_rids(start=start, end=end, nulls=False))
+        _, _, index, keys = access
+        if len(keys) == 1:
+            return index.lookup(keys[0])
+        rids = []
+        for key in keys:
+            rids.extend(index.lookup(key))
+        rids.sort()
+        return rids
+    
+    def _choose_access(self, table: Table) -> Optional[tuple]:
+        """The access path yielding the fewest rows, or None for a full scan
         
+        Either ("hash", rows, index, keys) for eq()/in_() filters or
+        ("range", rows, index, (start, end)) for range filters on a column
+        with a sorted index.
+        """
+        best = self._choose_index(table)
+        access = None if best is None else ("hash", best[0], best[1], best[2])
+        for field in dict.fromkeys(field for filter_type, field, _ in self._filters
+                                   if filter_type in RANGE_FILTERS):
+            index = table.sorted_indexes.get(field)
+            if index is None or not index.valid:
+                continue
+            span = self._range_slice(index)
+            if span is None:
+                continue
+            rows = max(0, span[1] - span[0])
+            if access is None or rows < access[1]:
+                access = ("range", rows, index, span)
+        return access
+    
+    def _range_slice(self, index) -> Optional[tuple]:
+        """Slice of a sorted index matching every range filter on its column
+        
+        None if there is no such filter, or a value can't be compared with
+        the indexed ones.
+        """
+        start, end = 0, None
+        for filter_type, field, value in self._filters:
+            if field != index.column or filter_type not in RANGE_FILTERS:
+                continue
+            try:
+                low, high = index.bounds(filter_type, value)
+            except TypeError:
+                return None
+            start = max(start, low)
+            end = high if end is None else min(end, high)
+        if end is None:
+            return None
+        return start, end
+    
+    def _choose_index(self, table: Table) -> Optional[tuple]:
+        """Pick the cheapest hash index covering the eq()/in_() filters
+        
+        Which indexes can serve a query only depends on the filtered columns,
+        so that list is cached per table and query shape; the row counts are
+        compared for every query. Returns (cost, index, keys) or None.
+        """
+        eq_values = {}
+        in_values = {}
         for filter_type, field, value in self._filters:
-            item_value = item.get(field)
-            
             if filter_type == "eq":
-                if item_value != value:
-                    return False
+                eq_values.setdefault(field, value)
             elif filter_type == "in":
-                if item_value not in value:
-                    return False
-            elif filter_type == "gte":
-                if not (item_value and item_value >= value):
-                    return False
+                in_values.setdefault(field, value)
+        if not eq_values and not in_values:
+            return None
+        
+        shape = (tuple(eq_values), tuple(in_values))
+        usable = table.plan_cache.get(shape)
+        if usable is None:
+            usable = []
+            for columns, index in table.hash_indexes.items():
+                if all(column in eq_values for column in columns):
+                    usable.append((index, "eq"))
+                elif len(columns) == 1 and columns[0] in in_values:
+                    usable.append((index, "in"))
+            table.plan_cache[shape] = usable
         
-        return True
+        best = None
+        for index, kind in usable:
+            columns = index.columns
+            if kind == "eq":
+                keys = [tuple(eq_values[column] for column in columns)]
+            else:
+                try:
+                    keys = [(value,) for value in dict.fromkeys(in_values[columns[0]])]
+                except TypeError:
+                    continue
+            cost = sum(index.count(key) for key in keys)
+            if best is None or (cost, -len(columns)) < (best[0], -len(best[1].columns)):
+                best = (cost, index, keys)
+        return best
+    
+    def _predicate(self):
+        """The filters compiled into one function (see app.predicates)"""
+        if self._compiled is None or self._compiled[0] != len(self._filters):
+            self._compiled = (len(self._filters), compile_filters(self._filters))
+        return self._compiled[1]
+    
+    def _match_filters(self, item: Dict) -> bool:
+        """Check if item matches all filters"""
+        return self._predicate()(item)
+    
+    def explain(self) -> Dict:
+        """Describe how this select would run, without running it
+        
+        Shows the access path (hash index or full scan) with the number of
+        rows it yields, how the rows get ordered, and the compiled filter
+        predicate.
+        """
+        table = self.db.get_table(self.table_name)
+        with table.lock.read():
+            access = self._choose_access(table)
+            plan = {
+                "table": self.table_name,
+                "filters": [f"{filter_type}({field})" for filter_type, field, _ in self._filters],
+            }
+            if access is None:
+                plan["access"] = "scan"
+                plan["rows"] = len(table.rows)
+            elif access[0] == "hash":
+                plan["access"] = "hash index"
+                plan["index"] = list(access[2].columns)
+                plan["rows"] = access[1]
+            else:
+                plan["access"] = "sorted index range"
+                plan["index"] = [access[2].column]
+                plan["rows"] = access[1]
+            if self._order_by:
+                if self._order_walk(table, access) is not None:
+                    plan["order"] = f"sorted index walk on {self._order_by}"
+                else:
+                    plan["order"] = "heap partial sort" if self._limit_value else "full sort"
+            if self._aggregates:
+                index = self._aggregate_index(table)
+                plan["aggregate"] = (f"aggregate index on ({', '.join(index.group_columns)})"
+                                     if index is not None else "single pass over the matching rows")
+            if self._include_archived:
+                plan["archive"] = len(self.db.archive.segments(self.table_name)) if self.db.archive else 0
+        plan["predicate"] = predicate_source(tuple((filter_type, field) for filter_type, field, _ in self._filters))
+        return plan
 
 class QueryResult:
-    """Mimics Supabase query result"""
+    """Mimics Supabase query result
+    
+    data holds read-only mappings (aggregate rows are plain dicts): copy a
+    row, e.g. {**row, "extra": ...}, to change it.
+    """
     
     def __init__(self, data: List[Dict]):
         self.data = data
 
-# Global in-memory database instance
-_db = InMemoryDB()
+def _create_db():
+    """Build the global store from the settings (backend, write-ahead log, retention)"""
+    if settings.db_backend == "sqlite":
+        from app.sqlite_db import SQLiteDB
+        return SQLiteDB(settings.sqlite_path)
+    if settings.db_backend != "memory":
+        raise ValueError(f"Unknown db_backend '{settings.db_backend}' (expected memory or sqlite)")
+    wal = None
+    if settings.wal_dir:
+        wal = WriteAheadLog(
+            settings.wal_dir,
+            fsync=settings.wal_fsync,
+            group_commit_ms=settings.wal_group_commit_ms,
+            snapshot_every=settings.wal_snapshot_every
+        )
+    retention = {}
+    if settings.retention_max_rows or settings.retention_max_age_hours:
+        if not settings.archive_dir:
+            raise ValueError("Retention is enabled but archive_dir is not set")
+        policy = RetentionPolicy(
+            max_rows=settings.retention_max_rows or None,
+            max_age_seconds=settings.retention_max_age_hours * 3600 or None,
+            segment_rows=settings.retention_segment_rows
+        )
+        retention = {table_name: policy for table_name in RETENTION_TABLES}
+    archive = SegmentArchive(settings.archive_dir) if retention else None
+    return InMemoryDB(wal=wal, retention=retention, archive=archive)
+
+# Global database instance, created on first use so that importing the app
+# stays cheap (recovering a large write-ahead log can take a while)
+_db = None
+_db_lock = threading.Lock()
 
 def get_db():
-    """Return the in-memory database instance"""
+    """Return the database instance"""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = _create_db()
     return _db
+
+# Threads running the store operations of async endpoints, created on first use
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+async def run_async(operation: Callable, *args):
+    """Run a blocking store operation off the event loop and await its result
+    
+    Operations run on a small executor of their own rather than Starlette's
+    threadpool, so requests waiting on the store hold no thread: only the
+    settings.db_async_workers operations actually running do. Thread-bound
+    state (transaction(), snapshot(), SQLite connections) must be opened and
+    closed within one operation.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.db_async_workers, thread_name_prefix="db-async")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(operation, *args))
@@ -0,0 +1,296 @@
+"""
+Secondary indexes for the in-memory database
+"""
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class HashIndex:
+    """Hash index mapping a tuple of column values to row ids
+
+    Lookups return row ids in ascending order so that rows come back in the
+    same order as a full table scan.
+    """
+
+    def __init__(self, columns: Iterable[str]):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self._buckets: Dict[tuple, Dict[int, None]] = {}
+
+    def key(self, row: Dict) -> Optional[tuple]:
+        """Build the index key for a row (None if the values are unhashable)"""
+        key = tuple(row.get(column) for column in self.columns)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def add(self, rid: int, row: Dict):
+        key = self.key(row)
+        if key is not None:
+            self._buckets.setdefault(key, {})[rid] = None
+
+    def add_many(self, items: Iterable[Tuple[int, Dict]]):
+        buckets = self._buckets
+        columns = self.columns
+        if len(columns) == 1:
+            column = columns[0]
+            keyed = (((row.get(column),), rid) for rid, row in items)
+        else:
+            keyed = ((tuple(row.get(column) for column in columns), rid) for rid, row in items)
+        for key, rid in keyed:
+            try:
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = {}
+                bucket[rid] = None
+            except TypeError:
+                # Unhashable values are not indexed, as in key()
+                pass
+
+    def remove(self, rid: int, row: Dict):
+        key = self.key(row)
+        if key is None:
+            return
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(rid, None)
+            if not bucket:
+                del self._buckets[key]
+
+    def lookup(self, key: tuple) -> List[int]:
+        """Return the row ids stored under a key, in ascending order"""
+        try:
+            bucket = self._buckets.get(key)
+        except TypeError:
+            return []
+        # Buckets are almost always already in order (rows only move between
+        # buckets on update), which makes this sort linear in practice
+        return sorted(bucket) if bucket else []
+
+    def count(self, key: tuple) -> int:
+        """Return the number of rows stored under a key"""
+        try:
+            bucket = self._buckets.get(key)
+        except TypeError:
+            return 0
+        return len(bucket) if bucket else 0
+
+
+# Sorts after every row id, so (value, _AFTER) bounds all entries of a value
+_AFTER = float("inf")
+
+
+class SortedIndex:
+    """Ordered index on a single column
+
+    Non-null values are kept as a sorted list of (value, rid) entries; rows
+    where the column is missing or None are kept apart and sort first.
+    """
+
+    def __init__(self, column: str):
+        self.column = column
+        self._entries: List[tuple] = []
+        self._nulls: Dict[int, None] = {}
+        # Set when a value cannot be ordered against the others (mixed types)
+        self.valid = True
+
+    def add(self, rid: int, row: Dict):
+        value = row.get(self.column)
+        if value is None:
+            self._nulls[rid] = None
+            return
+        try:
+            insort(self._entries, (value, rid))
+        except TypeError:
+            self.valid = False
+
+    def add_many(self, items: Iterable[Tuple[int, Dict]]):
+        """Add several rows with a single re-sort instead of one insort each"""
+        new_entries = []
+        for rid, row in items:
+            value = row.get(self.column)
+            if value is None:
+                self._nulls[rid] = None
+            else:
+                new_entries.append((value, rid))
+        if len(new_entries) < 8:
+            for entry in new_entries:
+                try:
+                    insort(self._entries, entry)
+                except TypeError:
+                    self.valid = False
+            return
+        # Timsort merges the already sorted runs in close to linear time
+        self._entries.extend(new_entries)
+        try:
+            self._entries.sort()
+        except TypeError:
+            self.valid = False
+
+    def remove(self, rid: int, row: Dict):
+        value = row.get(self.column)
+        if value is None:
+            self._nulls.pop(rid, None)
+            return
+        try:
+            position = bisect_left(self._entries, (value, rid))
+        except TypeError:
+            return
+        if position < len(self._entries) and self._entries[position] == (value, rid):
+            del self._entries[position]
+
+    def remove_many(self, rids: Iterable[int]):
+        """Remove several rows with one pass over the entries
+
+        Deleting entries one by one from the front of the list moves the
+        whole list each time, which is what evicting the oldest rows does.
+        """
+        rids = set(rids)
+        for rid in rids:
+            self._nulls.pop(rid, None)
+        self._entries = [entry for entry in self._entries if entry[1] not in rids]
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._nulls)
+
+    def bounds(self, op: str, value) -> Tuple[int, int]:
+        """Slice [start, end) of the non-null entries where `column op value`
+
+        op is one of gt, gte, lt, lte. Raises TypeError if value cannot be
+        compared with the indexed values.
+        """
+        entries = self._entries
+        if op == "gte":
+            return bisect_left(entries, (value,)), len(entries)
+        if op == "gt":
+            return bisect_right(entries, (value, _AFTER)), len(entries)
+        if op == "lte":
+            return 0, bisect_right(entries, (value, _AFTER))
+        if op == "lt":
+            return 0, bisect_left(entries, (value,))
+        raise ValueError(f"Unknown range operator '{op}'")
+
+    def iter_rids(self, desc: bool = False, start: int = 0, end: Optional[int] = None,
+                  nulls: bool = True) -> Iterator[int]:
+        """Yield row ids in column order
+
+        Rows with equal values come out in insertion order in both directions,
+        matching a stable sorted(..., reverse=desc). start/end restrict the
+        walk to a slice from bounds(); nulls=False leaves out the null rows.
+        """
+        entries = self._entries
+        if end is None:
+            end = len(entries)
+        if not desc:
+            if nulls:
+                yield from sorted(self._nulls)
+            for position in range(start, end):
+                yield entries[position][1]
+            return
+        while end > start:
+            first = bisect_left(entries, (entries[end - 1][0],), start, end)
+            for _, rid in entries[first:end]:
+                yield rid
+            end = first
+        if nulls:
+            yield from sorted(self._nulls)
+
+
+class ExactSum:
+    """Sum of numbers that values can be added to and removed from without
+    rounding drift
+
+    Integers are summed exactly; floats are kept as non-overlapping partial
+    sums (Shewchuk's algorithm, as in math.fsum), so value() is the correctly
+    rounded sum of the values currently in it, whatever the order they were
+    added and removed in.
+    """
+
+    __slots__ = ("integer", "partials")
+
+    def __init__(self):
+        self.integer = 0
+        self.partials: List[float] = []
+
+    def add(self, value):
+        if isinstance(value, int):
+            self.integer += value
+            return
+        partials = self.partials
+        kept = 0
+        for partial in partials:
+            if abs(value) < abs(partial):
+                value, partial = partial, value
+            high = value + partial
+            low = partial - (high - value)
+            if low:
+                partials[kept] = low
+                kept += 1
+            value = high
+        partials[kept:] = [value] if value else []
+
+    def merge(self, other: "ExactSum"):
+        self.integer += other.integer
+        for partial in other.partials:
+            self.add(partial)
+
+    def value(self):
+        if not self.partials:
+            return self.integer
+        return math.fsum(self.partials + [self.integer])
+
+
+class AggregateIndex:
+    """Running row count, and sum/count of non-null values, per group
+
+    Keeps group_by() queries that only need count/sum/avg from scanning the
+    table. Group keys are the values of `group_columns`; sums are kept for
+    each of `value_columns` as ExactSums, so they stay equal to a fresh
+    math.fsum of the group's values however many writes went through.
+    """
+
+    def __init__(self, group_columns: Iterable[str], value_columns: Iterable[str]):
+        self.group_columns: Tuple[str, ...] = tuple(group_columns)
+        self.value_columns: Tuple[str, ...] = tuple(value_columns)
+        # Every column whose change affects the index (see Table.update)
+        self.columns = self.group_columns + self.value_columns
+        # key -> [rows, ExactSum of column 1, non-null count of column 1, ...]
+        self.groups: Dict[tuple, list] = {}
+        # Set when a non-numeric value or unhashable key was seen
+        self.valid = True
+
+    def _apply(self, row: Dict, sign: int):
+        key = tuple(row.get(column) for column in self.group_columns)
+        try:
+            state = self.groups.get(key)
+        except TypeError:
+            self.valid = False
+            return
+        if state is None:
+            state = self.groups[key] = [0]
+            for _ in self.value_columns:
+                state += [ExactSum(), 0]
+        state[0] += sign
+        for position, column in enumerate(self.value_columns):
+            value = row.get(column)
+            if value is None:
+                continue
+            if type(value) not in (int, float):
+                self.valid = False
+                continue
+            state[1 + 2 * position].add(value if sign > 0 else -value)
+            state[2 + 2 * position] += sign
+        if not state[0]:
+            del self.groups[key]
+
+    def add(self, rid: int, row: Dict):
+        self._apply(row, 1)
+
+    def add_many(self, items: Iterable[Tuple[int, Dict]]):
+        for _, row in items:
+            self._apply(row, 1)
+
+    def remove(self, rid: int, row: Dict):
+        self._apply(row, -1)
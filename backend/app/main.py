@@ -1,11 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, users, dashboard, batches, stations, workers, voice, analytics, simulator
+from app.auth import shutdown_password_pool
+from app.config import settings
+from app.database import get_db
+from app.routers import auth, users, dashboard, batches, stations, workers, voice, devices, analytics, simulator
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create (or recover) the database before serving the first request
+    get_db()
+    yield
+    # Apply the voice commands still queued, then flush the write-ahead log
+    # (if any) on shutdown
+    voice.close_voice_queue(settings.voice_queue_drain_seconds)
+    get_db().close()
+    shutdown_password_pool()
 
 app = FastAPI(
     title="Production Visibility System",
     description="Real-time production monitoring for Lakshmi Food Products",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -26,6 +42,7 @@ app.include_router(batches.router, prefix="/api/batches", tags=["Batches"])
 app.include_router(stations.router, prefix="/api/stations", tags=["Stations"])
 app.include_router(workers.router, prefix="/api/workers", tags=["Workers"])
 app.include_router(voice.router, prefix="/api/voice", tags=["Voice Commands"])
+app.include_router(devices.router, prefix="/api/devices", tags=["Devices"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 app.include_router(simulator.router, prefix="/api/simulator", tags=["Simulator"])
 
@@ -67,12 +67,29 @@ class VoiceCommand(BaseModel):
     station_id: str
     raw_command: str
     batch_number: Optional[str] = None
+    # Either one makes resends safe: a command seen again within the dedup
+    # window is answered from the first reply instead of being applied twice
+    idempotency_key: Optional[str] = None
+    seq: Optional[int] = None
 
 # Worker Location Update
 class LocationUpdate(BaseModel):
     worker_id: str
     station_id: str
 
+# Device Channel Messages (WebSocket /api/devices/ws/{worker_id})
+class DeviceMessageType(str, Enum):
+    location = "location"
+    voice_command = "voice_command"
+
+class DeviceMessage(BaseModel):
+    seq: int
+    type: DeviceMessageType
+    station_id: Optional[str] = None
+    raw_command: Optional[str] = None
+    batch_number: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
 # Production Progress
 class ProductionProgressUpdate(BaseModel):
     batch_id: str
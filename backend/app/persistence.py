@@ -0,0 +1,296 @@
+"""
+Write-ahead log and snapshots for the in-memory database
+
+Every insert/update is appended to a log before the caller gets its result,
+and the whole store is periodically written to a compact snapshot so that the
+log can be truncated. On start-up the last snapshot is loaded and the log
+written after it is replayed.
+"""
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+FSYNC_POLICIES = ("always", "group", "interval", "none")
+
+# Frame header: payload length, LSN, crc32 of the payload
+_HEADER = struct.Struct("<IQI")
+_SNAPSHOT_FILE = "snapshot.pkl"
+
+
+def _encode_table(rows: List[Dict]) -> tuple:
+    """Store rows as value tuples plus the key tuple ("shape") of each row
+
+    Rows of a table mostly share their keys, so the column names are written
+    once per shape instead of once per row.
+    """
+    shapes: Dict[tuple, int] = {}
+    shape_ids = array("I")
+    values = []
+    for row in rows:
+        keys = tuple(row)
+        shape_id = shapes.get(keys)
+        if shape_id is None:
+            shape_id = shapes[keys] = len(shapes)
+        shape_ids.append(shape_id)
+        values.append(tuple(row.values()))
+    return list(shapes), shape_ids, values
+
+
+def _decode_table(encoded: tuple) -> List[Dict]:
+    shapes, shape_ids, values = encoded
+    return [dict(zip(shapes[shape_id], row)) for shape_id, row in zip(shape_ids, values)]
+
+
+class WriteAheadLog:
+    """Append-only log of table writes plus compact snapshots
+
+    Files in `directory`:
+        snapshot.pkl      every table's rows and the last LSN they include
+        wal-<lsn>.log     log segments, named after their first LSN
+
+    fsync policies:
+        always    fsync before each write returns (per-write durability)
+        group     writers wait for a shared fsync that a flusher thread issues
+                  every `group_commit_ms` (durable, one fsync per group)
+        interval  the flusher fsyncs every `group_commit_ms` but writers don't
+                  wait, so a crash can lose the last interval
+        none      every write reaches the OS, which decides when to flush it
+    """
+
+    def __init__(self, directory: str, fsync: str = "group", group_commit_ms: float = 2.0,
+                 snapshot_every: int = 100_000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'. Must be one of: {list(FSYNC_POLICIES)}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.group_commit_interval = group_commit_ms / 1000
+        self.snapshot_every = snapshot_every
+        # Called (on a background thread) when enough records were logged
+        # since the last snapshot
+        self.on_snapshot_due: Optional[Callable[[], None]] = None
+
+        self._lock = threading.Lock()
+        self._durable = threading.Condition(self._lock)
+        # Held by the flusher while it fsyncs outside _lock, and by rotate()
+        # and close(), so a segment is never closed under that fsync
+        self._sync_lock = threading.Lock()
+        # Set when flushing failed: nothing logged since can be made durable
+        self._error: Optional[OSError] = None
+        self._file = None
+        self._lsn = 0
+        self._written_lsn = 0
+        self._durable_lsn = 0
+        self._since_snapshot = 0
+        self._snapshot_running = False
+        self._closed = False
+        self._flusher = None
+
+    # Recovery
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, "wal-*.log")):
+            first_lsn = int(os.path.basename(path)[4:-4])
+            segments.append((first_lsn, path))
+        return sorted(segments)
+
+    def load_snapshot(self) -> Tuple[int, Dict[str, List[Dict]]]:
+        """Return (last LSN included, rows per table) of the latest snapshot"""
+        path = os.path.join(self.directory, _SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0, {}
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        return snapshot["lsn"], {name: _decode_table(encoded) for name, encoded in snapshot["tables"].items()}
+
+    def replay(self, after_lsn: int) -> Iterator[tuple]:
+        """Yield logged records with an LSN above after_lsn, oldest first
+
+        Reading stops at the first torn or corrupt frame (a crash in the
+        middle of a write); that segment is truncated there so new records
+        don't follow garbage.
+        """
+        self._lsn = after_lsn
+        for _, path in self._segments():
+            with open(path, "r+b") as f:
+                good_offset = 0
+                while True:
+                    header = f.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    length, lsn, checksum = _HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != checksum:
+                        break
+                    good_offset = f.tell()
+                    if lsn > after_lsn:
+                        self._lsn = lsn
+                        yield pickle.loads(payload)
+                if good_offset < os.path.getsize(path):
+                    f.truncate(good_offset)
+        self._written_lsn = self._durable_lsn = self._lsn
+
+    def open(self):
+        """Start appending (after recovery) and start the flusher thread"""
+        self._open_segment(self._lsn + 1)
+        if self.fsync in ("group", "interval"):
+            self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
+    # Appending
+
+    def _open_segment(self, first_lsn: int):
+        path = os.path.join(self.directory, f"wal-{first_lsn:020d}.log")
+        self._file = open(path, "ab")
+
+    def append(self, record: tuple) -> int:
+        """Log a record and return its LSN
+
+        With the "always" policy the record is on disk when this returns;
+        with "group" call wait_durable(lsn) before acknowledging the write.
+        """
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write-ahead log is closed")
+            if self._error is not None:
+                raise RuntimeError("Write-ahead log failed to flush") from self._error
+            self._lsn += 1
+            lsn = self._lsn
+            self._file.write(_HEADER.pack(len(payload), lsn, zlib.crc32(payload)))
+            self._file.write(payload)
+            if self.fsync == "always":
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._written_lsn = self._durable_lsn = lsn
+            elif self.fsync == "none":
+                self._file.flush()
+                self._written_lsn = self._durable_lsn = lsn
+            self._since_snapshot += 1
+            snapshot_due = (self._since_snapshot >= self.snapshot_every
+                            and not self._snapshot_running and self.on_snapshot_due is not None)
+            if snapshot_due:
+                self._snapshot_running = True
+        if snapshot_due:
+            threading.Thread(target=self._run_snapshot, name="wal-snapshot", daemon=True).start()
+        return lsn
+
+    def wait_durable(self, lsn: Optional[int]):
+        """Block until the record with this LSN is fsynced ("group" policy)"""
+        if not lsn or self.fsync != "group":
+            return
+        with self._durable:
+            while self._durable_lsn < lsn and not self._closed and self._error is None:
+                self._durable.wait()
+            if self._durable_lsn < lsn and self._error is not None:
+                raise RuntimeError("Write-ahead log failed to flush") from self._error
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.group_commit_interval)
+            with self._sync_lock:
+                with self._lock:
+                    if self._closed:
+                        return
+                    if self._written_lsn == self._lsn:
+                        continue
+                    target = self._lsn
+                    segment = self._file
+                    try:
+                        segment.flush()
+                    except OSError as e:
+                        self._fail(e)
+                        return
+                    self._written_lsn = target
+                # fsync outside _lock so writers keep appending meanwhile
+                try:
+                    os.fsync(segment.fileno())
+                except OSError as e:
+                    with self._lock:
+                        self._fail(e)
+                    return
+            with self._durable:
+                self._durable_lsn = max(self._durable_lsn, target)
+                self._durable.notify_all()
+
+    def _fail(self, error: OSError):
+        """Record a flush failure and wake the writers waiting on it (called
+        with _lock held)"""
+        self._error = error
+        self._durable.notify_all()
+
+    # Snapshots
+
+    def _run_snapshot(self):
+        try:
+            self.on_snapshot_due()
+        finally:
+            with self._lock:
+                self._snapshot_running = False
+
+    def rotate(self) -> int:
+        """Close the current segment and start a new one
+
+        Returns the last LSN of the closed segment. The caller must make sure
+        no writes are in flight (hold every table lock).
+        """
+        with self._sync_lock, self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            lsn = self._lsn
+            self._written_lsn = lsn
+            self._durable_lsn = max(self._durable_lsn, lsn)
+            self._since_snapshot = 0
+            self._open_segment(lsn + 1)
+            self._durable.notify_all()
+        return lsn
+
+    def write_snapshot(self, tables: Dict[str, List[Dict]], lsn: int):
+        """Durably replace the snapshot, then drop the segments it covers"""
+        path = os.path.join(self.directory, _SNAPSHOT_FILE)
+        temp_path = path + ".tmp"
+        snapshot = {
+            "lsn": lsn,
+            "tables": {name: _encode_table(rows) for name, rows in tables.items()},
+        }
+        with open(temp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        self._fsync_directory()
+        for first_lsn, segment in self._segments():
+            if first_lsn <= lsn:
+                os.remove(segment)
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Flush and fsync everything that was logged"""
+        with self._sync_lock, self._lock:
+            if self._closed or self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._durable_lsn = self._written_lsn = self._lsn
+            self._closed = True
+            self._durable.notify_all()
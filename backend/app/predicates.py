@@ -0,0 +1,50 @@
+"""
+Compiled row predicates for TableQueryBuilder filters
+
+A chain of eq()/in_()/range filters is compiled once per query shape (the
+sequence of filter types and fields) into a plain Python function, so that
+matching a row runs straight-line code instead of re-dispatching on the
+filter type for every row. The filter values are bound per query.
+"""
+from functools import lru_cache
+from typing import Callable, Dict, Sequence, Tuple
+
+# Condition under which a row fails each filter type: `value` is the row's
+# value, `v` the filter's
+_FAILS = {
+    "eq": "value != {v}",
+    "in": "value not in {v}",
+    "gt": "value is None or not value > {v}",
+    "gte": "value is None or not value >= {v}",
+    "lt": "value is None or not value < {v}",
+    "lte": "value is None or not value <= {v}",
+}
+
+
+def predicate_source(shape: Tuple[Tuple[str, str], ...]) -> str:
+    """Source of the function binding filter values to a predicate"""
+    params = ", ".join(f"v{position}" for position in range(len(shape)))
+    lines = [f"def bind({params}):", "    def predicate(row):", "        get = row.get"]
+    for position, (filter_type, field) in enumerate(shape):
+        if filter_type not in _FAILS:
+            raise ValueError(f"Unknown filter type '{filter_type}'")
+        lines.append(f"        value = get({field!r})")
+        lines.append(f"        if {_FAILS[filter_type].format(v=f'v{position}')}:")
+        lines.append("            return False")
+    lines.append("        return True")
+    lines.append("    return predicate")
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=512)
+def compile_shape(shape: Tuple[Tuple[str, str], ...]) -> Callable:
+    """Compile a filter shape; call the result with the filter values"""
+    namespace: Dict = {}
+    exec(compile(predicate_source(shape), f"<filters {shape!r}>", "exec"), namespace)
+    return namespace["bind"]
+
+
+def compile_filters(filters: Sequence[tuple]) -> Callable[[Dict], bool]:
+    """Predicate for a list of (filter_type, field, value) filters"""
+    shape = tuple((filter_type, field) for filter_type, field, _ in filters)
+    return compile_shape(shape)(*(value for _, _, value in filters))
@@ -0,0 +1,76 @@
+"""
+Parsing of Supabase-style select strings
+
+"worker_id, worker_name" selects columns, "*" selects every column and
+"batches(batch_number)" embeds the related batch row with the listed columns.
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+
+class Embed(NamedTuple):
+    """A related table embedded in each result row under `alias`"""
+    alias: str
+    table: str
+    spec: "SelectSpec"
+
+
+class SelectSpec(NamedTuple):
+    """Compiled select string: columns to keep (None = all) and embeds"""
+    columns: Optional[Tuple[str, ...]]
+    embeds: Tuple[Embed, ...]
+
+    @property
+    def is_star(self) -> bool:
+        """True when rows can be returned as stored"""
+        return self.columns is None and not self.embeds
+
+    def tables(self) -> Tuple[str, ...]:
+        """Every embedded table, including nested embeds"""
+        names = []
+        for embed in self.embeds:
+            names.append(embed.table)
+            names.extend(embed.spec.tables())
+        return tuple(names)
+
+
+def _split_top_level(fields: str):
+    """Split on commas that are not inside parentheses"""
+    parts = []
+    depth = 0
+    current = []
+    for char in fields:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                raise ValueError(f"Unbalanced parentheses in select: {fields!r}")
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if depth != 0:
+        raise ValueError(f"Unbalanced parentheses in select: {fields!r}")
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+@lru_cache(maxsize=256)
+def parse_select(fields: str = "*") -> SelectSpec:
+    """Parse a select string once; repeated strings come from the cache"""
+    columns = []
+    star = False
+    embeds = []
+    for part in _split_top_level(fields or "*"):
+        if part == "*":
+            star = True
+        elif part.endswith(")") and "(" in part:
+            name, inner = part[:-1].split("(", 1)
+            alias, _, table = name.strip().rpartition(":")
+            table = table.strip()
+            embeds.append(Embed(alias.strip() or table, table, parse_select(inner.strip() or "*")))
+        else:
+            columns.append(part)
+    return SelectSpec(None if star else tuple(dict.fromkeys(columns)), tuple(embeds))
@@ -0,0 +1,130 @@
+"""
+Bounded retention for append-only tables
+
+worker_activity and voice_commands only ever grow. A RetentionPolicy caps a
+table by row count and/or row age: the oldest rows are evicted a segment at
+a time, written to a gzip-compressed JSON-lines file first, and remain
+queryable with select(...).include_archived().
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class RetentionPolicy:
+    """How many rows (max_rows) and how old rows (max_age_seconds) a table keeps
+
+    Rows are evicted oldest first in segments of segment_rows, so the table
+    holds between max_rows and max_rows + segment_rows rows at steady state.
+    """
+
+    def __init__(self, max_rows: Optional[int] = None, max_age_seconds: Optional[float] = None,
+                 segment_rows: int = 10_000):
+        self.max_rows = max_rows
+        self.max_age_seconds = max_age_seconds
+        self.segment_rows = segment_rows
+
+    def is_due(self, row_count: int) -> bool:
+        """Cheap check after inserts: is a whole segment over the row limit?"""
+        return bool(self.max_rows) and row_count >= self.max_rows + self.segment_rows
+
+    def expired_segment(self, rows: Dict[int, Dict]) -> List[Tuple[int, Dict]]:
+        """The oldest rows to evict now, as (rid, row) pairs (empty if none)"""
+        segment = []
+        if self.max_rows and len(rows) - self.segment_rows >= self.max_rows:
+            for item in rows.items():
+                segment.append(item)
+                if len(segment) >= self.segment_rows:
+                    break
+            return segment
+        if self.max_age_seconds:
+            cutoff = (datetime.utcnow() - timedelta(seconds=self.max_age_seconds)).isoformat()
+            for rid, row in rows.items():
+                created_at = row.get("created_at")
+                if created_at is None or created_at >= cutoff or len(segment) >= self.segment_rows:
+                    break
+                segment.append((rid, row))
+        return segment
+
+
+class SegmentArchive:
+    """Compressed files holding evicted rows, one file per segment
+
+    Each table has a directory with its segment files and an index.jsonl
+    listing them with their row count and created_at range, so that queries
+    can skip segments outside the time window they ask for.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segments: Dict[str, List[Dict]] = {}
+
+    def _table_dir(self, table_name: str) -> str:
+        return os.path.join(self.directory, table_name)
+
+    def segments(self, table_name: str) -> List[Dict]:
+        """Index entries of a table's archived segments, oldest first"""
+        with self._lock:
+            if table_name not in self._segments:
+                entries = []
+                index_path = os.path.join(self._table_dir(table_name), "index.jsonl")
+                if os.path.exists(index_path):
+                    with open(index_path, encoding="utf-8") as f:
+                        entries = [json.loads(line) for line in f if line.strip()]
+                self._segments[table_name] = entries
+            return list(self._segments[table_name])
+
+    def write_segment(self, table_name: str, rows: List[Dict]) -> Dict:
+        """Durably write rows to a new segment file and add it to the index"""
+        self.segments(table_name)
+        table_dir = self._table_dir(table_name)
+        os.makedirs(table_dir, exist_ok=True)
+        file_name = f"segment-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+        path = os.path.join(table_dir, file_name)
+        with open(path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str).encode("utf-8"))
+                    f.write(b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        created = [row["created_at"] for row in rows if row.get("created_at")]
+        entry = {
+            "file": file_name,
+            "rows": len(rows),
+            "first_created_at": min(created) if created else None,
+            "last_created_at": max(created) if created else None,
+        }
+        with self._lock:
+            with open(os.path.join(table_dir, "index.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._segments[table_name].append(entry)
+        return entry
+
+    def scan(self, table_name: str, created_after: Optional[str] = None,
+             created_before: Optional[str] = None) -> Iterator[Dict]:
+        """Yield archived rows, oldest segment first
+
+        Segments whose rows are all older than created_after, or all newer
+        than created_before, are skipped without being opened.
+        """
+        table_dir = self._table_dir(table_name)
+        for entry in self.segments(table_name):
+            first = entry.get("first_created_at")
+            last = entry.get("last_created_at")
+            if created_after is not None and last is not None and last < created_after:
+                continue
+            if created_before is not None and first is not None and first > created_before:
+                continue
+            with gzip.open(os.path.join(table_dir, entry["file"]), "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from app.auth import get_current_user
 from app.database import get_db
 from datetime import datetime, timedelta
+from typing import Optional
 
 router = APIRouter()
 
@@ -10,25 +11,21 @@ def get_productivity_data(current_user: dict = Depends(get_current_user)):
     """Worker productivity analytics"""
     db = get_db()
     
-    workers = db.table("workers").select("worker_id, worker_name, station_id, productivity_score, total_tasks_completed").eq("is_active", True).execute()
+    with db.snapshot("workers"):
+        workers = db.table("workers").select("worker_id, worker_name, station_id, productivity_score, total_tasks_completed").eq("is_active", True).execute()
+        
+        # Per-station averages and totals are computed by the store
+        stats = db.table("workers").eq("is_active", True).group_by("station_id").avg("productivity_score").sum("total_tasks_completed").execute()
     
-    # Group by station
     station_productivity = {}
+    for row in stats.data:
+        station_productivity[row["station_id"]] = {
+            "workers": [],
+            "average_score": row["avg_productivity_score"] or 0,
+            "total_tasks": row["sum_total_tasks_completed"] or 0
+        }
     for worker in workers.data:
-        station = worker["station_id"]
-        if station not in station_productivity:
-            station_productivity[station] = {
-                "workers": [],
-                "average_score": 0,
-                "total_tasks": 0
-            }
-        station_productivity[station]["workers"].append(worker)
-        station_productivity[station]["total_tasks"] += worker["total_tasks_completed"]
-    
-    # Calculate averages
-    for station in station_productivity:
-        scores = [w["productivity_score"] for w in station_productivity[station]["workers"]]
-        station_productivity[station]["average_score"] = sum(scores) / len(scores) if scores else 0
+        station_productivity[worker["station_id"]]["workers"].append(worker)
     
     return {
         "workers": workers.data,
@@ -36,28 +33,24 @@ def get_productivity_data(current_user: dict = Depends(get_current_user)):
     }
 
 @router.get("/wastage")
-def get_wastage_analysis(current_user: dict = Depends(get_current_user)):
-    """Wastage analysis across stations"""
+def get_wastage_analysis(hours: Optional[float] = None, current_user: dict = Depends(get_current_user)):
+    """Wastage analysis across stations, optionally only for work completed in the last `hours`"""
     db = get_db()
     
-    progress = db.table("production_progress").select("station_id, wastage_kg").execute()
+    query = db.table("production_progress").group_by("station_id").sum("wastage_kg").count()
+    if hours:
+        query = query.gte("end_time", datetime.utcnow() - timedelta(hours=hours))
+    progress = query.execute()
     
-    # Group by station
     station_wastage = {}
     for record in progress.data:
-        station = record["station_id"]
-        if station not in station_wastage:
-            station_wastage[station] = {
-                "total_wastage": 0,
-                "count": 0
-            }
-        station_wastage[station]["total_wastage"] += record["wastage_kg"] or 0
-        station_wastage[station]["count"] += 1
-    
-    # Calculate averages
-    for station in station_wastage:
-        count = station_wastage[station]["count"]
-        station_wastage[station]["average_wastage"] = station_wastage[station]["total_wastage"] / count if count > 0 else 0
+        total_wastage = record["sum_wastage_kg"] or 0
+        count = record["count"]
+        station_wastage[record["station_id"]] = {
+            "total_wastage": total_wastage,
+            "count": count,
+            "average_wastage": total_wastage / count if count > 0 else 0
+        }
     
     return station_wastage
 
@@ -98,8 +91,8 @@ def get_cost_analysis(current_user: dict = Depends(get_current_user)):
     ])
     
     # Get wastage cost (simplified)
-    progress = db.table("production_progress").select("wastage_kg").execute()
-    total_wastage_kg = sum([p["wastage_kg"] or 0 for p in progress.data])
+    progress = db.table("production_progress").sum("wastage_kg").execute()
+    total_wastage_kg = progress.data[0]["sum_wastage_kg"] or 0
     wastage_cost = total_wastage_kg * 50  # Assuming ₹50 per kg average
     
     return {
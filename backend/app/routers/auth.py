@@ -1,16 +1,16 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from app.models import UserLogin, Token, UserResponse
-from app.auth import verify_password, create_access_token, get_current_user
+from app.auth import verify_password_async, create_access_token, get_current_user
 from app.database import get_db
 
 router = APIRouter()
 
 @router.post("/login", response_model=Token)
-def login(credentials: UserLogin):
+async def login(credentials: UserLogin):
     db = get_db()
     
     # Get user by email
-    response = db.table("users").select("*").eq("email", credentials.email).execute()
+    response = await db.table("users").select("*").eq("email", credentials.email).execute_async()
     
     if not response.data:
         raise HTTPException(
@@ -20,20 +20,8 @@ def login(credentials: UserLogin):
     
     user = response.data[0]
     
-    # Verify password
-    try:
-        if not verify_password(credentials.password, user["password_hash"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect email or password"
-            )
-    except Exception as e:
-        # Handle invalid password hash format
-        if "hash could not be identified" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Password hash format is invalid. Please run the update_passwords.py script to fix user passwords."
-            )
+    # Verify password (on the password pool; 503 with Retry-After when it is full)
+    if not await verify_password_async(credentials.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
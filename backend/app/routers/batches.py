@@ -15,38 +15,49 @@ def create_batch(batch: BatchCreate, current_user: dict = Depends(get_current_us
     
     db = get_db()
     
-    # Check if batch number exists
-    existing = db.table("batches").select("id").eq("batch_number", batch.batch_number).execute()
-    if existing.data:
-        raise HTTPException(status_code=400, detail="Batch number already exists")
-    
-    # Insert batch
-    response = db.table("batches").insert({
-        "batch_number": batch.batch_number,
-        "product_name": batch.product_name,
-        "start_date": batch.start_date,
-        "end_date": batch.end_date,
-        "target_quantity_kg": batch.target_quantity_kg,
-        "raw_material_kg": batch.raw_material_kg,
-        "current_station": "STATION_1",
-        "overall_status": "not_started"
-    }).execute()
-    
-    if response.data:
-        batch_data = response.data[0]
-        
-        # Create production progress records for all 8 stations
-        stations = ["STATION_1", "STATION_2", "STATION_3", "STATION_4", 
-                   "STATION_5", "STATION_6", "STATION_7", "STATION_8"]
+    # Create the batch and its progress rows atomically
+    with db.transaction("batches", "production_progress"):
+        # Check if batch number exists
+        existing = db.table("batches").select("id").eq("batch_number", batch.batch_number).execute()
+        if existing.data:
+            raise HTTPException(status_code=400, detail="Batch number already exists")
         
-        for station in stations:
-            db.table("production_progress").insert({
-                "batch_id": batch_data["id"],
-                "station_id": station,
-                "status": "pending" if station != "STATION_1" else "in_progress"
-            }).execute()
+        # Insert batch
+        response = db.table("batches").insert({
+            "batch_number": batch.batch_number,
+            "product_name": batch.product_name,
+            "start_date": batch.start_date,
+            "end_date": batch.end_date,
+            "target_quantity_kg": batch.target_quantity_kg,
+            "current_quantity_kg": 0,
+            "raw_material_kg": batch.raw_material_kg,
+            "current_station": "STATION_1",
+            "overall_status": "not_started"
+        }).execute()
         
-        return BatchResponse(**batch_data)
+        if response.data:
+            batch_data = response.data[0]
+            
+            # Create production progress records for all 8 stations in one bulk insert
+            stations = ["STATION_1", "STATION_2", "STATION_3", "STATION_4", 
+                       "STATION_5", "STATION_6", "STATION_7", "STATION_8"]
+            
+            db.table("production_progress").insert([
+                {
+                    "batch_id": batch_data["id"],
+                    "station_id": station,
+                    "status": "pending" if station != "STATION_1" else "in_progress",
+                    "input_quantity_kg": 0,
+                    "output_quantity_kg": 0,
+                    "wastage_kg": 0,
+                    "workers_assigned": 0,
+                    "start_time": None,
+                    "end_time": None
+                }
+                for station in stations
+            ]).execute()
+            
+            return BatchResponse(**batch_data)
     
     raise HTTPException(status_code=500, detail="Failed to create batch")
 
@@ -81,14 +92,14 @@ def get_batch_progress(batch_id: str, current_user: dict = Depends(get_current_u
     # Get progress for all stations
     progress = db.table("production_progress").select("*").eq("batch_id", batch_id).execute()
     
-    # Enrich progress with station names
-    stations_map = {s["station_id"]: s["station_name"] for s in db.table("stations").select("*").execute().data}
+    # Enrich progress with station names (rows are read-only, so each
+    # enriched row is built once instead of copied and then modified)
+    stations_map = {s["station_id"]: s["station_name"] for s in db.table("stations").select("station_id, station_name").execute().data}
     
-    progress_data = []
-    for prog in progress.data:
-        prog_copy = prog.copy()
-        prog_copy["station_name"] = stations_map.get(prog["station_id"], prog["station_id"])
-        progress_data.append(prog_copy)
+    progress_data = [
+        {**prog, "station_name": stations_map.get(prog["station_id"], prog["station_id"])}
+        for prog in progress.data
+    ]
     
     return {
         "batch": batch.data[0],
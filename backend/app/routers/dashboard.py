@@ -1,29 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.auth import get_current_user
-from app.database import get_db
+from app.auth import get_current_user_async
+from app.database import get_db, run_async
 from typing import List, Dict
 
 router = APIRouter()
 
 @router.get("/owner")
-def get_owner_dashboard(current_user: dict = Depends(get_current_user)):
+async def get_owner_dashboard(current_user: dict = Depends(get_current_user_async)):
     """Owner sees everything - all 8 stations"""
     if current_user.get("role") not in ["admin", "owner"]:
         raise HTTPException(status_code=403, detail="Owner access required")
     
     db = get_db()
     
-    # Get all stations with current status
-    stations = db.table("stations").select("*").execute()
-    
-    # Get active batches
-    batches = db.table("batches").select("*").eq("overall_status", "in_progress").execute()
-    
-    # Get unresolved alerts (most recent first)
-    alerts = db.table("alerts").select("*").eq("is_resolved", False).order("created_at", desc=True).limit(10).execute()
-    
-    # Get total workers with all required fields
-    workers = db.table("workers").select("id, worker_id, worker_name, station_id, productivity_score, total_tasks_completed, is_active").eq("is_active", True).execute()
+    def read():
+        # Read all tables from one consistent state
+        with db.snapshot("stations", "batches", "alerts", "workers"):
+            # Get all stations with current status
+            stations = db.table("stations").select("*").execute()
+            
+            # Get active batches
+            batches = db.table("batches").select("*").eq("overall_status", "in_progress").execute()
+            
+            # Get unresolved alerts (most recent first)
+            alerts = db.table("alerts").select("*").eq("is_resolved", False).order("created_at", desc=True).limit(10).execute()
+            
+            # Get total workers with all required fields
+            workers = db.table("workers").select("id, worker_id, worker_name, station_id, productivity_score, total_tasks_completed, is_active").eq("is_active", True).execute()
+        return stations, batches, alerts, workers
+    
+    # The snapshot is held by one thread, so the whole read runs as one operation
+    stations, batches, alerts, workers = await run_async(read)
     
     # Calculate statistics
     total_workers = len(workers.data)
@@ -44,7 +51,7 @@ def get_owner_dashboard(current_user: dict = Depends(get_current_user)):
     }
 
 @router.get("/manager/{manager_id}")
-def get_manager_dashboard(manager_id: str, current_user: dict = Depends(get_current_user)):
+async def get_manager_dashboard(manager_id: str, current_user: dict = Depends(get_current_user_async)):
     """Manager sees only assigned stations"""
     if current_user["role"] not in ["admin", "owner", "manager"]:
         raise HTTPException(status_code=403, detail="Manager access required")
@@ -52,24 +59,30 @@ def get_manager_dashboard(manager_id: str, current_user: dict = Depends(get_curr
     db = get_db()
     
     # Get manager's assigned stations
-    manager = db.table("managers").select("assigned_stations").eq("user_id", manager_id).execute()
+    manager = await db.table("managers").select("assigned_stations").eq("user_id", manager_id).execute_async()
     
     if not manager.data:
         raise HTTPException(status_code=404, detail="Manager not found")
     
     assigned_stations = manager.data[0]["assigned_stations"]
     
-    # Get station details
-    stations = db.table("stations").select("*").in_("station_id", assigned_stations).execute()
-    
-    # Get workers in assigned stations
-    workers = db.table("workers").select("*").in_("station_id", assigned_stations).eq("is_active", True).execute()
-    
-    # Get batches currently at assigned stations
-    batches = db.table("batches").select("*").in_("current_station", assigned_stations).execute()
-    
-    # Get alerts for assigned stations
-    alerts = db.table("alerts").select("*").in_("station_id", assigned_stations).eq("is_resolved", False).execute()
+    def read():
+        # Read all tables from one consistent state
+        with db.snapshot("stations", "workers", "batches", "alerts"):
+            # Get station details
+            stations = db.table("stations").select("*").in_("station_id", assigned_stations).execute()
+            
+            # Get workers in assigned stations
+            workers = db.table("workers").select("*").in_("station_id", assigned_stations).eq("is_active", True).execute()
+            
+            # Get batches currently at assigned stations
+            batches = db.table("batches").select("*").in_("current_station", assigned_stations).execute()
+            
+            # Get alerts for assigned stations
+            alerts = db.table("alerts").select("*").in_("station_id", assigned_stations).eq("is_resolved", False).execute()
+        return stations, workers, batches, alerts
+    
+    stations, workers, batches, alerts = await run_async(read)
     
     return {
         "assigned_stations": assigned_stations,
@@ -80,7 +93,7 @@ def get_manager_dashboard(manager_id: str, current_user: dict = Depends(get_curr
     }
 
 @router.get("/stats")
-def get_statistics(current_user: dict = Depends(get_current_user)):
+async def get_statistics(current_user: dict = Depends(get_current_user_async)):
     """Overall statistics"""
     db = get_db()
     
@@ -88,19 +101,19 @@ def get_statistics(current_user: dict = Depends(get_current_user)):
     from datetime import date
     today = str(date.today())
     
-    batches_today = db.table("batches").select("*").gte("start_date", today).execute()
-    completed_today = db.table("batches").select("*").eq("overall_status", "completed").gte("start_date", today).execute()
+    batches_today = await db.table("batches").gte("start_date", today).count().execute_async()
+    completed_today = await db.table("batches").eq("overall_status", "completed").gte("start_date", today).count().execute_async()
     
     # Average productivity
-    workers = db.table("workers").select("productivity_score").eq("is_active", True).execute()
-    avg_productivity = sum([w["productivity_score"] for w in workers.data]) / len(workers.data) if workers.data else 0
+    workers = await db.table("workers").eq("is_active", True).avg("productivity_score").execute_async()
+    avg_productivity = workers.data[0]["avg_productivity_score"] or 0
     
     # Current inventory
-    inventory = db.table("inventory").select("*").execute()
+    inventory = await db.table("inventory").select("*").execute_async()
     
     return {
-        "batches_today": len(batches_today.data),
-        "completed_today": len(completed_today.data),
+        "batches_today": batches_today.data[0]["count"],
+        "completed_today": completed_today.data[0]["count"],
         "average_productivity": round(avg_productivity, 2),
         "inventory_items": len(inventory.data),
         "low_stock_items": len([i for i in inventory.data if i["quantity"] < i["min_threshold"]])
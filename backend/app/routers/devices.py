@@ -0,0 +1,122 @@
+import json
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from typing import Optional
+from app.database import get_db
+from app.models import DeviceMessage, DeviceMessageType, VoiceCommand
+from app.routers.voice import submit_voice_command
+from app.routers.workers import move_worker
+
+router = APIRouter()
+
+async def handle_device_message(worker_id: str, station_id: Optional[str], message: DeviceMessage) -> dict:
+    """Apply one message of a device, the same way as the HTTP endpoints,
+    and build its reply"""
+    try:
+        if message.type == DeviceMessageType.location:
+            if not message.station_id:
+                raise HTTPException(status_code=422, detail="station_id is required")
+            status_code, result = 200, await move_worker(worker_id, message.station_id)
+        else:
+            if not message.raw_command:
+                raise HTTPException(status_code=422, detail="raw_command is required")
+            if not (message.station_id or station_id):
+                raise HTTPException(status_code=422, detail="station_id is required until a location is sent")
+            status_code, result = await submit_voice_command(VoiceCommand(
+                worker_id=worker_id,
+                station_id=message.station_id or station_id,
+                raw_command=message.raw_command,
+                batch_number=message.batch_number,
+                idempotency_key=message.idempotency_key
+            ))
+    except HTTPException as e:
+        reply = {"type": "error", "seq": message.seq, "status": e.status_code, "detail": e.detail}
+        if e.headers and "Retry-After" in e.headers:
+            reply["retry_after"] = int(e.headers["Retry-After"])
+        return reply
+    except Exception as e:
+        print(f"⚠️ Error handling device message from {worker_id}: {str(e)}")
+        return {"type": "error", "seq": message.seq, "status": 500, "detail": str(e)}
+    return {"type": "ack", "seq": message.seq, "status": status_code, "result": result}
+
+@router.websocket("/ws/{worker_id}")
+async def device_channel(websocket: WebSocket, worker_id: str):
+    """
+    Long-lived channel of a worker device (no auth required, like the HTTP
+    endpoints the simulators use)
+    
+    The device sends JSON messages numbered with an increasing seq:
+    - {"seq": 1, "type": "location", "station_id": "STATION_2"}
+    - {"seq": 2, "type": "voice_command", "raw_command": "Starting washing batch 5", "batch_number": "BATCH_001"}
+      (station_id defaults to the device's last location)
+    
+    and gets one reply per message, in order, carrying its seq:
+    - {"type": "ack", "seq": 2, "status": 200, "result": {...}}, the body the HTTP endpoint would return
+    - {"type": "error", "seq": 2, "status": 503, "detail": "...", "retry_after": 1}
+    
+    A message resent with the seq last acknowledged gets the same reply
+    again without being applied twice; an older seq is refused with 409.
+    Both only hold within one connection (seq starts over at 1 on each);
+    a device that may resend a voice command after reconnecting gives it
+    an idempotency_key, which is deduplicated across connections for
+    settings.voice_dedup_window_seconds.
+    
+    An unknown worker_id gets the connection accepted, then closed with
+    code 4404.
+    """
+    db = get_db()
+    worker = await db.table("workers").select("station_id").eq("worker_id", worker_id).execute_async()
+    # Accept before closing: a close before accept() reaches the device as
+    # a plain HTTP 403 and the 4404 code would be lost
+    await websocket.accept()
+    if not worker.data:
+        await websocket.close(code=4404, reason="Worker not found")
+        return
+    
+    station_id = worker.data[0].get("station_id")
+    last_seq = 0
+    last_reply = None
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            text = frame.get("text")
+            if text is None:
+                # A binary frame: refused like malformed JSON, the channel stays open
+                await websocket.send_json({"type": "error", "seq": None, "status": 422,
+                                           "detail": "Messages must be JSON text frames"})
+                continue
+            try:
+                data = json.loads(text)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "seq": None, "status": 422, "detail": str(e)})
+                continue
+            try:
+                message = DeviceMessage.model_validate(data)
+            except ValidationError as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "seq": data.get("seq") if isinstance(data, dict) else None,
+                    "status": 422,
+                    "detail": e.errors(include_url=False, include_context=False)
+                })
+                continue
+            
+            if message.seq <= last_seq:
+                if message.seq == last_seq and last_reply is not None:
+                    await websocket.send_json({**last_reply, "duplicate": True})
+                else:
+                    await websocket.send_json({
+                        "type": "error", "seq": message.seq, "status": 409,
+                        "detail": f"seq must be greater than {last_seq}"
+                    })
+                continue
+            
+            reply = await handle_device_message(worker_id, station_id, message)
+            if reply["type"] == "ack" and message.type == DeviceMessageType.location:
+                station_id = message.station_id
+            last_seq, last_reply = message.seq, reply
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
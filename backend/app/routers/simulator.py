@@ -6,7 +6,6 @@ import os
 
 # Add parent directory to path to import simulator modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
-from simulators.run_all import simulate_all_workers
 
 router = APIRouter()
 
@@ -19,5 +18,8 @@ async def run_simulation(background_tasks: BackgroundTasks):
     """
     Trigger the simulator to run in the background.
     """
+    # Imported here: the simulators pull in requests, which would otherwise
+    # slow down every app start
+    from simulators.run_all import simulate_all_workers
     background_tasks.add_task(simulate_all_workers)
     return {"message": "Simulation started in background", "status": "running"}
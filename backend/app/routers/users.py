@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.models import UserCreate, UserResponse
-from app.auth import hash_password, get_current_user
+from app.auth import hash_password_async, get_current_user
 from app.database import get_db
 from typing import List
 
@@ -12,25 +12,25 @@ def require_admin(current_user: dict = Depends(get_current_user)):
     return current_user
 
 @router.post("", response_model=UserResponse, dependencies=[Depends(require_admin)])
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate):
     db = get_db()
     
     # Check if user exists
-    existing = db.table("users").select("id").eq("email", user.email).execute()
+    existing = await db.table("users").select("id").eq("email", user.email).execute_async()
     if existing.data:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
     
     # Insert user
-    response = db.table("users").insert({
+    response = await db.table("users").insert({
         "email": user.email,
         "password_hash": hashed_password,
         "full_name": user.full_name,
         "role": user.role,
         "phone": user.phone
-    }).execute()
+    }).execute_async()
     
     if response.data:
         user_data = response.data[0]
@@ -1,214 +1,485 @@
-from fastapi import APIRouter, HTTPException
-from app.database import get_db
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.database import get_db, run_async
 from app.models import VoiceCommand
-from app.utils.voice_parser import parse_voice_command
-from app.utils.db_helpers import safe_db_operation
+from app.utils.voice_parser import parse_voice_command, parse_many
+from app.utils.db_helpers import safe_db_operation_async
+from app.utils.cache import TTLCache
+from app.utils.work_queue import KeyedWorkQueue, QueueFull
 from datetime import datetime
+import asyncio
+import random
+import threading
 
 router = APIRouter()
 
-@router.post("/command")
-def process_voice_command(command: VoiceCommand):
-    """Process voice command from simulated worker device"""
+# Tables written while applying a voice command; they are locked together
+VOICE_COMMAND_TABLES = ("voice_commands", "worker_activity", "batches", "production_progress", "stations", "alerts")
+
+def apply_voice_command(db, command: VoiceCommand, parsed: dict):
+    """Apply the effects of a parsed voice command
+    
+    Meant to run inside db.transaction(*VOICE_COMMAND_TABLES) so that a
+    failure half way leaves no partial station/progress state behind.
+    """
+    if parsed["action"] == "starting":
+        # Update worker activity
+        db.table("worker_activity").insert({
+            "worker_id": command.worker_id,
+            "station_id": command.station_id,
+            "activity_type": "task_start",
+            "description": f"Started {parsed['entity']} at {command.station_id}",
+            "batch_number": command.batch_number
+        }).execute()
+        
+        # Update production progress if batch number is present
+        if command.batch_number:
+            batch = db.table("batches").select("*").eq("batch_number", command.batch_number).execute()
+            if batch.data:
+                batch_id = batch.data[0]["id"]
+                batch_data = batch.data[0]
+                
+                # Calculate realistic input quantities based on station
+                # Start with target quantity and apply station-specific processing
+                target_qty = batch_data.get("target_quantity_kg", 200)
+                
+                # Station-specific quantity calculations
+                station_multipliers = {
+                    "STATION_1": 1.35,  # Receiving (with extra for wastage)
+                    "STATION_2": 1.0,   # Washing
+                    "STATION_3": 1.0,   # Blanching
+                    "STATION_4": 1.0,   # Slicing
+                    "STATION_5": 1.0,   # Drying
+                    "STATION_6": 1.0,   # Grinding
+                    "STATION_7": 1.0,   # Packaging
+                    "STATION_8": 1.0    # QC
+                }
+                
+                input_qty = target_qty * station_multipliers.get(command.station_id, 1.0)
+                
+                db.table("production_progress").update({
+                    "status": "in_progress",
+                    "start_time": datetime.utcnow().isoformat(),
+                    "workers_assigned": 1,
+                    "input_quantity_kg": round(input_qty, 2)
+                }).eq("batch_id", batch_id).eq("station_id", command.station_id).execute()
+                
+                # Update batch current station
+                db.table("batches").update({
+                    "current_station": command.station_id,
+                    "overall_status": "in_progress"
+                }).eq("id", batch_id).execute()
+        
+        # Update station status
+        db.table("stations").update({"current_status": "active"}).eq("station_id", command.station_id).execute()
+    
+    elif parsed["action"] == "completed":
+        # Update worker activity
+        db.table("worker_activity").insert({
+            "worker_id": command.worker_id,
+            "station_id": command.station_id,
+            "activity_type": "task_complete",
+            "description": f"Completed {parsed['entity']} at {command.station_id}",
+            "batch_number": command.batch_number
+        }).execute()
+        
+        # Update production progress
+        if command.batch_number:
+            batch = db.table("batches").select("*").eq("batch_number", command.batch_number).execute()
+            if batch.data:
+                batch_id = batch.data[0]["id"]
+                
+                # Get current progress to calculate output from input
+                prog = db.table("production_progress").select("*").eq("batch_id", batch_id).eq("station_id", command.station_id).execute()
+                
+                if prog.data:
+                    input_qty = prog.data[0].get("input_quantity_kg", 200)
+                    
+                    # Calculate output with realistic wastage (5-12%)
+                    wastage_percentage = random.uniform(0.05, 0.12)
+                    wastage = input_qty * wastage_percentage
+                    output_qty = input_qty - wastage
+                    
+                    db.table("production_progress").update({
+                        "status": "completed",
+                        "end_time": datetime.utcnow().isoformat(),
+                        "output_quantity_kg": round(output_qty, 2),
+                        "wastage_kg": round(wastage, 2)
+                    }).eq("batch_id", batch_id).eq("station_id", command.station_id).execute()
+                    
+                    # Update batch current quantity
+                    db.table("batches").update({
+                        "current_quantity_kg": round(output_qty, 2)
+                    }).eq("id", batch_id).execute()
+        
+        # Update station status
+        db.table("stations").update({"current_status": "completed"}).eq("station_id", command.station_id).execute()
+    
+    elif parsed["action"] == "machine_stopped":
+        # Create alert
+        batch_id = None
+        if command.batch_number:
+            batch = db.table("batches").select("id").eq("batch_number", command.batch_number).execute()
+            if batch.data:
+                batch_id = batch.data[0]["id"]
+        
+        db.table("alerts").insert({
+            "alert_type": "machine_failure",
+            "severity": "high",
+            "station_id": command.station_id,
+            "batch_id": batch_id,
+            "message": f"Machine stopped at {command.station_id} - reported by {command.worker_id}",
+            "is_resolved": False
+        }).execute()
+        
+        # Update station status
+        db.table("stations").update({"current_status": "stopped"}).eq("station_id", command.station_id).execute()
+        
+        # Log activity
+        db.table("worker_activity").insert({
+            "worker_id": command.worker_id,
+            "station_id": command.station_id,
+            "activity_type": "machine_issue",
+            "description": command.raw_command,
+            "batch_number": command.batch_number
+        }).execute()
+
+def apply_logged_voice_command(db, command: VoiceCommand, parsed: dict, voice_log):
+    """Apply a command and mark its log row processed, as one unit:
+    if anything fails none of its writes are kept"""
+    with db.transaction(*VOICE_COMMAND_TABLES):
+        apply_voice_command(db, command, parsed)
+        if voice_log and voice_log.data:
+            db.table("voice_commands").update({"processed": True}).eq("id", voice_log.data[0]["id"]).execute()
+
+def voice_log_row(command: VoiceCommand, parsed: dict, processed: bool = False) -> dict:
+    return {
+        "worker_id": command.worker_id,
+        "station_id": command.station_id,
+        "raw_command": command.raw_command,
+        "parsed_action": parsed["action"],
+        "parsed_entity": parsed["entity"],
+        "batch_number": command.batch_number or parsed["batch_number"],
+        "processed": processed
+    }
+
+def apply_voice_command_batch(db, commands: List[VoiceCommand], parsed: List[dict]) -> List[dict]:
+    """Log and apply a list of commands in order, returning a result per command
+    
+    The whole list is applied as one transaction: one lock acquisition and
+    one log record (or commit) instead of one per command. If a command
+    fails, that transaction is rolled back and the commands are applied
+    again one transaction each, so only the failing ones are left out.
+    """
+    try:
+        with db.transaction(*VOICE_COMMAND_TABLES):
+            db.table("voice_commands").insert([
+                voice_log_row(command, fields, processed=True) for command, fields in zip(commands, parsed)
+            ]).execute()
+            for command, fields in zip(commands, parsed):
+                apply_voice_command(db, command, fields)
+        return [{"status": "processed", "parsed": fields} for fields in parsed]
+    except Exception as e:
+        print(f"⚠️ Voice command batch failed ({str(e)}), applying its commands one by one...")
+    
+    results = []
+    for command, fields in zip(commands, parsed):
+        try:
+            voice_log = db.table("voice_commands").insert(voice_log_row(command, fields)).execute()
+            apply_logged_voice_command(db, command, fields, voice_log)
+            results.append({"status": "processed", "parsed": fields})
+        except Exception as e:
+            print(f"⚠️ Error processing voice command from {command.worker_id}: {str(e)}")
+            results.append({"status": "failed", "parsed": fields, "error": str(e)})
+    return results
+
+_voice_queue: Optional[KeyedWorkQueue] = None
+_voice_queue_lock = threading.Lock()
+
+def get_voice_queue() -> KeyedWorkQueue:
+    """Queue of accepted commands (settings.voice_async_processing)
+    
+    Commands of a station, and commands of a batch, are applied in the
+    order they were accepted.
+    """
+    global _voice_queue
+    if _voice_queue is None:
+        with _voice_queue_lock:
+            if _voice_queue is None:
+                _voice_queue = KeyedWorkQueue(settings.voice_queue_workers, settings.voice_queue_max_pending,
+                                              name="voice-queue")
+    return _voice_queue
+
+def close_voice_queue(timeout: Optional[float] = None):
+    """Finish the accepted commands (for up to timeout seconds) on shutdown"""
+    global _voice_queue
+    with _voice_queue_lock:
+        queue, _voice_queue = _voice_queue, None
+    if queue is not None:
+        queue.close(timeout)
+
+def voice_queue_keys(command: VoiceCommand) -> list:
+    keys = [("station", command.station_id)]
+    if command.batch_number:
+        keys.append(("batch", command.batch_number))
+    return keys
+
+def voice_queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Voice command queue is full, please retry shortly",
+        headers={"Retry-After": str(settings.voice_queue_retry_after_seconds)}
+    )
+
+# Replies to the commands that carried an idempotency key or a (worker,
+# seq) pair, kept settings.voice_dedup_window_seconds so that a resend gets
+# the same reply instead of being applied again
+_voice_replies = TTLCache(settings.voice_dedup_size, settings.voice_dedup_window_seconds)
+# Keys of the commands being applied right now -> future of their reply
+# (None if applying failed, and a resend should try again)
+_voice_in_flight: Dict[tuple, asyncio.Future] = {}
+
+def voice_dedup_key(command: VoiceCommand, idempotency_key: Optional[str] = None) -> Optional[tuple]:
+    key = idempotency_key or command.idempotency_key
+    if key:
+        return ("key", key)
+    if command.seq is not None:
+        return ("seq", command.worker_id, command.seq)
+    return None
+
+def take_voice_claim(key: tuple) -> Tuple[Optional[tuple], Optional[asyncio.Future], Optional[asyncio.Future]]:
+    """(reply, claim, pending) for key, without waiting: the reply already
+    given, or the claim to produce it (a future to pass to
+    settle_voice_reply() once done), or the future of the request applying
+    it right now"""
+    reply = _voice_replies.get(key)
+    if reply is not None:
+        return reply, None, None
+    future = _voice_in_flight.get(key)
+    if future is not None:
+        return None, None, future
+    future = _voice_in_flight[key] = asyncio.get_running_loop().create_future()
+    return None, future, None
+
+async def claim_voice_reply(key: tuple) -> Tuple[Optional[tuple], Optional[asyncio.Future]]:
+    """Either the reply already given for key, or the claim to produce it
+    
+    While another request is applying the same key, waits for its reply;
+    so the caller must not hold other claims (see
+    process_voice_commands_batch).
+    """
+    while True:
+        reply, claim, pending = take_voice_claim(key)
+        if pending is None:
+            return reply, claim
+        await asyncio.shield(pending)
+
+def settle_voice_reply(key: tuple, future: asyncio.Future, reply: Optional[tuple]):
+    """Publish the reply of a claimed key (None: applying failed, don't keep it)"""
+    if reply is not None:
+        _voice_replies.set(key, reply)
+    if _voice_in_flight.get(key) is future:
+        del _voice_in_flight[key]
+    future.set_result(reply)
+
+def voice_reply_body(command: VoiceCommand, parsed: dict, accepted: bool = False) -> dict:
+    return {
+        "message": "Voice command accepted" if accepted else "Voice command processed",
+        "parsed": parsed,
+        "worker_id": command.worker_id,
+        "station_id": command.station_id
+    }
+
+async def submit_voice_command(command: VoiceCommand, idempotency_key: Optional[str] = None) -> Tuple[int, dict]:
+    """Log and apply (or queue) a voice command; returns the status code and
+    body of the reply
+    
+    With settings.voice_async_processing the command is only logged here
+    and answered with 202; its effects are applied by the voice queue.
+    A command whose idempotency key, or (worker_id, seq), was seen within
+    settings.voice_dedup_window_seconds gets the first reply back, marked
+    duplicate, and is not applied again.
+    """
+    key = voice_dedup_key(command, idempotency_key)
+    if key is None:
+        status_code, body, applied = await apply_voice_command_once(command)
+        return status_code, body
+    
+    reply, claim = await claim_voice_reply(key)
+    if reply is not None:
+        status_code, body = reply
+        return status_code, {**body, "duplicate": True}
+    reply = None  # if applying raises or fails
+    try:
+        status_code, body, applied = await apply_voice_command_once(command)
+        if applied:
+            reply = (status_code, body)
+    finally:
+        settle_voice_reply(key, claim, reply)
+    return status_code, body
+
+async def apply_voice_command_once(command: VoiceCommand) -> Tuple[int, dict, bool]:
+    """Log and apply (or queue) a voice command; returns the status code and
+    body of the reply, and whether its effects were applied (or queued)
+    
+    A failure to apply is still answered with 200, as the command was
+    logged; the flag keeps that reply out of the dedup cache so a resend
+    tries again.
+    """
     db = get_db()
     
     # Parse the command
     parsed = parse_voice_command(command.raw_command)
     
+    queue = get_voice_queue() if settings.voice_async_processing else None
+    if queue is not None and queue.full():
+        # Shed before logging: the device keeps the command and retries
+        raise voice_queue_full()
+    
     # Insert into voice_commands table with retry logic
-    voice_log = safe_db_operation(
-        lambda: db.table("voice_commands").insert({
-            "worker_id": command.worker_id,
-            "station_id": command.station_id,
-            "raw_command": command.raw_command,
-            "parsed_action": parsed["action"],
-            "parsed_entity": parsed["entity"],
-            "batch_number": command.batch_number or parsed["batch_number"],
-            "processed": False
-        }).execute()
+    voice_log = await safe_db_operation_async(
+        lambda: db.table("voice_commands").insert(voice_log_row(command, parsed)).execute_async()
     )
     
     if not voice_log or not voice_log.data:
         # If insert fails, still try to process the command but log it
         print(f"⚠️ Failed to log voice command from {command.worker_id}, but continuing processing...")
     
-    # Process the command with error handling
+    if queue is not None:
+        try:
+            queue.submit(voice_queue_keys(command), apply_logged_voice_command, db, command, parsed, voice_log)
+        except QueueFull:
+            # Filled up while logging; the row stays unprocessed
+            raise voice_queue_full()
+        return 202, voice_reply_body(command, parsed, accepted=True), True
+    
+    # The transaction belongs to the thread that opens it, so the whole
+    # unit runs as one operation off the event loop
     try:
-        if parsed["action"] == "starting":
-            # Update worker activity
-            safe_db_operation(
-                lambda: db.table("worker_activity").insert({
-                    "worker_id": command.worker_id,
-                    "station_id": command.station_id,
-                    "activity_type": "task_start",
-                    "description": f"Started {parsed['entity']} at {command.station_id}",
-                    "batch_number": command.batch_number
-                }).execute()
-            )
-            
-            # Update production progress if batch number is present
-            if command.batch_number:
-                batch = safe_db_operation(
-                    lambda: db.table("batches").select("*").eq("batch_number", command.batch_number).execute()
-                )
-                if batch and batch.data:
-                    batch_id = batch.data[0]["id"]
-                    batch_data = batch.data[0]
-                    
-                    # Calculate realistic input quantities based on station
-                    # Start with target quantity and apply station-specific processing
-                    import random
-                    target_qty = batch_data.get("target_quantity_kg", 200)
-                    
-                    # Station-specific quantity calculations
-                    station_multipliers = {
-                        "STATION_1": 1.35,  # Receiving (with extra for wastage)
-                        "STATION_2": 1.0,   # Washing
-                        "STATION_3": 1.0,   # Blanching
-                        "STATION_4": 1.0,   # Slicing
-                        "STATION_5": 1.0,   # Drying
-                        "STATION_6": 1.0,   # Grinding
-                        "STATION_7": 1.0,   # Packaging
-                        "STATION_8": 1.0    # QC
-                    }
-                    
-                    input_qty = target_qty * station_multipliers.get(command.station_id, 1.0)
-                    
-                    safe_db_operation(
-                        lambda: db.table("production_progress").update({
-                            "status": "in_progress",
-                            "start_time": datetime.utcnow().isoformat(),
-                            "workers_assigned": 1,
-                            "input_quantity_kg": round(input_qty, 2)
-                        }).eq("batch_id", batch_id).eq("station_id", command.station_id).execute()
-                    )
-                    
-                    # Update batch current station
-                    safe_db_operation(
-                        lambda: db.table("batches").update({
-                            "current_station": command.station_id,
-                            "overall_status": "in_progress"
-                        }).eq("id", batch_id).execute()
-                    )
-            
-            # Update station status
-            safe_db_operation(
-                lambda: db.table("stations").update({"current_status": "active"}).eq("station_id", command.station_id).execute()
-            )
-    
-        elif parsed["action"] == "completed":
-            # Update worker activity
-            safe_db_operation(
-                lambda: db.table("worker_activity").insert({
-                    "worker_id": command.worker_id,
-                    "station_id": command.station_id,
-                    "activity_type": "task_complete",
-                    "description": f"Completed {parsed['entity']} at {command.station_id}",
-                    "batch_number": command.batch_number
-                }).execute()
-            )
-            
-            # Update production progress
-            if command.batch_number:
-                batch = safe_db_operation(
-                    lambda: db.table("batches").select("*").eq("batch_number", command.batch_number).execute()
-                )
-                if batch and batch.data:
-                    batch_id = batch.data[0]["id"]
-                    batch_data = batch.data[0]
-                    
-                    # Get current progress to calculate output from input
-                    prog = safe_db_operation(
-                        lambda: db.table("production_progress").select("*").eq("batch_id", batch_id).eq("station_id", command.station_id).execute()
-                    )
-                    
-                    if prog and prog.data:
-                        import random
-                        input_qty = prog.data[0].get("input_quantity_kg", 200)
-                        
-                        # Calculate output with realistic wastage (5-12%)
-                        wastage_percentage = random.uniform(0.05, 0.12)
-                        wastage = input_qty * wastage_percentage
-                        output_qty = input_qty - wastage
-                        
-                        safe_db_operation(
-                            lambda: db.table("production_progress").update({
-                                "status": "completed",
-                                "end_time": datetime.utcnow().isoformat(),
-                                "output_quantity_kg": round(output_qty, 2),
-                                "wastage_kg": round(wastage, 2)
-                            }).eq("batch_id", batch_id).eq("station_id", command.station_id).execute()
-                        )
-                        
-                        # Update batch current quantity
-                        safe_db_operation(
-                            lambda: db.table("batches").update({
-                                "current_quantity_kg": round(output_qty, 2)
-                            }).eq("id", batch_id).execute()
-                        )
-            
-            # Update station status
-            safe_db_operation(
-                lambda: db.table("stations").update({"current_status": "completed"}).eq("station_id", command.station_id).execute()
-            )
-    
-        elif parsed["action"] == "machine_stopped":
-            # Create alert
-            batch = None
-            batch_id = None
-            if command.batch_number:
-                batch = safe_db_operation(
-                    lambda: db.table("batches").select("id").eq("batch_number", command.batch_number).execute()
-                )
-                if batch and batch.data:
-                    batch_id = batch.data[0]["id"]
-            
-            safe_db_operation(
-                lambda: db.table("alerts").insert({
-                    "alert_type": "machine_failure",
-                    "severity": "high",
-                    "station_id": command.station_id,
-                    "batch_id": batch_id,
-                    "message": f"Machine stopped at {command.station_id} - reported by {command.worker_id}",
-                    "is_resolved": False
-                }).execute()
-            )
-            
-            # Update station status
-            safe_db_operation(
-                lambda: db.table("stations").update({"current_status": "stopped"}).eq("station_id", command.station_id).execute()
-            )
-            
-            # Log activity
-            safe_db_operation(
-                lambda: db.table("worker_activity").insert({
-                    "worker_id": command.worker_id,
-                    "station_id": command.station_id,
-                    "activity_type": "machine_issue",
-                    "description": command.raw_command,
-                    "batch_number": command.batch_number
-                }).execute()
-            )
+        await run_async(apply_logged_voice_command, db, command, parsed, voice_log)
     except Exception as e:
         # Log error but don't fail the request
         print(f"⚠️ Error processing voice command from {command.worker_id}: {str(e)}")
+        return 200, voice_reply_body(command, parsed), False
+    
+    return 200, voice_reply_body(command, parsed), True
+
+@router.post("/command")
+async def process_voice_command(command: VoiceCommand, response: Response,
+                                idempotency_key: Optional[str] = Header(None)):
+    """Process voice command from simulated worker device"""
+    response.status_code, body = await submit_voice_command(command, idempotency_key)
+    return body
+
+@router.post("/commands/batch")
+async def process_voice_commands_batch(commands: List[VoiceCommand]):
+    """Process an ordered list of voice commands buffered by a device or gateway
     
-    # Mark command as processed (with retry)
-    if voice_log and voice_log.data:
-        safe_db_operation(
-            lambda: db.table("voice_commands").update({"processed": True}).eq("id", voice_log.data[0]["id"]).execute()
+    Commands are applied in the order given; the result list has one entry
+    per command, in the same order. Commands already seen (by idempotency
+    key or (worker_id, seq), see submit_voice_command) are not applied
+    again, and their result is marked duplicate. A command another request
+    is applying right now is waited for after the rest of the batch, and
+    applied then only if that request failed.
+    """
+    if len(commands) > settings.voice_batch_max_commands:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.voice_batch_max_commands} commands per batch"
         )
+    db = get_db()
+    
+    parsed = parse_many([command.raw_command for command in commands])
+    
+    results: List[Optional[dict]] = [None] * len(commands)
+    keys = [voice_dedup_key(command) for command in commands]
+    first = {}
+    remaining = []
+    for position, key in enumerate(keys):
+        if key is not None:
+            if key in first:
+                # Repeated within this batch: filled in from the first one below
+                continue
+            first[key] = position
+        remaining.append(position)
+    
+    # Claims are only taken without waiting, and all settled before waiting
+    # on another request: two batches sharing keys in a different order
+    # would otherwise each wait for the other's claims
+    while remaining:
+        claims = {}
+        applied = {}
+        try:
+            fresh = []
+            waiting = []
+            pending = []
+            for position in remaining:
+                key = keys[position]
+                if key is not None:
+                    reply, claim, in_flight = take_voice_claim(key)
+                    if reply is not None:
+                        status_code, body = reply
+                        results[position] = {
+                            "status": "processed" if status_code == 200 else "accepted",
+                            "parsed": body["parsed"],
+                            "duplicate": True
+                        }
+                        continue
+                    if in_flight is not None:
+                        waiting.append(position)
+                        pending.append(in_flight)
+                        continue
+                    claims[key] = claim
+                fresh.append(position)
+            
+            if fresh:
+                applied = dict(zip(fresh, await run_async(apply_voice_command_batch, db,
+                                                          [commands[position] for position in fresh],
+                                                          [parsed[position] for position in fresh])))
+        finally:
+            for key, claim in claims.items():
+                position = first[key]
+                result = applied.get(position)
+                processed = result is not None and result["status"] == "processed"
+                settle_voice_reply(key, claim, (200, voice_reply_body(commands[position], parsed[position]))
+                                   if processed else None)
+        for position, result in applied.items():
+            results[position] = result
+        
+        remaining = waiting
+        if pending:
+            # asyncio.wait() leaves the futures alone if this request is cancelled
+            await asyncio.wait(pending)
+    
+    for position, key in enumerate(keys):
+        if results[position] is None:
+            results[position] = {**results[first[key]], "duplicate": True}
     
     return {
-        "message": "Voice command processed",
-        "parsed": parsed,
-        "worker_id": command.worker_id,
-        "station_id": command.station_id
+        "message": "Voice commands processed",
+        # Counts of the commands applied by this request; duplicates, within
+        # the batch or answered from earlier replies, only count as such
+        "processed": sum(1 for result in results if result["status"] == "processed" and not result.get("duplicate")),
+        "failed": sum(1 for result in results if result["status"] == "failed" and not result.get("duplicate")),
+        "duplicates": sum(1 for result in results if result.get("duplicate")),
+        "results": [
+            {"worker_id": command.worker_id, "station_id": command.station_id, **result}
+            for command, result in zip(commands, results)
+        ]
     }
 
+@router.get("/queue")
+def get_voice_queue_metrics():
+    """Depth, lag and counters of the voice command queue"""
+    metrics = {"enabled": settings.voice_async_processing}
+    if _voice_queue is not None:
+        metrics.update(_voice_queue.metrics())
+    return metrics
+
 @router.get("/commands")
 def get_recent_commands(limit: int = 50):
     """Get recent voice commands"""
     db = get_db()
-    response = db.table("voice_commands").select("*").order("timestamp", desc=True).limit(limit).execute()
-    return response.data
\ No newline at end of file
+    response = db.table("voice_commands").select("*").order("created_at", desc=True).limit(limit).execute()
+    return response.data
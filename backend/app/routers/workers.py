@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from app.auth import get_current_user
 from app.database import get_db
 from app.models import LocationUpdate
-from app.utils.db_helpers import safe_db_operation
+from app.utils.db_helpers import safe_db_operation_async
 from typing import List
 
 router = APIRouter()
@@ -25,36 +25,40 @@ def get_worker(worker_id: str, current_user: dict = Depends(get_current_user)):
     
     return response.data[0]
 
-@router.put("/{worker_id}/location")
-def update_worker_location(worker_id: str, location: LocationUpdate):
-    """Update worker location/station (no auth required for simulators)"""
+async def move_worker(worker_id: str, station_id: str) -> dict:
+    """Record that a worker is now at a station (404 if there is no such worker)"""
     db = get_db()
     
     # Verify worker exists
-    worker = safe_db_operation(
-        lambda: db.table("workers").select("id").eq("worker_id", worker_id).execute()
+    worker = await safe_db_operation_async(
+        lambda: db.table("workers").select("id").eq("worker_id", worker_id).execute_async()
     )
     
     if not worker or not worker.data:
         raise HTTPException(status_code=404, detail="Worker not found")
     
     # Update worker location with retry logic
-    result = safe_db_operation(
+    result = await safe_db_operation_async(
         lambda: db.table("workers").update({
-            "station_id": location.station_id
-        }).eq("worker_id", worker_id).execute()
+            "station_id": station_id
+        }).eq("worker_id", worker_id).execute_async()
     )
     
     if result and result.data:
         return {
             "message": "Worker location updated",
             "worker_id": worker_id,
-            "station_id": location.station_id
+            "station_id": station_id
         }
     
     # Don't raise error if update fails - just return success to avoid breaking simulators
     return {
         "message": "Worker location update attempted",
         "worker_id": worker_id,
-        "station_id": location.station_id
-    }
\ No newline at end of file
+        "station_id": station_id
+    }
+
+@router.put("/{worker_id}/location")
+async def update_worker_location(worker_id: str, location: LocationUpdate):
+    """Update worker location/station (no auth required for simulators)"""
+    return await move_worker(worker_id, location.station_id)
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Compact row storage for the in-memory database
+
+A dict per row is the largest cost of the hot tables (production_progress,
+worker_activity, voice_commands) at millions of rows. A CompactRow keeps the
+values in a tuple and shares the column -> position map with every other row
+of the same shape, and repeated low-cardinality strings (station ids, worker
+ids, statuses) are interned so each distinct value is stored once.
+
+Query results hand out the stored rows themselves, read-only (see view()).
+"""
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Tuple
+
+
+class CompactRow(Mapping):
+    """Read-only mapping over a tuple of values
+
+    Supports the dict methods the database and the routers use (get, keys,
+    values, items, copy, `in`, `**row`); copy() returns a plain dict.
+    """
+
+    __slots__ = ("_fields", "_values")
+
+    def __init__(self, fields: Dict[str, int], values: tuple):
+        self._fields = fields
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._fields[key]]
+
+    def get(self, key, default=None):
+        position = self._fields.get(key)
+        if position is None:
+            return default
+        return self._values[position]
+
+    def __contains__(self, key) -> bool:
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields.keys()
+
+    def values(self) -> tuple:
+        return self._values
+
+    def items(self):
+        return zip(self._fields, self._values)
+
+    def copy(self) -> Dict:
+        return dict(zip(self._fields, self._values))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactRow) and self._fields is other._fields:
+            return self._values == other._values
+        if isinstance(other, Mapping):
+            return self.copy() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CompactRow({self.copy()!r})"
+
+    def __reduce__(self):
+        # Pickle (write-ahead log, snapshots) as a plain dict
+        return dict, (self.copy(),)
+
+
+class RowPacker:
+    """Turns dict rows of one table into CompactRows
+
+    Shapes (the ordered column names of a row) are shared between rows; the
+    values of `interned_columns` go through sys.intern when they are strings.
+    """
+
+    def __init__(self, interned_columns: Iterable[str] = ()):
+        self.interned_columns = frozenset(interned_columns)
+        self._shapes: Dict[tuple, Tuple[Dict[str, int], List[int]]] = {}
+
+    def pack(self, row: Dict) -> CompactRow:
+        keys = tuple(row)
+        shape = self._shapes.get(keys)
+        if shape is None:
+            fields = {key: position for position, key in enumerate(keys)}
+            interned = [position for key, position in fields.items() if key in self.interned_columns]
+            shape = self._shapes[keys] = (fields, interned)
+        fields, interned = shape
+        values = tuple(row.values())
+        if interned:
+            values = list(values)
+            for position in interned:
+                value = values[position]
+                if type(value) is str:
+                    values[position] = sys.intern(value)
+            values = tuple(values)
+        return CompactRow(fields, values)
+
+
+def view(row: Mapping) -> Mapping:
+    """Read-only view of a row for query results, without copying it
+
+    CompactRows are read-only already; dicts are wrapped in a mapping proxy,
+    so a caller mutating a result can't change the stored row.
+    """
+    if type(row) is dict:
+        return MappingProxyType(row)
+    return row
+
+
+def plain(row: Mapping) -> Dict:
+    """The row as a dict: plain dicts are returned as they are"""
+    if type(row) is dict:
+        return row
+    return row.copy()
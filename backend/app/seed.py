@@ -0,0 +1,183 @@
+"""
+Demo data the database is seeded with
+
+The demo users' bcrypt hashes are computed once and kept here: hashing the
+passwords at default cost on every start took over a second of each boot.
+"""
+from datetime import datetime, date
+from typing import Dict, List
+import uuid
+
+# bcrypt hashes (cost 12) of the demo passwords
+DEMO_PASSWORD_HASHES = {
+    "admin123": "$2b$12$FeeVQ6McspTd7yHvWFrjMeyI8SVmwjh54P5BVnNpoUJ7ko7dGO02G",
+    "owner123": "$2b$12$0EAAnq6oFu6WPJ3Adwug.ell5I96YZtMToePt06L8U0QjWjnk0UF2",
+    "manager123": "$2b$12$wQOG0rzbRvtXwPZdYgUq6usv/IXtAzrCTD8oZ1dNCLu7m9Xr85R0e",
+}
+
+def build_demo_data() -> Dict[str, List[Dict]]:
+    """Demo rows per table: users, managers, stations, a batch and workers"""
+    # Create users (password hashes are precomputed, see DEMO_PASSWORD_HASHES)
+    users = [
+        {
+            "id": str(uuid.uuid4()),
+            "email": "admin@lakshmi.com",
+            "password_hash": DEMO_PASSWORD_HASHES["admin123"],
+            "full_name": "Admin User",
+            "role": "admin",
+            "phone": "+91-9876543210",
+            "created_at": datetime.utcnow().isoformat()
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "email": "rajesh@lakshmi.com",
+            "password_hash": DEMO_PASSWORD_HASHES["owner123"],
+            "full_name": "Rajesh Kumar",
+            "role": "owner",
+            "phone": "+91-9876543211",
+            "created_at": datetime.utcnow().isoformat()
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "email": "suresh@lakshmi.com",
+            "password_hash": DEMO_PASSWORD_HASHES["manager123"],
+            "full_name": "Suresh",
+            "role": "manager",
+            "phone": "+91-9876543212",
+            "created_at": datetime.utcnow().isoformat()
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "email": "priya@lakshmi.com",
+            "password_hash": DEMO_PASSWORD_HASHES["manager123"],
+            "full_name": "Priya",
+            "role": "manager",
+            "phone": "+91-9876543213",
+            "created_at": datetime.utcnow().isoformat()
+        }
+    ]
+    
+    # Create managers
+    managers = [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": users[2]["id"],  # Suresh
+            "manager_name": "Suresh",
+            "assigned_stations": ["STATION_1", "STATION_2"],
+            "created_at": datetime.utcnow().isoformat()
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": users[3]["id"],  # Priya
+            "manager_name": "Priya",
+            "assigned_stations": ["STATION_3", "STATION_4"],
+            "created_at": datetime.utcnow().isoformat()
+        }
+    ]
+    
+    # Create stations
+    station_names = {
+        "STATION_1": "Raw Material Receiving",
+        "STATION_2": "Washing & Peeling",
+        "STATION_3": "Blanching",
+        "STATION_4": "Slicing",
+        "STATION_5": "Drying (Tunnel Dryer)",
+        "STATION_6": "Grinding & Sieving",
+        "STATION_7": "Packaging & Mixing",
+        "STATION_8": "Quality Check & Dispatch"
+    }
+    
+    stations = []
+    for station_id, station_name in station_names.items():
+        stations.append({
+            "id": str(uuid.uuid4()),
+            "station_id": station_id,
+            "station_name": station_name,
+            "current_status": "idle",
+            "capacity": 100,
+            "created_at": datetime.utcnow().isoformat()
+        })
+    
+    # Create batches
+    today = str(date.today())
+    batches = [{
+        "id": str(uuid.uuid4()),
+        "batch_number": "BATCH_001",
+        "product_name": "ABC Powder",
+        "start_date": today,
+        "end_date": today,
+        "target_quantity_kg": 200,
+        "current_quantity_kg": 0,
+        "raw_material_kg": 270,
+        "current_station": "STATION_1",
+        "overall_status": "in_progress",
+        "created_at": datetime.utcnow().isoformat()
+    }]
+    
+    # Create production progress entries for BATCH_001
+    batch_id = batches[0]["id"]
+    production_progress = []
+    for station in stations:
+        production_progress.append({
+            "id": str(uuid.uuid4()),
+            "batch_id": batch_id,
+            "station_id": station["station_id"],
+            "status": "pending",
+            "input_quantity_kg": 0,
+            "output_quantity_kg": 0,
+            "wastage_kg": 0,
+            "workers_assigned": 0,
+            "start_time": None,
+            "end_time": None,
+            "created_at": datetime.utcnow().isoformat()
+        })
+    
+    # Create workers
+    worker_names = [
+        "Ravi", "Arun", "Deepak", "Vijay", "Karthik", "Prakash", "Ramesh", "Sunil",
+        "Anitha", "Priya", "Meena", "Lakshmi", "Kavitha", "Divya", "Radha", "Geetha",
+        "Kumar", "Raj", "Mohan", "Ganesh", "Siva", "Bala", "Mani", "Senthil",
+        "Veni", "Devi", "Prema", "Saranya", "Janaki", "Kamala", "Vasantha", "Mala",
+        "Arjun", "Dinesh", "Naveen", "Prabhu", "Raghu", "Saravanan", "Thiru", "Vinod",
+        "Bhavani", "Chitra", "Indira", "Jaya", "Kala", "Latha", "Mythili", "Nila",
+        "Selvi", "Uma"
+    ]
+    
+    stations_config = {
+        "STATION_1": 5,
+        "STATION_2": 8,
+        "STATION_3": 6,
+        "STATION_4": 7,
+        "STATION_5": 10,
+        "STATION_6": 7,
+        "STATION_7": 8,
+        "STATION_8": 4
+    }
+    
+    workers = []
+    worker_index = 0
+    for station_id, count in stations_config.items():
+        for i in range(count):
+            worker_id = f"WORKER_{station_id[-1]}{i+1:02d}"
+            workers.append({
+                "id": str(uuid.uuid4()),
+                "worker_id": worker_id,
+                "worker_name": worker_names[worker_index % len(worker_names)],
+                "station_id": station_id,
+                "manager_id": None,
+                "phone": f"+91-98765{worker_index:05d}",
+                "productivity_score": round(60 + (worker_index % 30), 2),
+                "total_tasks_completed": worker_index * 5,
+                "is_active": True,
+                "created_at": datetime.utcnow().isoformat()
+            })
+            worker_index += 1
+    
+    return {
+        "users": users,
+        "managers": managers,
+        "stations": stations,
+        "batches": batches,
+        "production_progress": production_progress,
+        "workers": workers
+    }
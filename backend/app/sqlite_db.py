@@ -0,0 +1,487 @@
+"""
+SQLite storage engine with the same interface as InMemoryDB
+
+Each table stores its rows as JSON documents, one per SQLite row, and gets
+real B-tree indexes on the JSON expressions of the columns listed in
+TABLE_INDEXES and TABLE_SORTED_INDEXES. Data can be larger than memory and
+survives restarts. Routers use it unchanged through get_db()/table().
+
+Every thread gets its own connection (SQLite connections must not be shared
+between threads). Connections run in WAL mode, so readers don't block the
+writer, and cache prepared statements. Generated SQL is cached per query
+shape.
+"""
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.changes import ChangeFeed, Subscription
+from app.database import (
+    TABLE_INDEXES,
+    TABLE_SORTED_INDEXES,
+    QueryResult,
+    TableQueryBuilder,
+    find_relation,
+)
+from app.rows import view
+from app.seed import build_demo_data
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_RANGE_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+# Keys per IN (...) lookup when embedding related rows
+_JOIN_CHUNK = 500
+
+
+def _identifier(name: str) -> str:
+    """Validate a table or column name before it is put in SQL"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid table or column name '{name}'")
+    return name
+
+
+def _column(field: str) -> str:
+    """SQL expression of a column; indexes are created on the same text"""
+    return f"json_extract(data, '$.{_identifier(field)}')"
+
+
+def _param(value):
+    """Bind value for a comparison with a json_extract() result"""
+    if isinstance(value, (dict, list)):
+        # json_extract returns arrays and objects as minified JSON text
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _filter_shape(filters: List[tuple]) -> tuple:
+    """What the SQL of a filter list depends on (not the values themselves)"""
+    shape = []
+    for filter_type, field, value in filters:
+        if filter_type == "eq":
+            shape.append((filter_type, field, value is None))
+        elif filter_type == "in":
+            values = list(value)
+            shape.append((filter_type, field, (sum(item is not None for item in values), None in values)))
+        else:
+            shape.append((filter_type, field, None))
+    return tuple(shape)
+
+
+@lru_cache(maxsize=1024)
+def _where_sql(shape: tuple) -> str:
+    clauses = []
+    for filter_type, field, variant in shape:
+        column = _column(field)
+        if filter_type == "eq":
+            clauses.append(f"{column} IS NULL" if variant else f"{column} = ?")
+        elif filter_type == "in":
+            count, with_null = variant
+            options = []
+            if count:
+                options.append(f"{column} IN ({', '.join('?' * count)})")
+            if with_null:
+                options.append(f"{column} IS NULL")
+            clauses.append(f"({' OR '.join(options)})" if options else "0")
+        elif filter_type in _RANGE_OPERATORS:
+            clauses.append(f"{column} {_RANGE_OPERATORS[filter_type]} ?")
+        else:
+            raise ValueError(f"Unknown filter type '{filter_type}'")
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def _where_params(filters: List[tuple]) -> list:
+    params = []
+    for filter_type, _, value in filters:
+        if filter_type == "eq":
+            if value is not None:
+                params.append(_param(value))
+        elif filter_type == "in":
+            params.extend(_param(item) for item in value if item is not None)
+        else:
+            params.append(_param(value))
+    return params
+
+
+@lru_cache(maxsize=1024)
+def _select_sql(table_name: str, shape: tuple, order_by: Optional[str], desc: bool, limited: bool) -> str:
+    sql = f"SELECT data FROM {_identifier(table_name)}{_where_sql(shape)} ORDER BY "
+    if order_by:
+        # NULLs sort first ascending and last descending, as in InMemoryDB;
+        # ties keep insertion order in both directions
+        sql += f"{_column(order_by)} {'DESC' if desc else 'ASC'}, "
+    sql += "rowid"
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+
+class SQLiteDB:
+    """Drop-in replacement for InMemoryDB backed by an SQLite file"""
+    
+    def __init__(self, path: str, seed_demo_data: bool = True, cached_statements: int = 512,
+                 busy_timeout_ms: int = 5000):
+        self.path = path
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._tables = set()
+        # Held by the thread writing, so that changes are published in commit order
+        self._write_lock = threading.RLock()
+        # Committed writes, for subscribe()
+        self.changes = ChangeFeed()
+        
+        for table_name in TABLE_INDEXES:
+            self._ensure_table(table_name)
+        if seed_demo_data and self._is_empty():
+            with self.transaction(*TABLE_INDEXES):
+                for table_name, rows in build_demo_data().items():
+                    self.table(table_name).insert(rows).execute()
+    
+    # Connections
+    
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            with self._lock:
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+    
+    def close(self):
+        """Close every thread's connection"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+    
+    def checkpoint(self):
+        """Copy the SQLite write-ahead log into the database file and truncate it"""
+        self.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    # Schema
+    
+    def _ensure_table(self, table_name: str):
+        if table_name in self._tables:
+            return
+        conn = self.connection()
+        with self._lock:
+            if table_name in self._tables:
+                return
+            name = _identifier(table_name)
+            statements = [f"CREATE TABLE IF NOT EXISTS {name} (data TEXT NOT NULL)"]
+            indexes = [("id",), *TABLE_INDEXES.get(table_name, ())]
+            indexes += [(column,) for column in TABLE_SORTED_INDEXES.get(table_name, ())]
+            for columns in dict.fromkeys(tuple(columns) for columns in indexes):
+                index_name = f"{name}__{'__'.join(_identifier(column) for column in columns)}"
+                expressions = ", ".join(_column(column) for column in columns)
+                statements.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {name} ({expressions})")
+            for statement in statements:
+                conn.execute(statement)
+            self._tables.add(table_name)
+    
+    def _is_empty(self) -> bool:
+        return self.connection().execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+    
+    # Transactions
+    
+    def current_transaction(self) -> Optional[set]:
+        """Tables of the transaction open on the calling thread, if any"""
+        return getattr(self._local, "transaction", None)
+    
+    @contextmanager
+    def transaction(self, *table_names: str):
+        """Apply a group of writes atomically (BEGIN IMMEDIATE ... COMMIT)
+        
+        Same contract as InMemoryDB.transaction: nested blocks join the outer
+        one, an exception rolls everything back, and writing to a table that
+        is not listed raises RuntimeError.
+        """
+        current = self.current_transaction()
+        if current is not None:
+            for name in table_names:
+                self.check_table(name)
+            yield current
+            return
+        
+        for name in table_names:
+            self._ensure_table(name)
+        conn = self.connection()
+        if getattr(self._local, "snapshot", False):
+            # Upgrade the open read transaction
+            conn.execute("COMMIT")
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.transaction = set(table_names)
+            self._local.changes = []
+            try:
+                yield self._local.transaction
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+                changes = self._local.changes
+                if changes:
+                    self.changes.publish(("batch", None, [record for record, _ in changes]),
+                                         [changed for _, changed in changes])
+            finally:
+                self._local.transaction = None
+                self._local.changes = None
+                if getattr(self._local, "snapshot", False):
+                    conn.execute("BEGIN")
+    
+    def check_table(self, table_name: str):
+        transaction = self.current_transaction()
+        if transaction is not None and table_name not in transaction:
+            raise RuntimeError(
+                f"Table '{table_name}' is not part of the transaction "
+                f"(locked: {', '.join(sorted(transaction))})"
+            )
+    
+    @contextmanager
+    def write(self, table_name: str):
+        """Write to a table atomically, inside the open transaction if any"""
+        if self.current_transaction() is not None:
+            self.check_table(table_name)
+            yield
+            return
+        with self.transaction(table_name):
+            yield
+    
+    def publish(self, record: tuple, changed: Optional[tuple] = None):
+        """Queue a write for the change feed; it is published on commit"""
+        self._local.changes.append((record, changed))
+    
+    def subscribe(self, *table_names: str, maxsize: int = 10000) -> Subscription:
+        """Receive change events for the listed tables (every table if none)"""
+        return self.changes.subscribe(table_names, maxsize)
+    
+    @contextmanager
+    def snapshot(self, *table_names: str):
+        """Read transaction: every query inside sees the same committed state"""
+        if self.current_transaction() is not None or getattr(self._local, "snapshot", False):
+            yield self
+            return
+        conn = self.connection()
+        conn.execute("BEGIN")
+        self._local.snapshot = True
+        try:
+            yield self
+        finally:
+            self._local.snapshot = False
+            conn.execute("COMMIT")
+    
+    def table(self, table_name: str):
+        """Return a table query builder"""
+        self._ensure_table(table_name)
+        return SQLiteQueryBuilder(self, table_name)
+
+
+class SQLiteQueryBuilder(TableQueryBuilder):
+    """TableQueryBuilder whose queries are compiled to SQL
+    
+    The chained methods (select, eq, in_, range filters, order, limit,
+    group_by, aggregates, insert, update, upsert) are inherited;
+    include_archived() is accepted and has no effect, since nothing is
+    evicted from SQLite.
+    """
+    
+    def execute(self):
+        """Execute the query"""
+        db = self.db
+        conn = db.connection()
+        
+        if self._data_to_insert is not None:
+            new_items = self._new_rows(self._data_to_insert)
+            with db.write(self.table_name):
+                conn.executemany(
+                    f"INSERT INTO {self.table_name} (data) VALUES (?)",
+                    [(json.dumps(row, default=str),) for row in new_items],
+                )
+                db.publish(("insert", self.table_name, new_items))
+            return QueryResult([view(row) for row in new_items])
+        
+        if self._data_to_upsert is not None:
+            with db.write(self.table_name):
+                return QueryResult([view(row) for row in self._upsert_rows(conn)])
+        
+        if self._data_to_update:
+            sql, params = self._update_sql(self._data_to_update)
+            sql += _where_sql(_filter_shape(self._filters)) + " RETURNING rowid, data"
+            with db.write(self.table_name):
+                updated = sorted(conn.execute(sql, params + _where_params(self._filters)).fetchall())
+                updated = [json.loads(data) for _, data in updated]
+                if updated:
+                    db.publish(("update", self.table_name, updated), tuple(self._data_to_update))
+            return QueryResult([view(row) for row in updated])
+        
+        if self._aggregates:
+            return QueryResult(self._aggregate_sql(conn))
+        
+        sql, params = self._query_sql()
+        with db.snapshot():
+            rows = [json.loads(data) for (data,) in conn.execute(sql, params)]
+            return QueryResult(self._project(self.table_name, rows, self._select))
+    
+    def explain(self) -> Dict:
+        """SQLite's query plan for this select"""
+        sql, params = self._aggregate_query() if self._aggregates else self._query_sql()
+        plan = self.db.connection().execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return {
+            "table": self.table_name,
+            "filters": [f"{filter_type}({field})" for filter_type, field, _ in self._filters],
+            "sql": sql,
+            "plan": [row[-1] for row in plan],
+        }
+    
+    def _query_sql(self) -> Tuple[str, list]:
+        sql = _select_sql(self.table_name, _filter_shape(self._filters), self._order_by,
+                          self._order_desc, bool(self._limit_value))
+        params = _where_params(self._filters)
+        if self._limit_value:
+            params.append(self._limit_value)
+        return sql, params
+    
+    def _update_sql(self, changes: Dict) -> Tuple[str, list]:
+        """UPDATE ... SET data = json_set(...) keeping JSON types of the values"""
+        paths = []
+        params = []
+        for column, value in changes.items():
+            paths.append(f"'$.{_identifier(column)}', json(?)")
+            params.append(json.dumps(value, default=str))
+        return f"UPDATE {self.table_name} SET data = json_set(data, {', '.join(paths)})", params
+    
+    def _upsert_rows(self, conn: sqlite3.Connection) -> List[Dict]:
+        """Update rows matching on the conflict columns, insert the others
+        
+        Returns the final state of every affected row in input order (rows
+        repeated within one call are merged), like InMemoryDB. A row missing
+        a conflict column (or holding None there) is inserted on its own.
+        """
+        data = self._data_to_upsert
+        rows = [data] if isinstance(data, dict) else data
+        columns = self._on_conflict
+        find_sql = (f"SELECT rowid FROM {self.table_name} WHERE "
+                    + " AND ".join(f"{_column(column)} = ?" for column in columns)
+                    + " ORDER BY rowid LIMIT 1")
+        
+        affected: Dict[tuple, list] = {}
+        for row in rows:
+            key = tuple(row.get(column) for column in columns)
+            if None in key:
+                affected[object()] = [None, dict(row)]
+                continue
+            target = affected.get(key)
+            if target is None:
+                found = conn.execute(find_sql, [_param(value) for value in key]).fetchone()
+                target = affected[key] = [found[0] if found else None, {}]
+            target[1].update(row)
+        
+        results = []
+        inserted = []
+        updated = []
+        for rowid, changes in affected.values():
+            if rowid is None:
+                row = self._new_rows(changes)[0]
+                conn.execute(f"INSERT INTO {self.table_name} (data) VALUES (?)", (json.dumps(row, default=str),))
+                inserted.append(row)
+            else:
+                sql, params = self._update_sql(changes)
+                (data,) = conn.execute(sql + " WHERE rowid = ? RETURNING data", params + [rowid]).fetchone()
+                row = json.loads(data)
+                updated.append(row)
+            results.append(row)
+        if updated:
+            changed = tuple(dict.fromkeys(column for row in rows for column in row))
+            self.db.publish(("update", self.table_name, updated), changed)
+        if inserted:
+            self.db.publish(("insert", self.table_name, inserted))
+        return results
+    
+    def _aggregate_query(self) -> Tuple[str, list]:
+        outputs = []
+        for column in self._group_by:
+            outputs.append(f"{_column(column)} AS {_identifier(column)}")
+            # Keeps booleans apart from integers when reading the groups back
+            outputs.append(f"json_type(data, '$.{column}') AS {column}__type")
+        for function, column, alias in self._aggregates:
+            argument = "*" if column is None else _column(column)
+            outputs.append(f"{function.upper()}({argument}) AS {_identifier(alias)}")
+        
+        sql = f"SELECT {', '.join(outputs)} FROM {self.table_name}{_where_sql(_filter_shape(self._filters))}"
+        params = _where_params(self._filters)
+        if self._group_by:
+            sql += f" GROUP BY {', '.join(_column(column) for column in self._group_by)}"
+        if self._order_by:
+            sql += f" ORDER BY {_identifier(self._order_by)} {'DESC' if self._order_desc else 'ASC'}"
+        elif self._group_by:
+            sql += f" ORDER BY {', '.join(self._group_by)}"
+        if self._limit_value:
+            sql += " LIMIT ?"
+            params.append(self._limit_value)
+        return sql, params
+    
+    def _aggregate_sql(self, conn: sqlite3.Connection) -> List[Dict]:
+        sql, params = self._aggregate_query()
+        cursor = conn.execute(sql, params)
+        names = [description[0] for description in cursor.description]
+        results = []
+        for values in cursor:
+            row = dict(zip(names, values))
+            for column in self._group_by:
+                json_type = row.pop(f"{column}__type")
+                if json_type in ("true", "false"):
+                    row[column] = json_type == "true"
+            results.append(row)
+        return results
+    
+    def _join(self, table_name: str, rows: List[Dict], embed) -> List:
+        """Fetch the related rows with indexed IN (...) lookups, one value per row"""
+        local_column, related_column, to_many = find_relation(table_name, embed.table)
+        self.db._ensure_table(embed.table)
+        
+        keys = []
+        for row in rows:
+            key = row.get(local_column)
+            if key is not None and not isinstance(key, (dict, list)):
+                keys.append(key)
+        keys = list(dict.fromkeys(keys))
+        
+        conn = self.db.connection()
+        matches: Dict = {}
+        for start in range(0, len(keys), _JOIN_CHUNK):
+            chunk = keys[start:start + _JOIN_CHUNK]
+            sql = (f"SELECT data FROM {_identifier(embed.table)} WHERE {_column(related_column)} "
+                   f"IN ({', '.join('?' * len(chunk))}) ORDER BY rowid")
+            for (data,) in conn.execute(sql, chunk):
+                item = json.loads(data)
+                matches.setdefault(item.get(related_column), []).append(item)
+        
+        for key, items in matches.items():
+            matches[key] = self._project(embed.table, items, embed.spec)
+        
+        values = []
+        for row in rows:
+            key = row.get(local_column)
+            found = matches.get(key, []) if not isinstance(key, (dict, list)) else []
+            if to_many:
+                values.append(found)
+            else:
+                values.append(found[0] if found else None)
+        return values
@@ -1,8 +1,24 @@
 """
 Database helper functions with retry logic for handling network errors
 """
+import asyncio
 import time
-from typing import Callable, Any, Optional
+from typing import Awaitable, Callable, Any, Optional
+
+# Error message fragments of transient network errors worth a retry
+TRANSIENT_ERRORS = [
+    'readerror',
+    'winerror 10035',
+    'non-blocking socket',
+    'connection',
+    'timeout',
+    'network'
+]
+
+def is_transient_error(error: Exception) -> bool:
+    """Check if an error is a transient network error"""
+    error_str = str(error).lower()
+    return any(keyword in error_str for keyword in TRANSIENT_ERRORS)
 
 def safe_db_operation(operation: Callable, max_retries: int = 3, delay: float = 0.1) -> Optional[Any]:
     """
@@ -23,19 +39,9 @@ def safe_db_operation(operation: Callable, max_retries: int = 3, delay: float =
             return operation()
         except Exception as e:
             last_exception = e
-            error_str = str(e).lower()
             
             # Check if it's a transient network error
-            is_transient = any(keyword in error_str for keyword in [
-                'readerror',
-                'winerror 10035',
-                'non-blocking socket',
-                'connection',
-                'timeout',
-                'network'
-            ])
-            
-            if not is_transient or attempt == max_retries - 1:
+            if not is_transient_error(e) or attempt == max_retries - 1:
                 # Not a transient error or last attempt, log and return None
                 if attempt == max_retries - 1:
                     print(f"⚠️ Database operation failed after {max_retries} attempts: {str(e)}")
@@ -48,3 +54,29 @@ def safe_db_operation(operation: Callable, max_retries: int = 3, delay: float =
     
     return None
 
+async def safe_db_operation_async(operation: Callable[[], Awaitable], max_retries: int = 3, delay: float = 0.1) -> Optional[Any]:
+    """
+    Async version of safe_db_operation for async endpoints
+    
+    Args:
+        operation: A callable returning an awaitable, e.g. lambda: query.execute_async()
+        max_retries: Maximum number of retry attempts
+        delay: Initial delay between retries (exponential backoff)
+    
+    Returns:
+        Result of the operation or None if all retries fail
+    """
+    for attempt in range(max_retries):
+        try:
+            return await operation()
+        except Exception as e:
+            if not is_transient_error(e) or attempt == max_retries - 1:
+                if attempt == max_retries - 1:
+                    print(f"⚠️ Database operation failed after {max_retries} attempts: {str(e)}")
+                break
+            
+            # Wait before retrying without holding a thread
+            await asyncio.sleep(delay * (2 ** attempt))
+            print(f"🔄 Retrying database operation (attempt {attempt + 1}/{max_retries})...")
+    
+    return None
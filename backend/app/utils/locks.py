@@ -0,0 +1,96 @@
+"""
+Locking primitives for the in-memory database
+"""
+import threading
+from contextlib import contextmanager
+
+_READ = "read"
+_NESTED = "nested"
+
+
+class ReadWriteLock:
+    """Reentrant reader-writer lock that prefers writers
+
+    Any number of threads can hold the read side at the same time; the write
+    side is exclusive. A thread that already reads may read again even while
+    a writer is waiting, and a thread that writes may also read or write
+    again, so nested queries can't deadlock on their own lock. Upgrading a
+    read hold to a write hold is not supported.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def _held(self) -> list:
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = []
+        return held
+
+    def acquire_read(self):
+        held = self._held()
+        with self._cond:
+            if self._writer == threading.get_ident():
+                held.append(_NESTED)
+                return
+            if not held:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+            held.append(_READ)
+
+    def release_read(self):
+        held = self._held()
+        kind = held.pop()
+        if kind == _READ and not held:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if self._held():
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("Write lock released by a thread that does not hold it")
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -1,4 +1,62 @@
 import re
+from functools import lru_cache
+from typing import Iterable, List
+
+# Action keywords
+ACTIONS = {
+    "starting": ["starting", "start", "restart", "resume", "resuming", "begin", "initiated"],
+    "completed": ["completed", "complete", "finished", "done"],
+    "received": ["received", "received from"],
+    "moving": ["moving", "transferring", "sending"],
+    "machine_stopped": ["machine stopped", "machine issue", "breakdown"],
+    "quality_check": ["quality check", "qc passed", "qc failed"]
+}
+
+# When a command names several actions, the first of these wins: a stop
+# outranks anything else said with it, and "Starting quality check" starts
+# the QC station rather than just naming it
+ACTION_PRIORITY = ["machine_stopped", "completed", "starting", "received", "moving", "quality_check"]
+
+# Station keywords; the first station named in a command is the one used
+STATIONS = {
+    "STATION_1": ["receiving", "storage"],
+    "STATION_2": ["washing", "peeling"],
+    "STATION_3": ["blanching"],
+    "STATION_4": ["slicing"],
+    "STATION_5": ["drying"],
+    "STATION_6": ["grinding", "sieving"],
+    "STATION_7": ["packaging", "mixing"],
+    "STATION_8": ["quality check", "qc", "dispatch"]
+}
+
+NUMBER_WORDS = {
+    'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
+    'six': '6', 'seven': '7', 'eight': '8', 'nine': '9', 'ten': '10'
+}
+
+# keyword -> (action or None, station or None, entity or None); an action
+# phrase containing a station keyword ("qc passed") names both
+_KEYWORDS = {}
+for _station_id, _keywords in STATIONS.items():
+    for _keyword in _keywords:
+        _KEYWORDS[_keyword] = (None, _station_id, _keyword)
+for _action, _keywords in ACTIONS.items():
+    for _keyword in _keywords:
+        _station = next((_KEYWORDS[_part] for _part in _KEYWORDS if re.search(r"\b" + re.escape(_part), _keyword)),
+                        (None, None, None))
+        _KEYWORDS[_keyword] = (_action, _station[1], _station[2])
+
+_RANK = {action: rank for rank, action in enumerate(ACTION_PRIORITY)}
+
+# Every vocabulary in one pass. Keywords match at the start of a word (so
+# "started" counts as "start" but "qc" inside another word doesn't; forms
+# with a prefix, like "restarting", are listed), longest first; the batch
+# number is read in a lookahead so it can still be a keyword
+_TOKENS = re.compile(
+    r"(?P<batch>\bbatch\s+(?=(?P<batch_number>\w+)))"
+    r"|(?P<quantity>\d+)\s*kg"
+    r"|\b(?P<keyword>" + "|".join(re.escape(keyword) for keyword in sorted(_KEYWORDS, key=len, reverse=True)) + ")"
+)
 
 def parse_voice_command(raw_command: str) -> dict:
     """
@@ -9,67 +67,53 @@ def parse_voice_command(raw_command: str) -> dict:
     - "Material received from preprocessing" -> {action: 'received', entity: 'material', station: 'preprocessing'}
     - "Machine stopped at drying" -> {action: 'machine_stopped', station: 'drying'}
     """
-    
-    command_lower = raw_command.lower().strip()
-    
-    # Initialize result
-    result = {
-        "action": None,
-        "entity": None,
-        "station": None,
-        "batch_number": None,
-        "quantity": None
-    }
-    
-    # Action keywords
-    actions = {
-        "starting": ["starting", "start", "begin", "initiated"],
-        "completed": ["completed", "complete", "finished", "done"],
-        "received": ["received", "received from"],
-        "moving": ["moving", "transferring", "sending"],
-        "machine_stopped": ["machine stopped", "machine issue", "breakdown"],
-        "quality_check": ["quality check", "qc passed", "qc failed"]
+    action, entity, station, batch_number, quantity = _parse(raw_command.lower().strip())
+    return {
+        "action": action,
+        "entity": entity,
+        "station": station,
+        "batch_number": batch_number,
+        "quantity": quantity
     }
+
+def parse_many(raw_commands: Iterable[str]) -> List[dict]:
+    """parse_voice_command for a list of commands, parsing repeats once"""
+    parsed = {}
+    results = []
+    for raw_command in raw_commands:
+        fields = parsed.get(raw_command)
+        if fields is None:
+            fields = parsed[raw_command] = _parse(raw_command.lower().strip())
+        action, entity, station, batch_number, quantity = fields
+        results.append({
+            "action": action,
+            "entity": entity,
+            "station": station,
+            "batch_number": batch_number,
+            "quantity": quantity
+        })
+    return results
+
+@lru_cache(maxsize=4096)
+def _parse(command_lower: str) -> tuple:
+    """(action, entity, station, batch_number, quantity) of a lowercased command
     
-    for action, keywords in actions.items():
-        for keyword in keywords:
-            if keyword in command_lower:
-                result["action"] = action
-                break
-    
-    # Station keywords
-    stations = {
-        "STATION_1": ["receiving", "storage"],
-        "STATION_2": ["washing", "peeling"],
-        "STATION_3": ["blanching"],
-        "STATION_4": ["slicing"],
-        "STATION_5": ["drying"],
-        "STATION_6": ["grinding", "sieving"],
-        "STATION_7": ["packaging", "mixing"],
-        "STATION_8": ["quality check", "qc", "dispatch"]
-    }
-    
-    for station_id, keywords in stations.items():
-        for keyword in keywords:
-            if keyword in command_lower:
-                result["station"] = station_id
-                result["entity"] = keyword
-                break
-    
-    # Extract batch number
-    batch_match = re.search(r'batch\s+(\w+)', command_lower)
-    if batch_match:
-        batch_num = batch_match.group(1)
-        # Convert word numbers to digits
-        number_words = {
-            'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
-            'six': '6', 'seven': '7', 'eight': '8', 'nine': '9', 'ten': '10'
-        }
-        result["batch_number"] = number_words.get(batch_num, batch_num)
-    
-    # Extract quantity
-    quantity_match = re.search(r'(\d+)\s*kg', command_lower)
-    if quantity_match:
-        result["quantity"] = float(quantity_match.group(1))
-    
-    return result
\ No newline at end of file
+    Devices repeat the same few phrases, hence the cache.
+    """
+    action = entity = station = batch_number = quantity = None
+    for match in _TOKENS.finditer(command_lower):
+        keyword = match.group("keyword")
+        if keyword is not None:
+            keyword_action, keyword_station, keyword_entity = _KEYWORDS[keyword]
+            if keyword_action is not None and (action is None or _RANK[keyword_action] < _RANK[action]):
+                action = keyword_action
+            if keyword_station is not None and station is None:
+                station = keyword_station
+                entity = keyword_entity
+        elif match.group("batch") is not None:
+            if batch_number is None:
+                # Convert word numbers to digits
+                batch_number = NUMBER_WORDS.get(match.group("batch_number"), match.group("batch_number"))
+        elif quantity is None:
+            quantity = float(match.group("quantity"))
+    return action, entity, station, batch_number, quantity
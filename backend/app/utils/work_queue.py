@@ -0,0 +1,141 @@
+"""
+Bounded in-process work queue that keeps related jobs in order
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Hashable, Iterable, Optional
+
+
+class QueueFull(Exception):
+    """The queue already holds as many jobs as it may"""
+
+
+class _Job:
+    __slots__ = ("keys", "function", "args", "enqueued_at")
+
+    def __init__(self, keys: frozenset, function: Callable, args: tuple):
+        self.keys = keys
+        self.function = function
+        self.args = args
+        self.enqueued_at = time.monotonic()
+
+
+class KeyedWorkQueue:
+    """Runs jobs on a fixed set of worker threads, in order per key
+
+    Each job carries keys (a station, a batch...). Jobs sharing a key run one
+    at a time in the order they were submitted; jobs with no key in common
+    run in parallel. At most `max_pending` jobs may be waiting or running:
+    submit() raises QueueFull past that, so a burst is shed at the door
+    instead of growing the queue (and its lag) without bound.
+    """
+
+    def __init__(self, workers: int, max_pending: int, name: str = "work-queue", scan_limit: int = 1000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.name = name
+        # How far past the head a worker looks for a job whose keys are free
+        self.scan_limit = scan_limit
+        self._pending: deque = deque()
+        # Keys of the running jobs; a key is held by one job at a time
+        self._busy_keys = set()
+        self._running = 0
+        self._condition = threading.Condition()
+        self._threads = []
+        self.closed = False
+        # Counters, for metrics()
+        self.processed = 0
+        self.failed = 0
+        self.shed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def full(self) -> bool:
+        return len(self._pending) + self._running >= self.max_pending
+
+    def submit(self, keys: Iterable[Hashable], function: Callable, *args):
+        """Queue function(*args) behind the earlier jobs sharing one of `keys`"""
+        job = _Job(frozenset(keys), function, args)
+        with self._condition:
+            if self.closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self.full():
+                self.shed += 1
+                raise QueueFull(f"{self.name} holds {self.max_pending} jobs")
+            if not self._threads:
+                for number in range(self.workers):
+                    thread = threading.Thread(target=self._work, name=f"{self.name}-{number}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._pending.append(job)
+            self._condition.notify()
+
+    def _take(self) -> Optional[_Job]:
+        """Oldest job none of whose keys is held by a running job or by an
+        older waiting one (called with the condition held)"""
+        blocked = set(self._busy_keys)
+        for position, job in enumerate(self._pending):
+            if position >= self.scan_limit:
+                break
+            if blocked.isdisjoint(job.keys):
+                del self._pending[position]
+                return job
+            blocked.update(job.keys)
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._take()
+                while job is None:
+                    if self.closed and not self._pending:
+                        return
+                    self._condition.wait()
+                    job = self._take()
+                self._busy_keys.update(job.keys)
+                self._running += 1
+            failed = False
+            try:
+                job.function(*job.args)
+            except Exception as e:
+                failed = True
+                print(f"⚠️ {self.name} job failed: {str(e)}")
+            lag = time.monotonic() - job.enqueued_at
+            with self._condition:
+                self._busy_keys.difference_update(job.keys)
+                self._running -= 1
+                self.processed += 1
+                self.failed += failed
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                # Jobs waiting on these keys may run now
+                self._condition.notify_all()
+
+    def metrics(self) -> dict:
+        with self._condition:
+            oldest = self._pending[0].enqueued_at if self._pending else None
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queued": len(self._pending),
+                "running": self._running,
+                "processed": self.processed,
+                "failed": self.failed,
+                "shed": self.shed,
+                # Age of the oldest job not started yet
+                "oldest_queued_seconds": 0.0 if oldest is None else round(time.monotonic() - oldest, 3),
+                # Submission to completion, for the last job and the worst one
+                "last_lag_seconds": round(self.last_lag, 3),
+                "max_lag_seconds": round(self.max_lag, 3),
+            }
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting jobs and wait up to timeout seconds for the queued
+        ones to finish"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
@@ -0,0 +1,71 @@
+"""
+Benchmark the get_current_user dependency with and without its token cache
+
+Times the dependency as FastAPI calls it, sync and async, for a cold cache
+(every call decodes the JWT and looks the user up) and a warm one (a
+dashboard polling with the same token), then checks that changing the user
+is seen by the next call.
+
+Run from the backend directory:
+    python -m benchmarks.bench_auth --calls 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import auth
+from app.auth import create_access_token, get_current_user, get_current_user_async
+from app.database import get_db
+
+
+def credentials_for(user):
+    token = create_access_token({"sub": user["id"], "email": user["email"], "role": user["role"]})
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def time_sync(credentials, calls, cold):
+    started = time.perf_counter()
+    for _ in range(calls):
+        if cold:
+            auth._principals._entries.clear()
+        get_current_user(credentials)
+    return (time.perf_counter() - started) / calls
+
+
+def time_async(credentials, calls, cold):
+    async def run():
+        started = time.perf_counter()
+        for _ in range(calls):
+            if cold:
+                auth._principals._entries.clear()
+            await get_current_user_async(credentials)
+        return (time.perf_counter() - started) / calls
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20000, help="dependency calls per measurement")
+    args = parser.parse_args()
+
+    db = get_db()
+    user = db.table("users").select("*").eq("email", "suresh@lakshmi.com").execute().data[0]
+    credentials = credentials_for(user)
+
+    for name, timer in (("sync", time_sync), ("async", time_async)):
+        cold = timer(credentials, args.calls, cold=True)
+        warm = timer(credentials, args.calls, cold=False)
+        print(f"{name:5}  cold cache {cold * 1e6:7.1f} µs/call  warm cache {warm * 1e6:7.1f} µs/call"
+              f"  ({cold / warm:.0f}x)")
+
+    get_current_user(credentials)
+    db.table("users").update({"role": "owner"}).eq("id", user["id"]).execute()
+    seen = get_current_user(credentials)["role"]
+    db.table("users").update({"role": user["role"]}).eq("id", user["id"]).execute()
+    print(f"role after update: {seen} ({'OK' if seen == 'owner' else 'STALE'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark dashboard latency during a burst of logins
+
+Polls /api/dashboard/stats alone, then again while a shift change's worth
+of concurrent logins hits /api/auth/login, and prints the dashboard latency
+percentiles of both runs along with how the logins were answered (200, or
+503 with Retry-After once the password pool is full).
+
+Run from the backend directory:
+    python -m benchmarks.bench_login --logins 300 --max-pending 64
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+from app.auth import create_access_token, shutdown_password_pool
+from app.config import settings
+from app.database import get_db
+from app.main import app
+
+LOGIN = {"email": "admin@lakshmi.com", "password": "admin123"}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def poll_dashboard(client, headers, stop):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/dashboard/stats", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def login(client, statuses):
+    response = await client.post("/api/auth/login", json=LOGIN)
+    if response.status_code == 503:
+        assert response.headers.get("retry-after"), "503 without Retry-After"
+    statuses[response.status_code] += 1
+
+
+async def run(args):
+    user = get_db().table("users").select("*").eq("email", LOGIN["email"]).execute().data[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user['id']})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Start the password workers before measuring
+        await client.post("/api/auth/login", json=LOGIN)
+
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_dashboard(client, headers, stop))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle = await poller
+
+        stop = asyncio.Event()
+        statuses = Counter()
+        poller = asyncio.create_task(poll_dashboard(client, headers, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(login(client, statuses) for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        busy = await poller
+
+    for name, latencies in (("idle", idle), ("during logins", busy)):
+        print(f"dashboard {name:13}  p50 {percentile(latencies, 0.5) * 1000:6.1f} ms"
+              f"  p99 {percentile(latencies, 0.99) * 1000:6.1f} ms  ({len(latencies)} requests)")
+    print(f"{args.logins} logins in {elapsed:.1f} s: "
+          + ", ".join(f"{count} x {code}" for code, count in sorted(statuses.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=300, help="concurrent logins")
+    parser.add_argument("--max-pending", type=int, default=settings.password_max_pending,
+                        help="password jobs waiting or running before a 503")
+    parser.add_argument("--idle-seconds", type=float, default=2, help="length of the idle run")
+    args = parser.parse_args()
+
+    settings.password_max_pending = args.max_pending
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutdown_password_pool()
+
+
+if __name__ == "__main__":
+    main()
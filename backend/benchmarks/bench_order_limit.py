@@ -0,0 +1,105 @@
+"""
+Benchmark order().limit() queries on the in-memory database
+
+Compares the sorted-index walk and the heap-based partial sort against a
+full sort of the filtered table (the previous behaviour).
+
+Run from the backend directory:
+    python -m benchmarks.bench_order_limit --alerts 100000 --voice-commands 1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.database import InMemoryDB
+
+
+def load_rows(db, table_name, count, make_row):
+    table = db.get_table(table_name)
+    start = datetime(2026, 1, 1)
+    for i in range(count):
+        row = make_row(i)
+        row["id"] = f"{table_name}-{i}"
+        row["created_at"] = (start + timedelta(seconds=i)).isoformat()
+        table.insert(row)
+
+
+def time_query(build, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build().execute()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def full_sort(db, table_name, filters, field, limit):
+    """The pre-index behaviour: filter everything, sort everything, slice"""
+    table = db.get_table(table_name)
+    query = db.table(table_name)
+    for field_name, value in filters:
+        query.eq(field_name, value)
+    results = [item for item in table.rows.values() if query._match_filters(item)]
+    results = sorted(results, key=lambda x: x.get(field, ""), reverse=True)
+    return results[:limit]
+
+
+def run_case(db, table_name, filters, limit, repeat):
+    def build():
+        query = db.table(table_name).select("*")
+        for field_name, value in filters:
+            query = query.eq(field_name, value)
+        return query.order("created_at", desc=True).limit(limit)
+
+    table = db.get_table(table_name)
+    indexed = time_query(build, repeat)
+
+    sorted_index = table.sorted_indexes.pop("created_at")
+    try:
+        heap = time_query(build, repeat)
+    finally:
+        table.sorted_indexes["created_at"] = sorted_index
+
+    started = time.perf_counter()
+    expected = full_sort(db, table_name, filters, "created_at", limit)
+    baseline = (time.perf_counter() - started) * 1000
+
+    assert build().execute().data == expected
+    label = f"{table_name} {' '.join(f'{f}={v}' for f, v in filters) or '(no filter)'} limit {limit}"
+    print(f"{label:<55} sorted index {indexed:9.3f} ms   heap {heap:9.3f} ms   full sort {baseline:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--alerts", type=int, default=100_000)
+    parser.add_argument("--voice-commands", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    db = InMemoryDB(seed_demo_data=False)
+
+    started = time.perf_counter()
+    load_rows(db, "alerts", args.alerts, lambda i: {
+        "alert_type": "machine_failure",
+        "severity": "high",
+        "station_id": f"STATION_{rng.randint(1, 8)}",
+        "is_resolved": rng.random() < 0.9,
+    })
+    load_rows(db, "voice_commands", args.voice_commands, lambda i: {
+        "worker_id": f"WORKER_{rng.randint(1, 8)}{rng.randint(1, 10):02d}",
+        "station_id": f"STATION_{rng.randint(1, 8)}",
+        "raw_command": "Completed washing batch one",
+        "processed": True,
+    })
+    print(f"Loaded {args.alerts} alerts and {args.voice_commands} voice commands "
+          f"in {time.perf_counter() - started:.1f}s\n")
+
+    run_case(db, "alerts", [("is_resolved", False)], 10, args.repeat)
+    run_case(db, "voice_commands", [], 50, args.repeat)
+    run_case(db, "voice_commands", [("worker_id", "WORKER_101")], 50, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
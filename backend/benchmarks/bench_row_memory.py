@@ -0,0 +1,105 @@
+"""
+Benchmark the memory footprint of dict rows against CompactRows
+
+Each hot table is filled twice with the same generated rows, once storing
+plain dicts and once CompactRows, and the memory taken by the rows plus their
+indexes is measured with tracemalloc. A full-scan filter shows what the
+Mapping access costs in query time.
+
+Run from the backend directory:
+    python -m benchmarks.bench_row_memory --rows 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from app.database import TABLE_COMPACT_ROWS, TABLE_INDEXES, TABLE_SORTED_INDEXES, Table
+
+STATIONS = [f"STATION_{i}" for i in range(1, 9)]
+
+
+def make_row(table_name, i, start):
+    # Strings are built per row, as they are when parsed from request bodies
+    station = STATIONS[i % 8]
+    row = {
+        "id": str(uuid.uuid4()),
+        "created_at": (start + timedelta(milliseconds=i)).isoformat(),
+    }
+    if table_name == "production_progress":
+        row.update({
+            "batch_id": str(uuid.UUID(int=i // 8)),
+            "station_id": f"STATION_{i % 8 + 1}",
+            "status": "".join(["pend", "ing"]),
+            "input_quantity_kg": 200.0,
+            "output_quantity_kg": 0,
+            "wastage_kg": 0,
+            "workers_assigned": 0,
+            "start_time": None,
+            "end_time": None,
+        })
+    elif table_name == "worker_activity":
+        row.update({
+            "worker_id": f"WORKER_{i % 8 + 1}{i % 10:02d}",
+            "station_id": f"STATION_{i % 8 + 1}",
+            "activity_type": "".join(["task_", "start"]),
+            "description": f"Started washing at {station}",
+            "batch_number": f"BATCH_{i // 1000:03d}",
+        })
+    else:
+        row.update({
+            "worker_id": f"WORKER_{i % 8 + 1}{i % 10:02d}",
+            "station_id": f"STATION_{i % 8 + 1}",
+            "raw_command": f"Starting washing at {station}",
+            "parsed_action": "".join(["start", "ing"]),
+            "parsed_entity": "".join(["wash", "ing"]),
+            "batch_number": f"BATCH_{i // 1000:03d}",
+            "processed": True,
+        })
+    return row
+
+
+def measure(table_name, count, compact):
+    # Rows are generated while tracing so that strings replaced by interned
+    # ones are freed, as they would be in the server
+    start = datetime(2025, 1, 1)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = Table(
+        table_name,
+        TABLE_INDEXES[table_name],
+        TABLE_SORTED_INDEXES.get(table_name, ()),
+        TABLE_COMPACT_ROWS[table_name] if compact else None,
+    )
+    chunk = 50_000
+    for first in range(0, count, chunk):
+        table.insert_many([make_row(table_name, i, start) for i in range(first, min(count, first + chunk))])
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    matches = sum(1 for row in table.rows.values() if row.get("station_id") == "STATION_3")
+    scan_time = time.perf_counter() - started
+    return used, scan_time, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for table_name in TABLE_COMPACT_ROWS:
+        dict_used, dict_scan, dict_matches = measure(table_name, args.rows, compact=False)
+        compact_used, compact_scan, compact_matches = measure(table_name, args.rows, compact=True)
+        assert dict_matches == compact_matches
+        print(f"{table_name:<20} dict {dict_used / args.rows:7.0f} B/row  "
+              f"compact {compact_used / args.rows:7.0f} B/row  "
+              f"({1 - compact_used / dict_used:5.1%} less)   "
+              f"scan {dict_scan * 1000:7.1f} ms -> {compact_scan * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark voice command ingestion: one request per command vs batches
+
+Sends the same commands to POST /api/voice/command one at a time and to
+POST /api/voice/commands/batch in batches, through TestClient, and prints
+the commands per second of each (with the store selected by DB_BACKEND).
+
+Run from the backend directory:
+    python -m benchmarks.bench_voice_batch --commands 2000 --batch-size 200
+"""
+import argparse
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.main import app
+from simulators.worker_simulator import STATION_TASKS
+
+
+def commands(count, batch_number, seed=0):
+    rng = random.Random(seed)
+    workers = [row["worker_id"] for row in get_db().table("workers").select("worker_id").execute().data]
+    phrases = ["Starting {task} batch {batch}", "Completed {task} batch {batch}", "Moving to {task}",
+               "Machine stopped at {task}", "Quality check passed"]
+    result = []
+    for _ in range(count):
+        station_id, task = rng.choice(list(STATION_TASKS.items()))
+        result.append({
+            "worker_id": rng.choice(workers), "station_id": station_id, "batch_number": batch_number,
+            "raw_command": rng.choice(phrases).format(task=task, batch=batch_number),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=2000, help="commands per run")
+    parser.add_argument("--batch-size", type=int, default=200, help="commands per batch request")
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        batch_number = get_db().table("batches").select("batch_number").limit(1).execute().data[0]["batch_number"]
+        items = commands(args.commands, batch_number)
+
+        started = time.perf_counter()
+        for item in items:
+            assert client.post("/api/voice/command", json=item).status_code == 200
+        single = len(items) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for position in range(0, len(items), args.batch_size):
+            response = client.post("/api/voice/commands/batch", json=items[position:position + args.batch_size])
+            assert response.status_code == 200 and not response.json()["failed"], response.text
+        batched = len(items) / (time.perf_counter() - started)
+
+    print(f"one request per command  {single:9,.0f} commands/s")
+    print(f"batches of {args.batch_size:<4}          {batched:9,.0f} commands/s  ({batched / single:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
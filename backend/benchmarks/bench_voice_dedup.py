@@ -0,0 +1,70 @@
+"""
+Benchmark voice command ingestion under a retry storm
+
+Sends commands where each one is resent several times concurrently (as
+devices on flaky Wi-Fi do), once without and once with (worker_id, seq)
+pairs, and prints the throughput, how many commands were actually applied
+(log rows written) and whether the progress numbers moved on resends.
+
+Run from the backend directory:
+    python -m benchmarks.bench_voice_dedup --commands 500 --resends 4
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.database import get_db
+from app.main import app
+
+
+def log_rows():
+    return len(get_db().table("voice_commands").select("id").execute().data)
+
+
+async def storm(client, commands, resends, with_seq):
+    started = time.perf_counter()
+    before = log_rows()
+    for seq, command in enumerate(commands, start=1):
+        body = {**command, "seq": seq} if with_seq else command
+        responses = await asyncio.gather(*(client.post("/api/voice/command", json=body) for _ in range(resends)))
+        assert all(response.status_code == 200 for response in responses)
+    elapsed = time.perf_counter() - started
+    return len(commands) * resends / elapsed, log_rows() - before
+
+
+async def run(args):
+    db = get_db()
+    batch_number = db.table("batches").select("batch_number").limit(1).execute().data[0]["batch_number"]
+    workers = [row["worker_id"] for row in db.table("workers").select("worker_id").execute().data]
+    commands = [{
+        "worker_id": workers[position % len(workers)], "station_id": "STATION_2", "batch_number": batch_number,
+        "raw_command": "Completed washing" if position % 2 else "Starting washing batch 1",
+    } for position in range(args.commands)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, with_seq in (("no dedup key", False), ("(worker, seq)", True)):
+            rate, applied = await storm(client, commands, args.resends, with_seq)
+            print(f"{label:14} {rate:8,.0f} requests/s  {applied:6} of {args.commands * args.resends} applied")
+
+        # A resend must not redraw the wastage of a completed station
+        body = {**commands[1], "seq": 10 ** 6}
+        await client.post("/api/voice/command", json=body)
+        first = db.table("batches").select("current_quantity_kg").eq("batch_number", batch_number).execute().data
+        await client.post("/api/voice/command", json=body)
+        again = db.table("batches").select("current_quantity_kg").eq("batch_number", batch_number).execute().data
+        print(f"progress after resend: {'unchanged' if first == again else 'CHANGED'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=500, help="distinct commands")
+    parser.add_argument("--resends", type=int, default=4, help="copies of each command sent at once")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
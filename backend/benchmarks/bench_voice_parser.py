@@ -0,0 +1,77 @@
+"""
+Benchmark parse_voice_command throughput
+
+Builds a corpus of shop-floor utterances from the worker simulator's
+templates (every station, batch numbers as digits, words and codes, some
+with quantities and filler words) and parses it uncached, cached (devices
+repeat the same phrases) and through parse_many.
+
+Run from the backend directory:
+    python -m benchmarks.bench_voice_parser --commands 200000
+"""
+import argparse
+import random
+import time
+
+from app.utils import voice_parser
+from app.utils.voice_parser import parse_many, parse_voice_command
+from simulators.worker_simulator import STATION_TASKS, VOICE_COMMANDS
+
+BATCHES = ["BATCH_001", "BATCH_014", "five", "two", "7", "12"]
+FILLERS = ["", "okay ", "uh ", "supervisor, "]
+EXTRA = [
+    "Moving {task} output to next station",
+    "Transferring {quantity} kg from {task}",
+    "Quality check passed for batch {batch}",
+    "QC failed at {station}, {quantity} kg rejected",
+    "Sending {quantity}kg to {task}",
+]
+
+
+def corpus(size, seed=0):
+    rng = random.Random(seed)
+    templates = [template for templates in VOICE_COMMANDS.values() for template in templates] + EXTRA
+    stations = list(STATION_TASKS)
+    commands = []
+    for _ in range(size):
+        station = rng.choice(stations)
+        previous = stations[max(0, stations.index(station) - 1)]
+        command = rng.choice(templates).format(
+            task=STATION_TASKS[station], station=station, previous_station=STATION_TASKS[previous],
+            batch=rng.choice(BATCHES), quantity=rng.randrange(50, 400))
+        commands.append(rng.choice(FILLERS) + command)
+    return commands
+
+
+def rate(function, commands):
+    started = time.perf_counter()
+    function(commands)
+    return len(commands) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=200000, help="utterances per run")
+    args = parser.parse_args()
+
+    commands = corpus(args.commands)
+    distinct = len(set(commands))
+
+    def uncached(commands):
+        for command in commands:
+            voice_parser._parse.cache_clear()
+            parse_voice_command(command)
+
+    def cached(commands):
+        for command in commands:
+            parse_voice_command(command)
+
+    print(f"{len(commands)} utterances, {distinct} distinct")
+    print(f"uncached    {rate(uncached, commands):12,.0f} commands/s")
+    cached(commands)
+    print(f"cached      {rate(cached, commands):12,.0f} commands/s")
+    print(f"parse_many  {rate(parse_many, commands):12,.0f} commands/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Check that every router answers the same on the in-memory and SQLite backends
+
+Both stores are seeded with the same demo rows, then the same sequence of
+requests (logins, reads of every endpoint, batch creation, single and
+batched voice commands, station and worker updates, user creation) is sent
+to the app through TestClient, once per backend. Generated ids and
+timestamps are normalized and floats rounded before the responses are
+compared.
+
+Run from the backend directory (exits non-zero on any difference):
+    python -m benchmarks.check_backend_parity
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+
+from fastapi.testclient import TestClient
+
+import app.database as database
+from app.database import InMemoryDB
+from app.main import app
+from app.seed import build_demo_data
+from app.sqlite_db import SQLiteDB
+
+UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?$")
+
+VOICE_COMMANDS = [
+    ("STATION_1", "Material received from supplier"),
+    ("STATION_1", "Starting receiving batch"),
+    ("STATION_1", "Completed receiving batch"),
+    ("STATION_2", "Starting washing batch"),
+    ("STATION_2", "Moving to blanching"),
+    ("STATION_2", "Completed washing"),
+    ("STATION_3", "Machine stopped at blanching"),
+    ("STATION_3", "Quality check passed"),
+]
+
+
+def seed(db, demo_data):
+    for table_name, rows in demo_data.items():
+        db.table(table_name).insert([dict(row) for row in rows]).execute()
+
+
+def scenario(client):
+    """Yield (label, response) for the request sequence"""
+    token = client.post("/api/auth/login", json={"email": "admin@lakshmi.com", "password": "admin123"}).json()
+    yield "login", {key: value for key, value in token.items() if key != "access_token"}
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    def get(path, **params):
+        return client.get(path, headers=headers, params=params)
+
+    yield "login wrong password", client.post(
+        "/api/auth/login", json={"email": "admin@lakshmi.com", "password": "nope"})
+    yield "me", get("/api/auth/me")
+    for path in ("/api/users", "/api/workers", "/api/stations", "/api/batches",
+                 "/api/dashboard/owner", "/api/dashboard/stats", "/api/analytics/productivity",
+                 "/api/analytics/wastage", "/api/analytics/timeline", "/api/analytics/costs"):
+        yield path, get(path)
+
+    batch = client.post("/api/batches", headers=headers, json={
+        "batch_number": "BATCH_PARITY", "start_date": "2025-01-01", "end_date": "2025-01-07",
+        "target_quantity_kg": 250.0, "raw_material_kg": 340.0,
+    })
+    yield "create batch", batch
+    batch_id = batch.json()["id"]
+    yield "duplicate batch", client.post("/api/batches", headers=headers, json={
+        "batch_number": "BATCH_PARITY", "start_date": "2025-01-01", "end_date": "2025-01-07",
+        "target_quantity_kg": 250.0, "raw_material_kg": 340.0,
+    })
+
+    workers = get("/api/workers").json()
+    for position, (station_id, raw_command) in enumerate(VOICE_COMMANDS):
+        worker = workers[position % len(workers)]
+        yield f"voice {raw_command}", client.post("/api/voice/command", json={
+            "worker_id": worker["worker_id"], "station_id": station_id,
+            "raw_command": raw_command, "batch_number": "BATCH_PARITY",
+        })
+    yield "voice command batch", client.post("/api/voice/commands/batch", json=[
+        {"worker_id": workers[position % len(workers)]["worker_id"], "station_id": station_id,
+         "raw_command": raw_command, "batch_number": "BATCH_PARITY"}
+        for position, (station_id, raw_command) in enumerate(VOICE_COMMANDS)
+    ])
+    yield "voice commands", client.get("/api/voice/commands", params={"limit": 20})
+
+    yield "station status", client.put("/api/stations/STATION_4/status", headers=headers,
+                                       params={"status": "maintenance"})
+    yield "station", get("/api/stations/STATION_4")
+    yield "station workers", get("/api/stations/STATION_2/workers")
+    worker_id = workers[0]["worker_id"]
+    yield "worker location", client.put(f"/api/workers/{worker_id}/location",
+                                        json={"worker_id": worker_id, "station_id": "STATION_5"})
+    yield "worker", get(f"/api/workers/{worker_id}")
+    yield "create user", client.post("/api/users", headers=headers, json={
+        "email": "parity@lakshmi.com", "password": "parity123", "full_name": "Parity Check", "role": "manager",
+    })
+
+    yield "batch", get(f"/api/batches/{batch_id}")
+    yield "batch progress", get(f"/api/batches/{batch_id}/progress")
+    yield "timeline", get("/api/analytics/timeline", batch_number="BATCH_PARITY")
+    for path in ("/api/users", "/api/dashboard/owner", "/api/dashboard/stats",
+                 "/api/analytics/productivity", "/api/analytics/wastage", "/api/analytics/costs"):
+        yield f"{path} after writes", get(path)
+
+
+class Normalizer:
+    """Replace generated ids (in order of appearance) and timestamps, round floats"""
+
+    def __init__(self, known_ids):
+        self.known_ids = known_ids
+        self.new_ids = {}
+
+    def __call__(self, value):
+        if isinstance(value, dict):
+            return {key: self(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self(item) for item in value]
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, str):
+            if UUID.match(value) and value not in self.known_ids:
+                return self.new_ids.setdefault(value, f"<new id {len(self.new_ids)}>")
+            if TIMESTAMP.match(value):
+                return "<timestamp>"
+        return value
+
+
+def run(db, demo_data):
+    seed(db, demo_data)
+    database._db = db
+    known_ids = {row["id"] for rows in demo_data.values() for row in rows if "id" in row}
+    normalize = Normalizer(known_ids)
+    results = []
+    with TestClient(app) as client:
+        random.seed(0)
+        for label, response in scenario(client):
+            if isinstance(response, dict):
+                results.append((label, None, normalize(response)))
+            else:
+                results.append((label, response.status_code, normalize(response.json())))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--verbose", action="store_true", help="print every compared response")
+    args = parser.parse_args()
+
+    random.seed(0)
+    demo_data = build_demo_data()
+    original = database._db
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_db = SQLiteDB(os.path.join(directory, "parity.db"), seed_demo_data=False)
+        try:
+            memory = run(InMemoryDB(seed_demo_data=False), demo_data)
+            sqlite = run(sqlite_db, demo_data)
+        finally:
+            sqlite_db.close()
+            database._db = original
+
+    differences = 0
+    for (label, memory_status, memory_body), (_, sqlite_status, sqlite_body) in zip(memory, sqlite):
+        same = memory_status == sqlite_status and memory_body == sqlite_body
+        if not same:
+            differences += 1
+            print(f"DIFF {label}")
+            print(f"  memory ({memory_status}): {json.dumps(memory_body, sort_keys=True)[:2000]}")
+            print(f"  sqlite ({sqlite_status}): {json.dumps(sqlite_body, sort_keys=True)[:2000]}")
+        elif args.verbose:
+            print(f"same {label} ({memory_status})")
+    print(f"{len(memory)} responses compared, {differences} different")
+    if differences:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
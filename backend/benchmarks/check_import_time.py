@@ -0,0 +1,95 @@
+"""
+Check that the app starts fast enough for new replicas
+
+Imports app.main in a fresh interpreter under `python -X importtime` and
+fails if importing it, or the time spent in the app's own modules, goes
+over budget. The app's own modules are budgeted separately since they are
+what a change here can slow down (a heavy import, work done at import time),
+while the total also depends on the installed FastAPI/pydantic. Then starts
+the app (lifespan included) and times the first served request.
+
+Bytecode is written and a warm-up import done first, so that the numbers
+are those of a deployed replica rather than of compiling every module.
+
+Run from the backend directory (exits non-zero when over budget):
+    python -m benchmarks.check_import_time --total-ms 1000 --own-ms 150
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+with TestClient(app) as client:
+    assert client.get("/health").status_code == 200
+print(time.perf_counter() - started)
+"""
+
+
+# Subprocess environment that lets Python cache bytecode
+ENV = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+
+
+def import_times(module):
+    """(self µs, cumulative µs, depth, name) per module imported by `module`"""
+    subprocess.run([sys.executable, "-c", f"import {module}"], env=ENV, check=True)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True, env=ENV)
+    times = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            times.append((int(own), int(cumulative), len(indent) // 2, name))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--total-ms", type=float, default=1000, help="budget for importing app.main")
+    parser.add_argument("--own-ms", type=float, default=150, help="budget for the app's own modules")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    times = import_times("app.main")
+    total = next(cumulative for _, cumulative, _, name in times if name == "app.main") / 1000
+    own_modules = [(own, name) for own, _, _, name in times if name == "app" or name.startswith("app.")]
+    own = sum(value for value, _ in own_modules) / 1000
+
+    print("slowest imports (cumulative):")
+    for _, cumulative, depth, name in sorted(times, key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {'  ' * depth}{name}")
+    print("slowest app modules (own time):")
+    for value, name in sorted(own_modules, reverse=True)[:args.top]:
+        print(f"  {value / 1000:8.1f} ms  {name}")
+
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", FIRST_REQUEST], capture_output=True, text=True, check=True, env=ENV)
+    first_request = float(result.stdout.strip().splitlines()[-1]) * 1000
+    process = (time.perf_counter() - started) * 1000
+
+    print(f"import app.main: {total:.0f} ms (budget {args.total_ms:.0f} ms)")
+    print(f"app modules:     {own:.0f} ms (budget {args.own_ms:.0f} ms)")
+    print(f"first request:   {first_request:.0f} ms after interpreter start, {process:.0f} ms for the process")
+
+    failures = []
+    if total > args.total_ms:
+        failures.append("import app.main")
+    if own > args.own_ms:
+        failures.append("app modules")
+    if failures:
+        print(f"OVER BUDGET: {', '.join(failures)}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Check parse_voice_command against expected parses of shop-floor phrases
+
+Covers the action priorities, word-start keyword matching (inflected and
+prefixed forms such as "started" and "restarting"), the first-station rule,
+batch numbers and quantities, and that parse_many() agrees with
+parse_voice_command().
+
+Run from the backend directory (exits non-zero on any mismatch):
+    python -m benchmarks.check_voice_parser
+"""
+import sys
+
+from app.utils.voice_parser import parse_many, parse_voice_command
+
+# phrase -> expected subset of the parse
+EXPECTED = {
+    "Starting washing batch five": {"action": "starting", "station": "STATION_2", "entity": "washing",
+                                    "batch_number": "5"},
+    "Started slicing": {"action": "starting", "station": "STATION_4"},
+    "Restarting station 3": {"action": "starting", "station": None},
+    "Restarted blanching after repair": {"action": "starting", "station": "STATION_3"},
+    "Resuming drying batch two": {"action": "starting", "station": "STATION_5", "batch_number": "2"},
+    "Completed drying 120 kg batch two": {"action": "completed", "quantity": 120.0, "batch_number": "2"},
+    "Starting quality check batch 5": {"action": "starting", "station": "STATION_8", "entity": "quality check"},
+    "Machine stopped at quality check": {"action": "machine_stopped", "station": "STATION_8"},
+    "QC passed for batch 3": {"action": "quality_check", "station": "STATION_8", "entity": "qc"},
+    "Material received from washing": {"action": "received", "station": "STATION_2"},
+    "Moving washing output to blanching": {"action": "moving", "station": "STATION_2"},
+    "Abandoned qcs": {"action": None},
+    "Hello": {"action": None, "station": None, "batch_number": None, "quantity": None},
+}
+
+
+def main():
+    failures = 0
+    phrases = list(EXPECTED)
+    for phrase, parsed in zip(phrases, parse_many(phrases)):
+        if parsed != parse_voice_command(phrase):
+            failures += 1
+            print(f"MISMATCH parse_many vs parse_voice_command: {phrase!r}")
+        wrong = {field: parsed[field] for field, value in EXPECTED[phrase].items() if parsed[field] != value}
+        if wrong:
+            failures += 1
+            print(f"WRONG {phrase!r}: got {wrong}, expected {EXPECTED[phrase]}")
+    print(f"{len(phrases)} phrases checked, {failures} failures")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Check that the keyed work queue behind the voice command queue keeps order
+
+Submits jobs keyed by a random station and (mostly) a random batch to a
+KeyedWorkQueue with many workers, each job sleeping a random moment, and
+fails if two jobs sharing a key ever ran at once or out of submission order.
+Then fills a small queue to check that it sheds instead of growing.
+
+Run from the backend directory (exits non-zero on any violation):
+    python -m benchmarks.check_voice_queue --jobs 20000 --workers 8
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from app.utils.work_queue import KeyedWorkQueue, QueueFull
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=20000, help="jobs to submit")
+    parser.add_argument("--workers", type=int, default=8, help="worker threads")
+    args = parser.parse_args()
+
+    queue = KeyedWorkQueue(args.workers, args.jobs, name="check-queue")
+    lock = threading.Lock()
+    last_seen = {}
+    running = set()
+    violations = []
+
+    def job(keys, sequence):
+        with lock:
+            for key in keys:
+                if key in running:
+                    violations.append(f"{key} ran twice at once")
+                running.add(key)
+        time.sleep(random.random() * 0.0005)
+        with lock:
+            for key in keys:
+                running.discard(key)
+                if last_seen.get(key, -1) > sequence:
+                    violations.append(f"{key}: job {sequence} ran after job {last_seen[key]}")
+                last_seen[key] = sequence
+
+    started = time.perf_counter()
+    for sequence in range(args.jobs):
+        keys = [("station", random.randrange(8))]
+        if random.random() < 0.7:
+            keys.append(("batch", random.randrange(5)))
+        queue.submit(keys, job, keys, sequence)
+    queue.close()
+    elapsed = time.perf_counter() - started
+    metrics = queue.metrics()
+    print(f"{metrics['processed']} jobs in {elapsed:.1f} s, max lag {metrics['max_lag_seconds']} s")
+    if metrics["processed"] != args.jobs:
+        violations.append(f"{args.jobs - metrics['processed']} jobs never ran")
+
+    small = KeyedWorkQueue(1, 3, name="small-queue")
+    release = threading.Event()
+    for _ in range(3):
+        small.submit([("station", 1)], release.wait)
+    try:
+        small.submit([("station", 1)], release.wait)
+        violations.append("a full queue accepted a job")
+    except QueueFull:
+        pass
+    release.set()
+    small.close()
+    if small.metrics()["shed"] != 1:
+        violations.append("shed job not counted")
+
+    for violation in violations[:20]:
+        print(f"VIOLATION {violation}")
+    if violations:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
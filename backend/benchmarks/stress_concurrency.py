@@ -0,0 +1,173 @@
+"""
+Concurrency stress test for the in-memory database
+
+Many writer threads update all progress rows of a batch at once and append
+activity rows, while reader threads check that they never see a batch half
+updated, that ordered reads stay ordered and that a snapshot doesn't change
+under them. The indexes are checked against full scans at the end.
+
+Run from the backend directory (exits non-zero on any violation):
+    python -m benchmarks.stress_concurrency --seconds 10 --writers 16 --readers 16
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from app.database import InMemoryDB
+
+STATIONS = [f"STATION_{i}" for i in range(1, 9)]
+
+
+def setup(db, batches):
+    batch_ids = []
+    for number in range(batches):
+        batch = db.table("batches").insert({
+            "batch_number": f"BATCH_{number:03d}",
+            "overall_status": "in_progress",
+        }).execute().data[0]
+        batch_ids.append(batch["id"])
+        for station in STATIONS:
+            db.table("production_progress").insert({
+                "batch_id": batch["id"],
+                "station_id": station,
+                "status": "v0",
+                "output_quantity_kg": 0,
+            }).execute()
+    return batch_ids
+
+
+class Stress:
+    def __init__(self, db, batch_ids, seconds):
+        self.db = db
+        self.batch_ids = batch_ids
+        self.deadline = time.monotonic() + seconds
+        self.errors = []
+        self.inserted = 0
+        self.counts = {"writes": 0, "reads": 0}
+        self._lock = threading.Lock()
+
+    def fail(self, message):
+        with self._lock:
+            self.errors.append(message)
+
+    def count(self, kind, inserted=0):
+        with self._lock:
+            self.counts[kind] += 1
+            self.inserted += inserted
+
+    def writer(self, seed):
+        rng = random.Random(seed)
+        db = self.db
+        version = 0
+        while time.monotonic() < self.deadline and not self.errors:
+            version += 1
+            batch_id = rng.choice(self.batch_ids)
+            marker = f"w{seed}-{version}"
+            updated = db.table("production_progress").update({
+                "status": marker,
+                "output_quantity_kg": version,
+            }).eq("batch_id", batch_id).execute()
+            if len(updated.data) != len(STATIONS):
+                self.fail(f"update touched {len(updated.data)} rows")
+            station = rng.choice(STATIONS)
+            db.table("worker_activity").insert({
+                "worker_id": f"WORKER_{seed}",
+                "station_id": station,
+                "activity_type": "task_start",
+            }).execute()
+            db.table("stations").update({"current_status": marker}).eq("station_id", station).execute()
+            self.count("writes", inserted=1)
+
+    def reader(self, seed):
+        rng = random.Random(seed)
+        db = self.db
+        while time.monotonic() < self.deadline and not self.errors:
+            batch_id = rng.choice(self.batch_ids)
+            progress = db.table("production_progress").select("*").eq("batch_id", batch_id).execute().data
+            statuses = {row["status"] for row in progress}
+            if len(progress) != len(STATIONS) or len(statuses) != 1:
+                self.fail(f"torn batch update: {len(progress)} rows, statuses {sorted(statuses)}")
+
+            recent = db.table("worker_activity").select("created_at").order("created_at", desc=True).limit(20).execute().data
+            stamps = [row["created_at"] for row in recent]
+            if stamps != sorted(stamps, reverse=True):
+                self.fail("ordered read came back out of order")
+
+            with db.snapshot("production_progress", "stations"):
+                first = db.table("production_progress").select("status").eq("batch_id", batch_id).execute().data
+                stations = db.table("stations").select("current_status").execute().data
+                second = db.table("production_progress").select("status").eq("batch_id", batch_id).execute().data
+                again = db.table("stations").select("current_status").execute().data
+            if first != second or stations != again:
+                self.fail("snapshot changed while it was held")
+
+            # Rows handed out earlier must never change afterwards
+            before = [dict(row) for row in progress]
+            time.sleep(0)
+            if before != progress:
+                self.fail("a returned row was mutated by a writer")
+            self.count("reads")
+
+
+def check_indexes(db):
+    errors = []
+    for name, table in db._tables.items():
+        for columns, index in table.hash_indexes.items():
+            expected = {}
+            for rid, row in table.rows.items():
+                key = index.key(row)
+                if key is not None:
+                    expected.setdefault(key, []).append(rid)
+            actual = {key: index.lookup(key) for key in index._buckets}
+            if actual != expected:
+                errors.append(f"hash index {name}{columns} out of sync")
+        for column, index in table.sorted_indexes.items():
+            if len(index) != len(table.rows):
+                errors.append(f"sorted index {name}.{column} has {len(index)} entries for {len(table.rows)} rows")
+            keys = [table.rows[rid].get(column) for rid in index.iter_rids()]
+            non_null = [key for key in keys if key is not None]
+            if non_null != sorted(non_null):
+                errors.append(f"sorted index {name}.{column} out of order")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=20)
+    args = parser.parse_args()
+
+    # Switch threads as often as possible to shake out races
+    sys.setswitchinterval(1e-6)
+
+    db = InMemoryDB(seed_demo_data=False)
+    stress = Stress(db, setup(db, args.batches), args.seconds)
+    threads = [threading.Thread(target=stress.writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=stress.reader, args=(1000 + i,)) for i in range(args.readers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    errors = stress.errors + check_indexes(db)
+    activity = len(db.get_table("worker_activity").rows)
+    if activity != stress.inserted:
+        errors.append(f"{stress.inserted} activity rows inserted but {activity} stored")
+
+    print(f"{stress.counts['writes']} write rounds, {stress.counts['reads']} read rounds "
+          f"in {elapsed:.1f}s with {args.writers} writers and {args.readers} readers")
+    if errors:
+        for error in errors[:20]:
+            print(f"FAIL: {error}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Generate a large, reproducible factory dataset for the in-memory database
+
+Builds stations, workers, managers, batches with their production_progress
+rows, and months of worker_activity, voice_commands and alerts, at whatever
+volume is asked for (e.g. 100k workers and 10M activity rows). The same seed
+and end date always give the same rows, ids included.
+
+Rows are generated lazily and loaded in bulk, either straight into a store
+(load_into) or into a snapshot file that the server recovers from on start
+(write_snapshot, then run the server with WAL_DIR set to that directory).
+
+Run from the backend directory:
+    python -m simulators.dataset_generator --workers 100000 --activity-rows 10000000 --snapshot-dir data
+"""
+import argparse
+import bisect
+import gc
+import itertools
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from app.seed import DEMO_PASSWORD_HASHES, build_demo_data
+
+STATION_NAMES = [
+    ("Raw Material Receiving", "receiving"),
+    ("Washing & Peeling", "washing"),
+    ("Blanching", "blanching"),
+    ("Slicing", "slicing"),
+    ("Drying (Tunnel Dryer)", "drying"),
+    ("Grinding & Sieving", "grinding"),
+    ("Packaging & Mixing", "packaging"),
+    ("Quality Check & Dispatch", "dispatch"),
+]
+
+WORKER_NAMES = [
+    "Ravi", "Arun", "Deepak", "Vijay", "Karthik", "Prakash", "Ramesh", "Sunil",
+    "Anitha", "Priya", "Meena", "Lakshmi", "Kavitha", "Divya", "Radha", "Geetha",
+    "Kumar", "Raj", "Mohan", "Ganesh", "Siva", "Bala", "Mani", "Senthil",
+]
+
+# (weight, activity_type, parsed_action, command template); the weights
+# follow what a shift at a station mostly reports
+ACTIVITY_KINDS = [
+    (45, "task_start", "starting", "Starting {entity} batch {batch}"),
+    (45, "task_complete", "completed", "Completed {entity} batch {batch}"),
+    (6, "material_received", "received", "Material received for {entity}"),
+    (3, "quality_check", "quality_check", "Quality check passed at {entity}"),
+    (1, "machine_issue", "machine_stopped", "Machine stopped at {entity}"),
+]
+
+ALERT_TYPES = [
+    ("machine_failure", "high", "Machine stopped at {station}"),
+    ("delay", "medium", "Batch {batch} delayed at {station}"),
+    ("low_stock", "low", "Raw material running low at {station}"),
+]
+
+# Rows handed to the store per bulk insert
+CHUNK_ROWS = 100_000
+
+# Version 4 and RFC 4122 variant bits of a UUID
+_UUID_CLEAR = ~((0xf000 << 64) | (0xc000 << 48))
+_UUID_SET = (0x4000 << 64) | (0x8000 << 48)
+
+
+class DatasetGenerator:
+    """Seeded generator of every table's rows
+
+    Each table's rows come from their own random stream derived from the
+    seed, so changing the volume of one table leaves the others unchanged.
+    production_progress has one row per batch and station.
+    """
+
+    def __init__(self, seed: int = 0, stations: int = 8, workers: int = 50, managers: Optional[int] = None,
+                 batches: int = 1, months: float = 1, activity_rows: int = 0, voice_rows: int = 0,
+                 alerts: int = 0, end: Optional[datetime] = None):
+        self.seed = seed
+        self.stations = stations
+        self.workers = workers
+        self.managers = managers if managers is not None else max(1, stations // 2)
+        self.batches = batches
+        self.months = months
+        self.activity_rows = activity_rows
+        self.voice_rows = voice_rows
+        self.alerts = alerts
+        # Midnight today by default: pass end for data that is the same on any day
+        self.end = end or datetime.combine(date.today(), datetime.min.time())
+        self.start = self.end - timedelta(days=30 * months)
+
+        self.station_ids = [f"STATION_{number}" for number in range(1, stations + 1)]
+        self.worker_ids = [f"WORKER_{number:06d}" for number in range(1, workers + 1)]
+        self.batch_numbers = [f"BATCH_{number:06d}" for number in range(1, batches + 1)]
+
+    def _random(self, table_name: str) -> random.Random:
+        return random.Random(f"{self.seed}:{table_name}")
+
+    @staticmethod
+    def _uuid(rng: random.Random) -> str:
+        """Random version 4 UUID string, as str(uuid.UUID(int=..., version=4))
+        but without building a UUID object (a third of the generation time)"""
+        digits = "%032x" % (rng.getrandbits(128) & _UUID_CLEAR | _UUID_SET)
+        return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+    def _times(self, rng: random.Random, count: int) -> Iterator[str]:
+        """count increasing timestamps spread over the period, with jitter"""
+        span = (self.end - self.start).total_seconds()
+        step = span / max(count, 1)
+        start = (self.start - datetime(1970, 1, 1)).total_seconds()
+        for position in range(count):
+            yield datetime.utcfromtimestamp(start + (position + rng.random()) * step).isoformat()
+
+    def _station(self, position: int):
+        name, entity = STATION_NAMES[position % len(STATION_NAMES)]
+        if position >= len(STATION_NAMES):
+            name = f"{name} {position // len(STATION_NAMES) + 1}"
+        return name, entity
+
+    def table_names(self) -> List[str]:
+        return ["users", "managers", "stations", "workers", "batches", "production_progress",
+                "worker_activity", "voice_commands", "alerts"]
+
+    def rows(self, table_name: str) -> Iterator[Dict]:
+        """Rows of a table, generated one at a time"""
+        return getattr(self, f"_{table_name}")()
+
+    def _users(self):
+        rng = self._random("users")
+        created_at = self.start.isoformat()
+        # The demo logins keep working on a generated dataset
+        for user in build_demo_data()["users"][:2]:
+            yield {**user, "id": self._uuid(rng), "created_at": created_at}
+        for number in range(1, self.managers + 1):
+            yield {
+                "id": self._uuid(rng),
+                "email": f"manager{number}@lakshmi.com",
+                "password_hash": DEMO_PASSWORD_HASHES["manager123"],
+                "full_name": f"Manager {number}",
+                "role": "manager",
+                "phone": f"+91-97{number:08d}",
+                "created_at": created_at,
+            }
+
+    def _managers(self):
+        rng = self._random("managers")
+        users = list(self._users())[2:]
+        per_manager = max(1, -(-self.stations // self.managers))
+        for number, user in enumerate(users):
+            yield {
+                "id": self._uuid(rng),
+                "user_id": user["id"],
+                "manager_name": user["full_name"],
+                "assigned_stations": self.station_ids[number * per_manager:(number + 1) * per_manager],
+                "created_at": user["created_at"],
+            }
+
+    def _stations(self):
+        rng = self._random("stations")
+        for position, station_id in enumerate(self.station_ids):
+            yield {
+                "id": self._uuid(rng),
+                "station_id": station_id,
+                "station_name": self._station(position)[0],
+                "current_status": rng.choice(["idle", "active", "active", "completed", "delayed"]),
+                "capacity": 100,
+                "created_at": self.start.isoformat(),
+            }
+
+    def _workers(self):
+        rng = self._random("workers")
+        created_at = self.start.isoformat()
+        for position, worker_id in enumerate(self.worker_ids):
+            yield {
+                "id": self._uuid(rng),
+                "worker_id": worker_id,
+                "worker_name": WORKER_NAMES[position % len(WORKER_NAMES)],
+                "station_id": self.station_ids[rng.randrange(self.stations)],
+                "manager_id": None,
+                "phone": f"+91-98{position:08d}",
+                "productivity_score": round(rng.uniform(55, 98), 2),
+                "total_tasks_completed": rng.randrange(2000),
+                "is_active": rng.random() < 0.95,
+                "created_at": created_at,
+            }
+
+    def _batch_ids(self) -> List[str]:
+        rng = self._random("batch_ids")
+        return [self._uuid(rng) for _ in range(self.batches)]
+
+    def _batches(self):
+        rng = self._random("batches")
+        times = self._times(rng, self.batches)
+        for number, (batch_id, created_at) in enumerate(zip(self._batch_ids(), times)):
+            day = created_at[:10]
+            # Older batches are done; the last few are still on the line
+            done = number < self.batches - max(1, self.batches // 50)
+            target = rng.choice([100, 150, 200, 250, 300])
+            yield {
+                "id": batch_id,
+                "batch_number": self.batch_numbers[number],
+                "product_name": "ABC Powder",
+                "start_date": day,
+                "end_date": day,
+                "target_quantity_kg": target,
+                "current_quantity_kg": round(target * rng.uniform(0.9, 0.98), 2) if done else 0,
+                "raw_material_kg": round(target * 1.35, 2),
+                "current_station": self.station_ids[-1] if done else self.station_ids[rng.randrange(self.stations)],
+                "overall_status": "completed" if done else "in_progress",
+                "created_at": created_at,
+            }
+
+    def _production_progress(self):
+        rng = self._random("production_progress")
+        for batch in self._batches():
+            done = batch["overall_status"] == "completed"
+            reached = self.stations if done else self.station_ids.index(batch["current_station"])
+            quantity = batch["raw_material_kg"]
+            started = datetime.fromisoformat(batch["created_at"])
+            for position, station_id in enumerate(self.station_ids):
+                row = {
+                    "id": self._uuid(rng),
+                    "batch_id": batch["id"],
+                    "station_id": station_id,
+                    "status": "pending",
+                    "input_quantity_kg": 0,
+                    "output_quantity_kg": 0,
+                    "wastage_kg": 0,
+                    "workers_assigned": 0,
+                    "start_time": None,
+                    "end_time": None,
+                    "created_at": batch["created_at"],
+                }
+                if position <= reached:
+                    end_time = started + timedelta(minutes=rng.uniform(20, 90))
+                    row.update({
+                        "status": "completed" if position < reached else "in_progress",
+                        "input_quantity_kg": round(quantity, 2),
+                        "workers_assigned": rng.randint(1, 4),
+                        "start_time": started.isoformat(),
+                    })
+                    if position < reached:
+                        wastage = quantity * rng.uniform(0.05, 0.12)
+                        quantity -= wastage
+                        row.update({
+                            "output_quantity_kg": round(quantity, 2),
+                            "wastage_kg": round(wastage, 2),
+                            "end_time": end_time.isoformat(),
+                        })
+                    started = end_time
+                yield row
+
+    def _events(self, table_name: str, count: int):
+        """(rng, created_at, worker, station position, kind, batch) per activity-like row"""
+        rng = self._random(table_name)
+        uniform = rng.random
+        weights = list(itertools.accumulate(weight for weight, *_ in ACTIVITY_KINDS))
+        total = weights[-1]
+        worker_ids, workers = self.worker_ids, self.workers
+        batch_numbers, batches = self.batch_numbers, self.batches
+        stations = self.stations
+        for created_at in self._times(rng, count):
+            kind = ACTIVITY_KINDS[bisect.bisect(weights, uniform() * total)]
+            # Recent batches are the ones being worked on at a given time
+            batch = batch_numbers[min(batches - 1, int(uniform() ** 0.5 * batches))] if batches else None
+            yield rng, created_at, worker_ids[int(uniform() * workers)], int(uniform() * stations), kind, batch
+
+    def _worker_activity(self):
+        for rng, created_at, worker_id, position, kind, batch in self._events("worker_activity", self.activity_rows):
+            _, activity_type, _, template = kind
+            entity = self._station(position)[1]
+            station_id = self.station_ids[position]
+            if activity_type == "task_start":
+                description = f"Started {entity} at {station_id}"
+            elif activity_type == "task_complete":
+                description = f"Completed {entity} at {station_id}"
+            else:
+                description = template.format(entity=entity, batch=batch)
+            yield {
+                "id": self._uuid(rng),
+                "created_at": created_at,
+                "worker_id": worker_id,
+                "station_id": station_id,
+                "activity_type": activity_type,
+                "description": description,
+                "batch_number": batch,
+            }
+
+    def _voice_commands(self):
+        for rng, created_at, worker_id, position, kind, batch in self._events("voice_commands", self.voice_rows):
+            _, _, action, template = kind
+            entity = self._station(position)[1]
+            yield {
+                "id": self._uuid(rng),
+                "created_at": created_at,
+                "worker_id": worker_id,
+                "station_id": self.station_ids[position],
+                "raw_command": template.format(entity=entity, batch=batch),
+                "parsed_action": action,
+                "parsed_entity": entity,
+                "batch_number": batch,
+                "processed": True,
+            }
+
+    def _alerts(self):
+        rng = self._random("alerts")
+        batch_ids = self._batch_ids()
+        for position, created_at in enumerate(self._times(rng, self.alerts)):
+            alert_type, severity, template = rng.choice(ALERT_TYPES)
+            batch = rng.randrange(self.batches) if self.batches else None
+            station_id = self.station_ids[rng.randrange(self.stations)]
+            yield {
+                "id": self._uuid(rng),
+                "alert_type": alert_type,
+                "severity": severity,
+                "station_id": station_id,
+                "batch_id": batch_ids[batch] if batch is not None else None,
+                "message": template.format(station=station_id, batch=self.batch_numbers[batch] if batch is not None else ""),
+                # Only the most recent alerts are still open
+                "is_resolved": position < self.alerts - 20,
+                "created_at": created_at,
+            }
+
+    def load_into(self, db, chunk_rows: int = CHUNK_ROWS, progress=None) -> Dict[str, int]:
+        """Bulk insert every table into an InMemoryDB; returns rows per table
+
+        Rows go straight to the tables, bypassing the write-ahead log and the
+        change feed: call db.checkpoint() afterwards to make them durable.
+        """
+        counts = {}
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for table_name in self.table_names():
+                table = db.get_table(table_name)
+                rows = self.rows(table_name)
+                count = 0
+                while True:
+                    chunk = list(itertools.islice(rows, chunk_rows))
+                    if not chunk:
+                        break
+                    with table.lock.write():
+                        table.insert_many(chunk)
+                    count += len(chunk)
+                    if progress:
+                        progress(table_name, count)
+                counts[table_name] = count
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return counts
+
+    def write_snapshot(self, directory: str) -> Dict[str, int]:
+        """Write the dataset as a snapshot the server recovers from on start"""
+        from app.persistence import WriteAheadLog
+
+        counts = {}
+
+        def counted(table_name):
+            for row in self.rows(table_name):
+                counts[table_name] = counts.get(table_name, 0) + 1
+                yield row
+
+        WriteAheadLog(directory).write_snapshot({name: counted(name) for name in self.table_names()}, 0)
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stations", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1000)
+    parser.add_argument("--managers", type=int, default=None)
+    parser.add_argument("--batches", type=int, default=1000)
+    parser.add_argument("--months", type=float, default=3)
+    parser.add_argument("--activity-rows", type=int, default=1_000_000)
+    parser.add_argument("--voice-rows", type=int, default=1_000_000)
+    parser.add_argument("--alerts", type=int, default=1000)
+    parser.add_argument("--end", type=date.fromisoformat, default=None,
+                        help="last day of the data (YYYY-MM-DD, default today)")
+    parser.add_argument("--snapshot-dir", default=None,
+                        help="write a snapshot there instead of loading into a fresh store")
+    args = parser.parse_args()
+
+    generator = DatasetGenerator(
+        seed=args.seed, stations=args.stations, workers=args.workers, managers=args.managers,
+        batches=args.batches, months=args.months, activity_rows=args.activity_rows,
+        voice_rows=args.voice_rows, alerts=args.alerts,
+        end=datetime.combine(args.end, datetime.min.time()) if args.end else None,
+    )
+    started = time.perf_counter()
+    if args.snapshot_dir:
+        counts = generator.write_snapshot(args.snapshot_dir)
+        target = f"snapshot in {args.snapshot_dir}"
+    else:
+        from app.database import InMemoryDB
+        counts = generator.load_into(InMemoryDB(seed_demo_data=False))
+        target = "a fresh InMemoryDB"
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for table_name, count in counts.items():
+        print(f"{table_name:<20} {count:>12,}")
+    print(f"{total:,} rows into {target} in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
+import json
 import requests
 import time
 import random
 import os
+import uuid
 from datetime import datetime
 
 # Configuration
@@ -10,6 +12,10 @@ port = os.environ.get("PORT", "8000")
 # If running inside the container, we can use localhost. 
 # But prefer the public URL if provided, or localhost if internal.
 API_BASE_URL = f"http://127.0.0.1:{port}/api"
+# Set SIMULATOR_WEBSOCKET=1 to send everything over one device channel per
+# worker instead of an HTTP request per update
+DEVICE_CHANNEL_URL = f"ws://127.0.0.1:{port}/api/devices/ws"
+USE_WEBSOCKET = os.environ.get("SIMULATOR_WEBSOCKET") == "1"
 
 WORKERS_PER_STATION = {
     "STATION_1": 5,
@@ -57,14 +63,59 @@ STATION_TASKS = {
 }
 
 class WorkerSimulator:
-    def __init__(self, worker_id, station_id, batch_number="BATCH_001"):
+    def __init__(self, worker_id, station_id, batch_number="BATCH_001", use_websocket=USE_WEBSOCKET):
         self.worker_id = worker_id
         self.station_id = station_id
         self.batch_number = batch_number
         self.task = STATION_TASKS.get(station_id, "processing")
+        self.use_websocket = use_websocket
+        self.channel = None
+        self.seq = 0
+    
+    def send_device_message(self, message):
+        """Send a message over the device channel and return its reply
+        (reconnecting once if the channel dropped, and then resending the
+        same message)"""
+        from websockets.sync.client import connect
+        from websockets.exceptions import ConnectionClosed
+        self.seq += 1
+        message = {"seq": self.seq, **message}
+        for attempt in range(2):
+            try:
+                if self.channel is None:
+                    self.channel = connect(f"{DEVICE_CHANNEL_URL}/{self.worker_id}")
+                self.channel.send(json.dumps(message))
+                return json.loads(self.channel.recv())
+            except (ConnectionClosed, OSError):
+                self.channel = None
+                if attempt:
+                    raise
+    
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
     
     def send_voice_command(self, command_text):
         """Send voice command to backend"""
+        if self.use_websocket:
+            try:
+                # The seq check doesn't survive a reconnect; the key lets the
+                # backend drop the resend if the first send got through
+                reply = self.send_device_message({
+                    "type": "voice_command",
+                    "station_id": self.station_id,
+                    "raw_command": command_text,
+                    "batch_number": self.batch_number,
+                    "idempotency_key": str(uuid.uuid4())
+                })
+                if reply["type"] == "ack":
+                    print(f"✅ [{self.worker_id}] {command_text}")
+                    return reply["result"]
+                print(f"❌ [{self.worker_id}] Error: {reply['status']}")
+            except Exception as e:
+                print(f"❌ [{self.worker_id}] Exception: {str(e)}")
+            return None
         try:
             response = requests.post(
                 f"{API_BASE_URL}/voice/command",
@@ -85,6 +136,14 @@ class WorkerSimulator:
     
     def update_location(self):
         """Update worker location"""
+        if self.use_websocket:
+            try:
+                reply = self.send_device_message({"type": "location", "station_id": self.station_id})
+                if reply["type"] == "ack":
+                    print(f"📍 [{self.worker_id}] Location updated: {self.station_id}")
+            except Exception as e:
+                print(f"❌ [{self.worker_id}] Location update failed: {str(e)}")
+            return
         try:
             response = requests.put(
                 f"{API_BASE_URL}/workers/{self.worker_id}/location",
@@ -134,10 +193,13 @@ class WorkerSimulator:
     def run_continuous(self, cycles=5):
         """Run multiple work cycles"""
         print(f"\n🚀 Starting worker {self.worker_id} at {self.station_id}")
-        for i in range(cycles):
-            print(f"\n--- Cycle {i+1}/{cycles} ---")
-            self.simulate_work_cycle()
-            time.sleep(random.randint(10, 20))  # Break between cycles
+        try:
+            for i in range(cycles):
+                print(f"\n--- Cycle {i+1}/{cycles} ---")
+                self.simulate_work_cycle()
+                time.sleep(random.randint(10, 20))  # Break between cycles
+        finally:
+            self.close()
 
 # Example usage
 if __name__ == "__main__":